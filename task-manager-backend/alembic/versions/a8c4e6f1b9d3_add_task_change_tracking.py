@@ -0,0 +1,129 @@
+"""add task change sequence and tombstones for delta sync
+
+Revision ID: a8c4e6f1b9d3
+Revises: f3b6c2d8a4e1
+Create Date: 2026-10-18 18:21:09.554310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c4e6f1b9d3'
+down_revision: Union[str, Sequence[str], None] = 'f3b6c2d8a4e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_BUMP = (
+    "INSERT INTO user_task_stats (user_id, change_seq) VALUES ({row}.user_id, 1) "
+    "ON CONFLICT (user_id) DO UPDATE SET change_seq = user_task_stats.change_seq + 1; "
+)
+
+SQLITE_STAMP = "UPDATE task SET change_seq = (SELECT change_seq FROM user_task_stats WHERE user_id = {row}.user_id) WHERE id = {row}.id; "
+
+SQLITE_UPGRADE = [
+    "CREATE TRIGGER IF NOT EXISTS task_changes_ai AFTER INSERT ON task BEGIN "
+    + SQLITE_BUMP.format(row='new') + SQLITE_STAMP.format(row='new') + "END",
+    "CREATE TRIGGER IF NOT EXISTS task_changes_au AFTER UPDATE ON task WHEN new.change_seq IS old.change_seq BEGIN "
+    + SQLITE_BUMP.format(row='new') + SQLITE_STAMP.format(row='new') + "END",
+    "CREATE TRIGGER IF NOT EXISTS task_changes_ad AFTER DELETE ON task BEGIN "
+    + SQLITE_BUMP.format(row='old') +
+    "INSERT INTO task_tombstone (task_id, user_id, change_seq, deleted_at) "
+    "VALUES (old.id, old.user_id, (SELECT change_seq FROM user_task_stats WHERE user_id = old.user_id), CURRENT_TIMESTAMP) "
+    "ON CONFLICT (task_id) DO UPDATE SET user_id = excluded.user_id, change_seq = excluded.change_seq, deleted_at = excluded.deleted_at; "
+    "END",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS task_changes_ad",
+    "DROP TRIGGER IF EXISTS task_changes_au",
+    "DROP TRIGGER IF EXISTS task_changes_ai",
+]
+
+POSTGRESQL_BUMP = (
+    "INSERT INTO user_task_stats (user_id, change_seq) VALUES ({row}.user_id, 1) "
+    "ON CONFLICT (user_id) DO UPDATE SET change_seq = user_task_stats.change_seq + 1 "
+    "RETURNING change_seq INTO {target};"
+)
+
+POSTGRESQL_UPGRADE = [
+    "CREATE OR REPLACE FUNCTION task_changes_stamp() RETURNS trigger AS $$ BEGIN "
+    + POSTGRESQL_BUMP.format(row='NEW', target='NEW.change_seq') +
+    " RETURN NEW; END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE FUNCTION task_changes_tombstone() RETURNS trigger AS $$ DECLARE seq bigint; BEGIN "
+    + POSTGRESQL_BUMP.format(row='OLD', target='seq') +
+    " INSERT INTO task_tombstone (task_id, user_id, change_seq, deleted_at) VALUES (OLD.id, OLD.user_id, seq, now()) "
+    "ON CONFLICT (task_id) DO UPDATE SET user_id = excluded.user_id, change_seq = excluded.change_seq, deleted_at = excluded.deleted_at; "
+    "RETURN OLD; END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER task_changes_biu BEFORE INSERT OR UPDATE ON task FOR EACH ROW EXECUTE FUNCTION task_changes_stamp()",
+    "CREATE TRIGGER task_changes_ad AFTER DELETE ON task FOR EACH ROW EXECUTE FUNCTION task_changes_tombstone()",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS task_changes_ad ON task",
+    "DROP TRIGGER IF EXISTS task_changes_biu ON task",
+    "DROP FUNCTION IF EXISTS task_changes_tombstone()",
+    "DROP FUNCTION IF EXISTS task_changes_stamp()",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    # Plain ADD COLUMN with a default: a batch ALTER would rebuild task and
+    # drop its triggers on SQLite.
+    op.add_column('task', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('user_task_stats', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_table('task_tombstone',
+    sa.Column('task_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('task_id')
+    )
+    op.create_index('ix_task_tombstone_user_id_change_seq', 'task_tombstone', ['user_id', 'change_seq'], unique=False)
+
+    if dialect == 'postgresql':
+        # Writers wait until the numbering below has committed with the triggers.
+        op.execute("LOCK TABLE task IN SHARE MODE")
+    # Number existing tasks 1..n per user, so a sync from the beginning sees them.
+    op.execute(
+        "UPDATE task SET change_seq = numbered.seq FROM ("
+        "SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY id) AS seq FROM task"
+        ") AS numbered WHERE task.id = numbered.id"
+    )
+    op.execute(
+        "UPDATE user_task_stats SET change_seq = "
+        "(SELECT coalesce(max(change_seq), 0) FROM task WHERE task.user_id = user_task_stats.user_id)"
+    )
+    if dialect == 'postgresql':
+        for statement in POSTGRESQL_UPGRADE:
+            op.execute(statement)
+        with op.get_context().autocommit_block():
+            op.create_index('ix_task_user_id_change_seq', 'task', ['user_id', 'change_seq'], postgresql_concurrently=True, if_not_exists=True)
+    else:
+        if dialect == 'sqlite':
+            for statement in SQLITE_UPGRADE:
+                op.execute(statement)
+        op.create_index('ix_task_user_id_change_seq', 'task', ['user_id', 'change_seq'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRESQL_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    op.drop_index('ix_task_user_id_change_seq', table_name='task', if_exists=True)
+    op.drop_index('ix_task_tombstone_user_id_change_seq', table_name='task_tombstone')
+    op.drop_table('task_tombstone')
+    op.drop_column('user_task_stats', 'change_seq')
+    op.drop_column('task', 'change_seq')
@@ -0,0 +1,51 @@
+"""add composite indexes for task list queries
+
+Revision ID: b7d41c9e2a10
+Revises: 63554fd6d249
+Create Date: 2026-10-18 09:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41c9e2a10'
+down_revision: Union[str, Sequence[str], None] = '63554fd6d249'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_INDEXES = [
+    ('ix_task_user_id_created_at', ['user_id', 'created_at', 'id']),
+    ('ix_task_user_id_status_created_at', ['user_id', 'status', 'created_at', 'id']),
+    ('ix_task_user_id_status', ['user_id', 'status', 'id']),
+    ('ix_task_user_id_title', ['user_id', 'title', 'id']),
+    ('ix_task_user_id_description', ['user_id', sa.text("coalesce(description, '')"), 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY keeps the table writable but cannot run
+        # inside a transaction block.
+        with op.get_context().autocommit_block():
+            for name, columns in TASK_INDEXES:
+                op.create_index(name, 'task', columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns in TASK_INDEXES:
+            op.create_index(name, 'task', columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, _ in reversed(TASK_INDEXES):
+                op.drop_index(name, table_name='task', postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, _ in reversed(TASK_INDEXES):
+            op.drop_index(name, table_name='task', if_exists=True)
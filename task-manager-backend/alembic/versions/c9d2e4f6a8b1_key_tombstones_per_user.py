@@ -0,0 +1,127 @@
+"""key task tombstones by (user_id, task_id) and stop SQLite reusing task ids
+
+Revision ID: c9d2e4f6a8b1
+Revises: a8c4e6f1b9d3
+Create Date: 2026-10-18 21:12:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d2e4f6a8b1'
+down_revision: Union[str, Sequence[str], None] = 'a8c4e6f1b9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_BUMP = (
+    "INSERT INTO user_task_stats (user_id, change_seq) VALUES (old.user_id, 1) "
+    "ON CONFLICT (user_id) DO UPDATE SET change_seq = user_task_stats.change_seq + 1; "
+)
+
+SQLITE_TOMBSTONE_TRIGGER = (
+    "CREATE TRIGGER task_changes_ad AFTER DELETE ON task BEGIN "
+    + SQLITE_BUMP +
+    "INSERT INTO task_tombstone (task_id, user_id, change_seq, deleted_at) "
+    "VALUES (old.id, old.user_id, (SELECT change_seq FROM user_task_stats WHERE user_id = old.user_id), CURRENT_TIMESTAMP) "
+    "ON CONFLICT ({conflict}) DO UPDATE SET {assignments}change_seq = excluded.change_seq, deleted_at = excluded.deleted_at; "
+    "END"
+)
+
+POSTGRESQL_TOMBSTONE_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION task_changes_tombstone() RETURNS trigger AS $$ DECLARE seq bigint; BEGIN "
+    "INSERT INTO user_task_stats (user_id, change_seq) VALUES (OLD.user_id, 1) "
+    "ON CONFLICT (user_id) DO UPDATE SET change_seq = user_task_stats.change_seq + 1 "
+    "RETURNING change_seq INTO seq;"
+    " INSERT INTO task_tombstone (task_id, user_id, change_seq, deleted_at) VALUES (OLD.id, OLD.user_id, seq, now()) "
+    "ON CONFLICT ({conflict}) DO UPDATE SET {assignments}change_seq = excluded.change_seq, deleted_at = excluded.deleted_at; "
+    "RETURN OLD; END $$ LANGUAGE plpgsql"
+)
+
+NEW_KEY = {'conflict': 'user_id, task_id', 'assignments': ''}
+OLD_KEY = {'conflict': 'task_id', 'assignments': 'user_id = excluded.user_id, '}
+
+
+def _rebuild_sqlite_tombstones(primary_key: Sequence[str], copy: str) -> None:
+    # The delete trigger writes to task_tombstone, and SQLite refuses the
+    # rename below while a trigger still names the old table; callers put
+    # the right version back.
+    op.execute("DROP TRIGGER IF EXISTS task_changes_ad")
+    op.create_table('_task_tombstone_new',
+    sa.Column('task_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint(*primary_key)
+    )
+    op.execute(copy)
+    op.drop_index('ix_task_tombstone_user_id_change_seq', table_name='task_tombstone')
+    op.drop_table('task_tombstone')
+    op.rename_table('_task_tombstone_new', 'task_tombstone')
+    op.create_index('ix_task_tombstone_user_id_change_seq', 'task_tombstone', ['user_id', 'change_seq'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Serial ids are never reused, so only the tombstone key changes.
+        op.execute("ALTER TABLE task_tombstone DROP CONSTRAINT task_tombstone_pkey, ADD PRIMARY KEY (user_id, task_id)")
+        op.execute(POSTGRESQL_TOMBSTONE_FUNCTION.format(**NEW_KEY))
+        return
+    if dialect != 'sqlite':
+        return
+
+    _rebuild_sqlite_tombstones(
+        ['user_id', 'task_id'],
+        "INSERT INTO _task_tombstone_new (task_id, user_id, change_seq, deleted_at) "
+        "SELECT task_id, user_id, change_seq, deleted_at FROM task_tombstone"
+    )
+
+    # AUTOINCREMENT can only be set by rebuilding task, which drops its
+    # triggers and the expression index the batch copy cannot reflect, so
+    # keep their definitions and put them back afterwards.
+    bind = op.get_bind()
+    saved = bind.exec_driver_sql(
+        "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'task' AND type IN ('trigger', 'index') AND sql IS NOT NULL"
+    ).all()
+    with op.batch_alter_table('task', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    existing = {row.name for row in bind.exec_driver_sql("SELECT name FROM sqlite_master WHERE tbl_name = 'task'")}
+    for kind, name, sql in saved:
+        if name not in existing and name != 'task_changes_ad':
+            op.execute(sql)
+    op.execute(SQLITE_TOMBSTONE_TRIGGER.format(**NEW_KEY))
+    # Ids that only survive in tombstones must not be handed out again either.
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'task'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'task', max("
+        "(SELECT coalesce(max(id), 0) FROM task), (SELECT coalesce(max(task_id), 0) FROM task_tombstone))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # task keeps AUTOINCREMENT: the older schema works with it, and dropping
+    # it would let SQLite reuse ids again. Where a task id has tombstones for
+    # several users, the latest one is kept.
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            "DELETE FROM task_tombstone t USING task_tombstone newer "
+            "WHERE newer.task_id = t.task_id AND newer.change_seq > t.change_seq AND newer.user_id <> t.user_id"
+        )
+        op.execute("ALTER TABLE task_tombstone DROP CONSTRAINT task_tombstone_pkey, ADD PRIMARY KEY (task_id)")
+        op.execute(POSTGRESQL_TOMBSTONE_FUNCTION.format(**OLD_KEY))
+    elif dialect == 'sqlite':
+        _rebuild_sqlite_tombstones(
+            ['task_id'],
+            "INSERT OR REPLACE INTO _task_tombstone_new (task_id, user_id, change_seq, deleted_at) "
+            "SELECT task_id, user_id, change_seq, deleted_at FROM task_tombstone ORDER BY deleted_at, change_seq"
+        )
+        op.execute(SQLITE_TOMBSTONE_TRIGGER.format(**OLD_KEY))
@@ -0,0 +1,42 @@
+"""add updated_at column to task
+
+Revision ID: d91f2c7b5e3a
+Revises: c3e8f0a1d2b4
+Create Date: 2026-10-18 13:05:27.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91f2c7b5e3a'
+down_revision: Union[str, Sequence[str], None] = 'c3e8f0a1d2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        # A batch ALTER would rebuild task and drop the task_fts triggers, so
+        # add the column NOT NULL up front behind a placeholder default.
+        op.add_column('task', sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text("'1970-01-01 00:00:00'")))
+        op.execute('UPDATE task SET updated_at = created_at')
+    else:
+        op.add_column('task', sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute('UPDATE task SET updated_at = created_at')
+        op.alter_column('task', 'updated_at', existing_type=sa.DateTime(), nullable=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('ix_task_user_id_updated_at', 'task', ['user_id', 'updated_at'], postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index('ix_task_user_id_updated_at', 'task', ['user_id', 'updated_at'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_user_id_updated_at', table_name='task', if_exists=True)
+    op.drop_column('task', 'updated_at')
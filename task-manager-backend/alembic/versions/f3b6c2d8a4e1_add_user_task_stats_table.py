@@ -0,0 +1,123 @@
+"""add user_task_stats table maintained by triggers on task
+
+Revision ID: f3b6c2d8a4e1
+Revises: e5a4b1c7f9d2
+Create Date: 2026-10-18 17:05:41.207736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b6c2d8a4e1'
+down_revision: Union[str, Sequence[str], None] = 'e5a4b1c7f9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPSERT_OLD = (
+    "INSERT INTO user_task_stats (user_id, todo, inprogress, done) "
+    "VALUES (old.user_id, -(old.status = 'TODO'), -(old.status = 'INPROGRESS'), -(old.status = 'DONE')) "
+    "ON CONFLICT (user_id) DO UPDATE SET todo = user_task_stats.todo + excluded.todo, "
+    "inprogress = user_task_stats.inprogress + excluded.inprogress, done = user_task_stats.done + excluded.done; "
+)
+
+SQLITE_UPSERT_NEW = (
+    "INSERT INTO user_task_stats (user_id, todo, inprogress, done) "
+    "VALUES (new.user_id, +(new.status = 'TODO'), +(new.status = 'INPROGRESS'), +(new.status = 'DONE')) "
+    "ON CONFLICT (user_id) DO UPDATE SET todo = user_task_stats.todo + excluded.todo, "
+    "inprogress = user_task_stats.inprogress + excluded.inprogress, done = user_task_stats.done + excluded.done; "
+)
+
+SQLITE_UPGRADE = [
+    "CREATE TRIGGER IF NOT EXISTS user_task_stats_ai AFTER INSERT ON task BEGIN " + SQLITE_UPSERT_NEW + "END",
+    "CREATE TRIGGER IF NOT EXISTS user_task_stats_ad AFTER DELETE ON task BEGIN " + SQLITE_UPSERT_OLD + "END",
+    "CREATE TRIGGER IF NOT EXISTS user_task_stats_au AFTER UPDATE OF status, user_id ON task "
+    "WHEN old.status IS NOT new.status OR old.user_id IS NOT new.user_id BEGIN "
+    + SQLITE_UPSERT_OLD + SQLITE_UPSERT_NEW + "END",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS user_task_stats_au",
+    "DROP TRIGGER IF EXISTS user_task_stats_ad",
+    "DROP TRIGGER IF EXISTS user_task_stats_ai",
+]
+
+POSTGRESQL_UPSERT = (
+    "INSERT INTO user_task_stats (user_id, todo, inprogress, done) "
+    "SELECT user_id, sum(CASE WHEN status = 'TODO' THEN delta ELSE 0 END), "
+    "sum(CASE WHEN status = 'INPROGRESS' THEN delta ELSE 0 END), sum(CASE WHEN status = 'DONE' THEN delta ELSE 0 END) "
+    "FROM ({changes}) AS changes GROUP BY user_id "
+    "ON CONFLICT (user_id) DO UPDATE SET todo = user_task_stats.todo + excluded.todo, "
+    "inprogress = user_task_stats.inprogress + excluded.inprogress, done = user_task_stats.done + excluded.done;"
+)
+
+POSTGRESQL_MOVED = "FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE n.status <> o.status OR n.user_id <> o.user_id"
+
+POSTGRESQL_UPGRADE = [
+    "CREATE OR REPLACE FUNCTION user_task_stats_apply() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'INSERT' THEN "
+    + POSTGRESQL_UPSERT.format(changes="SELECT user_id, status, 1 AS delta FROM new_rows") +
+    " ELSIF TG_OP = 'DELETE' THEN "
+    + POSTGRESQL_UPSERT.format(changes="SELECT user_id, status, -1 AS delta FROM old_rows") +
+    " ELSE "
+    + POSTGRESQL_UPSERT.format(changes=f"SELECT n.user_id, n.status, 1 AS delta {POSTGRESQL_MOVED} "
+                                       f"UNION ALL SELECT o.user_id, o.status, -1 AS delta {POSTGRESQL_MOVED}") +
+    " END IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER user_task_stats_ai AFTER INSERT ON task "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION user_task_stats_apply()",
+    "CREATE TRIGGER user_task_stats_ad AFTER DELETE ON task "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION user_task_stats_apply()",
+    "CREATE TRIGGER user_task_stats_au AFTER UPDATE ON task "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION user_task_stats_apply()",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS user_task_stats_au ON task",
+    "DROP TRIGGER IF EXISTS user_task_stats_ad ON task",
+    "DROP TRIGGER IF EXISTS user_task_stats_ai ON task",
+    "DROP FUNCTION IF EXISTS user_task_stats_apply()",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    op.create_table('user_task_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('todo', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('inprogress', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('done', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    if dialect == 'postgresql':
+        # Hold off writers until the backfill below has committed with the triggers.
+        op.execute("LOCK TABLE task IN SHARE MODE")
+        for statement in POSTGRESQL_UPGRADE:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    # Count the tasks that already exist.
+    op.execute(
+        "INSERT INTO user_task_stats (user_id, todo, inprogress, done) "
+        "SELECT user_id, sum(CASE WHEN status = 'TODO' THEN 1 ELSE 0 END), "
+        "sum(CASE WHEN status = 'INPROGRESS' THEN 1 ELSE 0 END), sum(CASE WHEN status = 'DONE' THEN 1 ELSE 0 END) "
+        "FROM task GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRESQL_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    op.drop_table('user_task_stats')
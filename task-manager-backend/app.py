@@ -3,13 +3,19 @@ from dotenv import load_dotenv
 import os
 from typing import Tuple, Optional
 from werkzeug.exceptions import HTTPException
-from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 
 from models import db
+from cache import init_cache
+from json_provider import init_json_provider
+from utils import InvalidParameter, init_auth_context
+from hashing import init_hashing
+from jwt_cache import create_jwt_manager
+from db_routing import init_replica_routing
 
 from routes.auth import bp as auth_bp
 from routes.tasks import bp as tasks_bp
+from routes.metrics import bp as metrics_bp
 
 from config import Config, DevelopmentConfig, TestingConfig
 
@@ -26,23 +32,39 @@ def create_app(database_uri_override: Optional[str] = None, testing: bool = Fals
     if database_uri_override:
         app.config['SQLALCHEMY_DATABASE_URI'] = database_uri_override
 
+    init_json_provider(app)
+
     CORS(app, origins=["http://localhost:5173"], supports_credentials=True)
 
-    jwt = JWTManager(app)
+    jwt = create_jwt_manager(app)
+    init_cache(app)
+    init_replica_routing(app)
     db.init_app(app)
+    init_auth_context(app)
+    init_hashing(app)
 
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(tasks_bp)
+    app.register_blueprint(metrics_bp)
 
     @app.errorhandler(400)
     def bad_request(error: HTTPException) -> Tuple[Response, int]:
         return jsonify({'validation_error': {'message': error.description}}), 400
 
+    @app.errorhandler(InvalidParameter)
+    def invalid_parameter(error: InvalidParameter) -> Tuple[Response, int]:
+        return jsonify({'validation_error': {'message': str(error)}}), 400
+
     @app.errorhandler(404)
     def not_found(error: HTTPException) -> Tuple[Response, int]:
         return jsonify({'message': 'Resource not found'}), 404
 
+    @app.errorhandler(503)
+    def service_unavailable(error: HTTPException) -> Tuple[Response, int, dict]:
+        headers = {'Retry-After': str(error.retry_after)} if getattr(error, 'retry_after', None) else {}
+        return jsonify({'message': error.description}), 503, headers
+
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,457 @@
+"""ASGI variant of the task API on FastAPI and async SQLAlchemy.
+
+Serves the /register, /login, /token/refresh and /tasks* contract of
+app.py::create_app (same schemas, status codes, JSON bodies and interchangeable
+tokens) from a single event loop, so requests waiting on the database do not
+each hold a thread. Run with: uvicorn --factory asgi_app:create_asgi_app
+
+Not ported: the response cache and ETags, replica routing and the /metrics
+endpoint. Writes still bump the cache version and replica pin of the user when
+TASKS_CACHE_BACKEND is shared (redis), so Flask workers on the same backend
+never serve reads older than a write made here. A memory cache lives inside
+each Flask process, out of reach of this app: with the two apps side by side,
+use redis or none.
+"""
+import asyncio
+import csv
+import io
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+import jwt
+import sqlalchemy as sa
+from fastapi import Depends, FastAPI, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from starlette.exceptions import HTTPException
+from cache import TaskCache, build_backend
+from config import Config, TestingConfig
+from db_routing import ReplicaPins
+import metrics
+from hashing import HashingBusy, HashingExecutor, check_hash, generate_hash, needs_rehash
+from json_provider import encode
+from models.task import Task, TASK_FIELDS
+from models.token_blocklist import TokenBlocklist
+from models.user_task_stats import UserTaskStats
+from models.user import User
+from pagination import (
+    TaskListQuery, TaskChangesQuery, order_by_clauses, parse_filter_args, parse_fields, encode_sync_token, invalidate_cached_total
+)
+from schemas.task import TaskRequest, TaskBulkCreateRequest, TaskBulkUpdateRequest, TaskBulkDeleteRequest, TaskBulkSelector
+from schemas.user import UserRequest, LoginRequest
+from search import detect_backend
+from utils import (
+    DUPLICATE_MESSAGES, EXPORT_FORMATS, ImportReader, InvalidParameter, TaskImport, bulk_create_rows, bulk_selection_clauses,
+    csv_value, duplicate_user_field, task_filter_clauses
+)
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+task_table = Task.__table__
+user_table = User.__table__
+
+def async_database_url(url: str) -> str:
+    # DATABASE_URL names the sync driver; swap in the asyncio one for the same database.
+    parsed = sa.engine.make_url(url)
+    backend = parsed.get_backend_name()
+    if parsed.get_driver_name() in ('aiosqlite', 'asyncpg'):
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS.get(backend, parsed.drivername)).render_as_string(hide_password=False)
+
+class JSONResponse(Response):
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        return encode(content) + b'\n'
+
+class AuthError(Exception):
+    # Mirrors flask_jwt_extended's error responses ({"msg": ...}).
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.message = message
+
+def _config(request: Request) -> Type[Config]:
+    return request.app.state.config
+
+async def get_conn(request: Request) -> AsyncIterator[AsyncConnection]:
+    async with request.app.state.engine.connect() as conn:
+        yield conn
+
+def _create_token(config: Type[Config], user_id: int, token_type: str) -> str:
+    # Same claims as flask_jwt_extended, so tokens work against either app.
+    now = datetime.now(timezone.utc)
+    expires = config.JWT_ACCESS_TOKEN_EXPIRES if token_type == 'access' else config.JWT_REFRESH_TOKEN_EXPIRES
+    claims = {'iat': now, 'jti': str(uuid.uuid4()), 'type': token_type, 'sub': str(user_id), 'nbf': now, 'exp': now + expires}
+    if token_type == 'access':
+        claims['fresh'] = False
+    return jwt.encode(claims, config.JWT_SECRET_KEY, algorithm='HS256')
+
+def _token_claims(request: Request, token_type: str) -> Dict[str, Any]:
+    header = request.headers.get('Authorization')
+    if not header:
+        raise AuthError(401, 'Missing Authorization Header')
+    scheme, _, token = header.partition(' ')
+    if scheme != 'Bearer' or not token or ' ' in token:
+        raise AuthError(422, "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'")
+    try:
+        claims = jwt.decode(token, _config(request).JWT_SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise AuthError(401, 'Token has expired')
+    except jwt.InvalidTokenError as exc:
+        raise AuthError(422, str(exc))
+    if token_type == 'access' and claims.get('type') != 'access':
+        raise AuthError(422, 'Only non-refresh tokens are allowed')
+    if token_type == 'refresh' and claims.get('type') != 'refresh':
+        raise AuthError(422, 'Only refresh tokens are allowed')
+    return claims
+
+def current_user_id(request: Request) -> int:
+    return int(_token_claims(request, 'access')['sub'])
+
+async def _run_hashing(request: Request, fn: Callable[..., Any], *args: Any) -> Any:
+    executor = request.app.state.hashing
+    if executor is None:
+        # AUTH_HASH_WORKERS=0: unbounded, like Flask's inline hashing, but in a
+        # worker thread so the loop stays free.
+        return await asyncio.to_thread(fn, *args)
+    return await executor.run_async(fn, *args)
+
+async def _user_exists(conn: AsyncConnection, user_id: int) -> bool:
+    return bool(await conn.scalar(sa.select(sa.exists().where(user_table.c.id == user_id))))
+
+async def _search_backend(request: Request, conn: AsyncConnection) -> str:
+    configured = _config(request).TASKS_SEARCH_BACKEND
+    if configured != 'auto':
+        return configured
+    if request.app.state.search_backend is None:
+        request.app.state.search_backend = await conn.run_sync(detect_backend)
+    return request.app.state.search_backend
+
+def _shared_task_cache(config: Type[Config]) -> Optional[TaskCache]:
+    # No cached reads are served here, so only a backend the Flask workers
+    # share is worth bumping; see the module docstring for memory.
+    if config.TASKS_CACHE_BACKEND == 'memory':
+        return None
+    try:
+        backend = build_backend({name: getattr(config, name) for name in dir(config) if name.isupper()})
+    except RuntimeError:
+        # A "module:factory" backend is built from the Flask app, which this
+        # app does not have; start without bumping rather than not at all.
+        logger.warning('TASKS_CACHE_BACKEND %s needs the Flask app; writes here will not invalidate its cache',
+                       config.TASKS_CACHE_BACKEND)
+        return None
+    return TaskCache(backend, config.TASKS_CACHE_TTL) if backend else None
+
+def create_asgi_app(database_uri_override: Optional[str] = None, testing: bool = False) -> FastAPI:
+    config = TestingConfig if testing else Config
+    engine = create_async_engine(async_database_url(database_uri_override or config.SQLALCHEMY_DATABASE_URI))
+    task_cache = _shared_task_cache(config)
+    # Flask workers reading from a replica look for these pins in the same backend.
+    pins = ReplicaPins(task_cache.backend) if task_cache and config.SQLALCHEMY_REPLICA_URI else None
+
+    async def tasks_changed(user_id: int) -> None:
+        # Call after the write has committed, like routes/tasks.py::_tasks_changed.
+        invalidate_cached_total(user_id)
+        if task_cache is None:
+            return
+        def notify() -> None:
+            if pins is not None:
+                pins.pin(user_id, config.REPLICA_PIN_SECONDS)
+            task_cache.bump(user_id)
+        # The backend client blocks, so keep it off the event loop.
+        await asyncio.to_thread(notify)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        yield
+        if app.state.hashing is not None:
+            app.state.hashing.shutdown()
+        await engine.dispose()
+
+    app = FastAPI(default_response_class=JSONResponse, lifespan=lifespan)
+    app.state.config = config
+    app.state.engine = engine
+    app.state.search_backend = None
+    # The same bounded pool as hashing.init_hashing, so a burst of logins gets
+    # quick 503s here too.
+    app.state.hashing = HashingExecutor(
+        config.AUTH_HASH_WORKERS, config.AUTH_HASH_MAX_QUEUE, config.AUTH_HASH_TIMEOUT
+    ) if config.AUTH_HASH_WORKERS > 0 else None
+    app.add_middleware(CORSMiddleware, allow_origins=['http://localhost:5173'], allow_credentials=True,
+                       allow_methods=['*'], allow_headers=['*'])
+
+    @app.exception_handler(AuthError)
+    async def auth_error(request: Request, exc: AuthError) -> JSONResponse:
+        return JSONResponse({'msg': exc.message}, status_code=exc.status_code)
+
+    @app.exception_handler(InvalidParameter)
+    async def invalid_parameter(request: Request, exc: InvalidParameter) -> JSONResponse:
+        return JSONResponse({'validation_error': {'message': str(exc)}}, status_code=400)
+
+    @app.exception_handler(HashingBusy)
+    async def hashing_busy(request: Request, exc: HashingBusy) -> JSONResponse:
+        return JSONResponse({'message': exc.description}, status_code=503, headers={'Retry-After': str(exc.retry_after)})
+
+    @app.exception_handler(HTTPException)
+    async def http_error(request: Request, exc: HTTPException) -> JSONResponse:
+        if exc.status_code == 400:
+            return JSONResponse({'validation_error': {'message': exc.detail}}, status_code=400)
+        if exc.status_code == 404:
+            return JSONResponse({'message': 'Resource not found'}, status_code=404)
+        return JSONResponse({'message': exc.detail}, status_code=exc.status_code)
+
+    @app.exception_handler(RequestValidationError)
+    async def validation_error(request: Request, exc: RequestValidationError) -> JSONResponse:
+        # flask_pydantic's shape: errors grouped by where they came from, without FastAPI's location prefix.
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for error in exc.errors():
+            source = {'body': 'body_params', 'query': 'query_params', 'path': 'path_params'}.get(error['loc'][0], 'body_params')
+            groups.setdefault(source, []).append({
+                'loc': list(error['loc'][1:]), 'msg': error['msg'], 'type': error['type'],
+            })
+        return JSONResponse({'validation_error': groups}, status_code=400)
+
+    @app.post('/register', status_code=201)
+    async def register_user(body: UserRequest, request: Request, conn: AsyncConnection = Depends(get_conn)) -> Any:
+        statement = user_table.insert().values(
+            username=body.username,
+            email=body.email,
+            password_hash=await _run_hashing(request, generate_hash, body.password, config.AUTH_HASH_ALGORITHM, config.AUTH_HASH_COST)
+        ).returning(user_table.c.id, user_table.c.username, user_table.c.email)
+        try:
+            new_user = (await conn.execute(statement)).one()
+            await conn.commit()
+        except IntegrityError as exc:
+            await conn.rollback()
+            field = duplicate_user_field(exc)
+            if field is None:
+                raise
+            return JSONResponse({'message': DUPLICATE_MESSAGES[field]}, status_code=400)
+        return User.row_to_json(new_user)
+
+    @app.post('/login')
+    async def login(body: LoginRequest, request: Request, conn: AsyncConnection = Depends(get_conn)) -> Any:
+        user = (await conn.execute(
+            sa.select(user_table.c.id, user_table.c.password_hash).where(user_table.c.username == body.username)
+        )).first()
+        if user is None or not user.password_hash or not await _run_hashing(request, check_hash, user.password_hash, body.password):
+            return JSONResponse({'message': 'Invalid credentials'}, status_code=401)
+        policy = (config.AUTH_HASH_ALGORITHM, config.AUTH_HASH_COST)
+        if needs_rehash(user.password_hash, policy):
+            # Best effort, as in routes/auth.py: the password already checked out.
+            try:
+                password_hash = await _run_hashing(request, generate_hash, body.password, *policy)
+            except HashingBusy:
+                metrics.incr('hashing.rehash_skipped')
+            else:
+                await conn.execute(user_table.update().where(user_table.c.id == user.id).values(password_hash=password_hash))
+                await conn.commit()
+        return {'access_token': _create_token(config, user.id, 'access'), 'refresh_token': _create_token(config, user.id, 'refresh')}
+
+    @app.post('/token/refresh')
+    async def refresh_token(request: Request, conn: AsyncConnection = Depends(get_conn)) -> Any:
+        claims = _token_claims(request, 'refresh')
+        user_id = int(claims['sub'])
+        if not await _user_exists(conn, user_id):
+            return JSONResponse({'message': 'Invalid credentials'}, status_code=401)
+        try:
+            await conn.execute(TokenBlocklist.__table__.insert().values(
+                jti=claims['jti'], expires_at=datetime.fromtimestamp(claims['exp'], timezone.utc)
+            ))
+            await conn.commit()
+        except IntegrityError:
+            await conn.rollback()
+            return JSONResponse({'message': 'Refresh token has already been used'}, status_code=401)
+        return {'access_token': _create_token(config, user_id, 'access'), 'refresh_token': _create_token(config, user_id, 'refresh')}
+
+    @app.post('/tasks', status_code=201)
+    async def create_task(body: TaskRequest, user_id: int = Depends(current_user_id), conn: AsyncConnection = Depends(get_conn)) -> Any:
+        if not await _user_exists(conn, user_id):
+            raise HTTPException(404)
+        statement = task_table.insert().values(
+            title=body.title, description=body.description, status=body.status, user_id=user_id
+        ).returning(*task_table.c)
+        new_task = (await conn.execute(statement)).one()
+        await conn.commit()
+        await tasks_changed(user_id)
+        return Task.row_to_json(new_task)
+
+    @app.post('/tasks/bulk', status_code=201)
+    async def create_tasks_bulk(body: TaskBulkCreateRequest, user_id: int = Depends(current_user_id),
+                                conn: AsyncConnection = Depends(get_conn)) -> Any:
+        if len(body.tasks) > config.TASKS_BULK_MAX_ITEMS:
+            raise InvalidParameter(f'At most {config.TASKS_BULK_MAX_ITEMS} tasks can be created at once')
+        rows, errors = bulk_create_rows(user_id, body.tasks)
+        if not rows:
+            return JSONResponse({'validation_error': {'message': 'No valid tasks to create', 'items': errors}}, status_code=400)
+        if not await _user_exists(conn, user_id):
+            raise HTTPException(404)
+        created = (await conn.execute(sa.insert(task_table).returning(*task_table.c), rows)).all()
+        created.sort(key=lambda row: row.id)
+        await conn.commit()
+        await tasks_changed(user_id)
+        return {'created': len(created), 'tasks': [Task.row_to_json(row) for row in created], 'errors': errors}
+
+    async def bulk_selection(request: Request, conn: AsyncConnection, user_id: int, body: TaskBulkSelector) -> List[Any]:
+        return bulk_selection_clauses(user_id, body, config.TASKS_BULK_MAX_ITEMS, await _search_backend(request, conn))
+
+    @app.patch('/tasks/bulk')
+    async def update_tasks_bulk(body: TaskBulkUpdateRequest, request: Request, user_id: int = Depends(current_user_id),
+                                conn: AsyncConnection = Depends(get_conn)) -> Any:
+        criteria = await bulk_selection(request, conn, user_id, body)
+        result = await conn.execute(sa.update(task_table).where(*criteria).values(**body.changes.model_dump(exclude_none=True)))
+        await conn.commit()
+        if result.rowcount:
+            await tasks_changed(user_id)
+        return {'updated': result.rowcount}
+
+    @app.delete('/tasks/bulk')
+    async def delete_tasks_bulk(body: TaskBulkDeleteRequest, request: Request, user_id: int = Depends(current_user_id),
+                                conn: AsyncConnection = Depends(get_conn)) -> Any:
+        criteria = await bulk_selection(request, conn, user_id, body)
+        result = await conn.execute(sa.delete(task_table).where(*criteria))
+        await conn.commit()
+        if result.rowcount:
+            await tasks_changed(user_id)
+        return {'deleted': result.rowcount}
+
+    @app.get('/tasks')
+    async def get_tasks(request: Request, user_id: int = Depends(current_user_id), conn: AsyncConnection = Depends(get_conn)) -> Any:
+        query = TaskListQuery(user_id, request.query_params, config.TASKS_COUNT_STRATEGY, config.TASKS_COUNT_CAP,
+                              config.TASKS_COUNT_CACHE_TTL, await _search_backend(request, conn))
+        sync_token = encode_sync_token(await conn.scalar(UserTaskStats.change_seq_statement(user_id)))
+        rows = (await conn.execute(query.statement)).all()
+        count_statement = query.count_statement(rows)
+        count = await conn.scalar(count_statement) if count_statement is not None else None
+        return query.payload(rows, count, sync_token)
+
+    @app.get('/tasks/stats')
+    async def get_task_stats(user_id: int = Depends(current_user_id), conn: AsyncConnection = Depends(get_conn)) -> Any:
+        stats_table = UserTaskStats.__table__
+        stats = (await conn.execute(sa.select(stats_table).where(stats_table.c.user_id == user_id))).first()
+        return UserTaskStats.row_to_json(stats)
+
+    @app.get('/tasks/changes')
+    async def get_task_changes(request: Request, user_id: int = Depends(current_user_id),
+                               conn: AsyncConnection = Depends(get_conn)) -> Any:
+        query = TaskChangesQuery(user_id, request.query_params)
+        changes = (await conn.execute(query.statement)).all()
+        rows_statement = query.rows_statement(changes)
+        rows = (await conn.execute(rows_statement)).all() if rows_statement is not None else []
+        return query.payload(changes, rows)
+
+    @app.get('/tasks/export')
+    async def export_tasks(request: Request, user_id: int = Depends(current_user_id)) -> Any:
+        title_filter, description_filter, status_enum, sort_by, sort_order = parse_filter_args(request.query_params)
+        fields = parse_fields(request.query_params) or TASK_FIELDS
+        export_format = request.query_params.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise InvalidParameter('Invalid format parameter')
+
+        async def generate() -> AsyncIterator[bytes]:
+            # The export outlives the request's dependencies, so it keeps its own connection.
+            async with request.app.state.engine.connect() as conn:
+                criteria = task_filter_clauses(user_id, title_filter, description_filter, status_enum, await _search_backend(request, conn))
+                statement = (
+                    sa.select(*(task_table.c[field] for field in fields)).where(*criteria)
+                    .order_by(*order_by_clauses(sort_by, sort_order))
+                    .execution_options(yield_per=config.TASKS_EXPORT_BATCH_SIZE)
+                )
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                if export_format == 'csv':
+                    writer.writerow(fields)
+                    yield buffer.getvalue().encode()
+                result = await conn.stream(statement)
+                async for rows in result.partitions():
+                    if export_format == 'ndjson':
+                        yield b''.join(encode(Task.row_to_json(row, fields)) + b'\n' for row in rows)
+                        continue
+                    buffer.seek(0)
+                    buffer.truncate()
+                    for row in rows:
+                        writer.writerow(csv_value(value) for value in Task.row_to_json(row, fields).values())
+                    yield buffer.getvalue().encode()
+
+        mimetype, filename = EXPORT_FORMATS[export_format]
+        return StreamingResponse(generate(), media_type=mimetype, headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+    @app.post('/tasks/import')
+    async def import_tasks(request: Request, user_id: int = Depends(current_user_id),
+                           conn: AsyncConnection = Depends(get_conn)) -> Any:
+        mimetype = request.headers.get('content-type', '').partition(';')[0].strip().lower()
+        import_format = request.query_params.get('format') or ('csv' if mimetype == 'text/csv' else 'ndjson')
+        if import_format not in EXPORT_FORMATS:
+            raise InvalidParameter('Invalid format parameter')
+        if not await _user_exists(conn, user_id):
+            raise HTTPException(404)
+
+        reader = ImportReader(import_format)
+        task_import = TaskImport(user_id, config.TASKS_IMPORT_BATCH_SIZE, config.TASKS_IMPORT_MAX_ERRORS)
+
+        async def records() -> AsyncIterator[Tuple[int, Optional[dict]]]:
+            # The body is parsed as it arrives, like routes/tasks.py::_read_import_records.
+            async for chunk in request.stream():
+                for record in reader.feed(chunk):
+                    yield record
+            for record in reader.close():
+                yield record
+
+        async def flush(batch: List[dict]) -> None:
+            # Commit per batch so a huge upload never becomes one huge transaction.
+            await conn.execute(sa.insert(task_table), batch)
+            await conn.commit()
+            await tasks_changed(user_id)
+
+        async for line_no, record in records():
+            batch = task_import.add(line_no, record)
+            if batch:
+                await flush(batch)
+        if task_import.batch:
+            await flush(task_import.take())
+        return task_import.payload()
+
+    @app.get('/tasks/{task_id:int}')
+    async def get_task(task_id: int, request: Request, user_id: int = Depends(current_user_id),
+                       conn: AsyncConnection = Depends(get_conn)) -> Any:
+        fields = parse_fields(request.query_params)
+        task = (await conn.execute(
+            sa.select(*task_table.c).where(task_table.c.id == task_id, task_table.c.user_id == user_id)
+        )).first()
+        if task is None:
+            raise HTTPException(404)
+        return Task.row_to_json(task, fields)
+
+    @app.put('/tasks/{task_id:int}')
+    async def update_task(task_id: int, body: TaskRequest, user_id: int = Depends(current_user_id),
+                          conn: AsyncConnection = Depends(get_conn)) -> Any:
+        changes: Dict[str, Any] = {'title': body.title, 'status': body.status}
+        if body.description is not None:
+            changes['description'] = body.description
+        task = (await conn.execute(
+            task_table.update().where(task_table.c.id == task_id, task_table.c.user_id == user_id)
+            .values(**changes).returning(*task_table.c)
+        )).first()
+        if task is None:
+            raise HTTPException(404)
+        await conn.commit()
+        await tasks_changed(user_id)
+        return Task.row_to_json(task)
+
+    @app.delete('/tasks/{task_id:int}')
+    async def delete_task(task_id: int, user_id: int = Depends(current_user_id), conn: AsyncConnection = Depends(get_conn)) -> Any:
+        result = await conn.execute(task_table.delete().where(task_table.c.id == task_id, task_table.c.user_id == user_id))
+        if result.rowcount == 0:
+            raise HTTPException(404)
+        await conn.commit()
+        await tasks_changed(user_id)
+        return {'message': 'Task deleted!'}
+
+    return app
@@ -0,0 +1,100 @@
+"""Compare GET /tasks throughput of the Flask app and the ASGI app under many
+concurrent clients, both served from the same SQLite file.
+
+Flask runs on werkzeug's threaded server and the ASGI app on uvicorn, each in
+a background thread; an httpx.AsyncClient keeps --concurrency requests in
+flight against each in turn.
+
+Usage: python benchmarks/bench_asgi_vs_flask.py [--tasks N] [--concurrency N] [--requests N]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import httpx
+import sqlalchemy as sa
+import uvicorn
+from werkzeug.serving import make_server
+from app import create_app
+from asgi_app import create_asgi_app
+from models import db
+from models.task import Task
+
+def seed(database_uri: str, task_count: int) -> None:
+    app = create_app(database_uri, testing=True)
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        client.post('/register', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'password123'})
+        db.session.execute(sa.insert(Task.__table__), [
+            {'title': f'Task {i}', 'description': f'Description {i}', 'user_id': 1} for i in range(task_count)
+        ])
+        db.session.commit()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def serve_flask(database_uri: str, port: int) -> None:
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', port, create_app(database_uri, testing=True), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def serve_asgi(database_uri: str, port: int) -> None:
+    config = uvicorn.Config(create_asgi_app(database_uri, testing=True), host='127.0.0.1', port=port, log_level='warning')
+    threading.Thread(target=uvicorn.Server(config).run, daemon=True).start()
+
+async def wait_until_up(base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(100):
+            try:
+                await client.post('/login', json={'username': 'bench', 'password': 'password123'})
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError(f'{base_url} did not start')
+
+async def run(base_url: str, concurrency: int, request_count: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        response = await client.post('/login', json={'username': 'bench', 'password': 'password123'})
+        headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+        remaining = iter(range(request_count))
+
+        async def worker() -> None:
+            for _ in remaining:
+                response = await client.get('/tasks', params={'limit': 100}, headers=headers)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return request_count / (time.perf_counter() - started)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = f'sqlite:///{directory}/bench.db'
+        seed(database_uri, args.tasks)
+        for name, serve in (('flask (werkzeug, threaded)', serve_flask), ('asgi (uvicorn)', serve_asgi)):
+            port = free_port()
+            serve(database_uri, port)
+            base_url = f'http://127.0.0.1:{port}'
+            asyncio.run(wait_until_up(base_url))
+            throughput = asyncio.run(run(base_url, args.concurrency, args.requests))
+            print(f'{name:28s} {throughput:8.1f} req/s  (concurrency={args.concurrency}, requests={args.requests})')
+
+if __name__ == '__main__':
+    main()
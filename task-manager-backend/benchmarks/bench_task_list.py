@@ -0,0 +1,67 @@
+"""Compare the ORM and Core read paths behind GET /tasks at limit=100.
+
+Usage: python benchmarks/bench_task_list.py [--tasks N] [--limit N] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import sqlalchemy as sa
+from flask import jsonify
+from app import create_app
+from models import db
+from models.task import Task, TASK_FIELDS
+from models.user import User
+from pagination import order_by_clauses
+from utils import task_filter_clauses
+
+def seed(user_count: int, task_count: int) -> int:
+    users = [User(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(user_count)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.execute(sa.insert(Task.__table__), [
+        {'title': f'Task {i}', 'description': f'Description {i}', 'user_id': users[i % user_count].id}
+        for i in range(task_count)
+    ])
+    db.session.commit()
+    return users[0].id
+
+def orm_page(user_id: int, limit: int) -> bytes:
+    # The path get_tasks used before: hydrate Task instances, to_json, jsonify.
+    tasks = Task.query.filter(*task_filter_clauses(user_id, None, None, None)) \
+        .order_by(*order_by_clauses(None, 'asc')).limit(limit + 1).all()
+    body = jsonify({'tasks': [task.to_json() for task in tasks[:limit]]}).get_data()
+    db.session.remove()
+    return body
+
+def core_page(user_id: int, limit: int) -> bytes:
+    task_table = Task.__table__
+    statement = sa.select(*(task_table.c[field] for field in TASK_FIELDS)) \
+        .where(*task_filter_clauses(user_id, None, None, None)) \
+        .order_by(*order_by_clauses(None, 'asc')).limit(limit + 1)
+    rows = db.session.execute(statement).all()
+    body = jsonify({'tasks': [Task.row_to_json(row) for row in rows[:limit]]}).get_data()
+    db.session.remove()
+    return body
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app('sqlite:///:memory:', testing=True)
+    with app.app_context():
+        db.create_all()
+        user_id = seed(args.users, args.tasks)
+        assert orm_page(user_id, args.limit) == core_page(user_id, args.limit)
+        for name, page in (('orm', orm_page), ('core', core_page)):
+            best = min(timeit.repeat(lambda: page(user_id, args.limit), number=args.repeat, repeat=3))
+            print(f'{name:>5}: {best / args.repeat * 1000:.3f} ms/request')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import hashlib
+import importlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+from flask import Flask, current_app
+import metrics
+
+class CacheBackend(ABC):
+    """Storage for cached task responses.
+
+    Implementations shared between workers (Redis, memcached, ...) let every
+    worker serve hits for bodies another worker rendered, and see version
+    bumps made by any of them.
+    """
+
+    # Whether other workers see what this backend stores.
+    shared = True
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def get_version(self, namespace: str) -> int:
+        ...
+
+    @abstractmethod
+    def bump_version(self, namespace: str) -> int:
+        ...
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU with per-entry TTL. Only correct with a single worker,
+    since other workers never see this process's version bumps."""
+
+    shared = False
+
+    def __init__(self, max_entries: int = 1024, max_versions: int = 100000):
+        self.max_entries = max_entries
+        self.max_versions = max_versions
+        self._entries: 'OrderedDict[str, Tuple[bytes, float]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace: str) -> int:
+        with self._lock:
+            if namespace not in self._versions and len(self._versions) >= self.max_versions:
+                # Forgetting a version would let it restart at a number that
+                # still has bodies cached under it, so drop those too.
+                self._versions.clear()
+                self._entries.clear()
+            version = self._versions.get(namespace, 0) + 1
+            self._versions[namespace] = version
+            return version
+
+class RedisCacheBackend(CacheBackend):
+    """Shared backend over a redis-py client. Version keys carry no TTL so a
+    counter never restarts underneath live cached bodies."""
+
+    def __init__(self, client: Any, prefix: str = 'task-cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    def get_version(self, namespace: str) -> int:
+        return int(self.client.get(f'{self.prefix}version:{namespace}') or 0)
+
+    def bump_version(self, namespace: str) -> int:
+        return int(self.client.incr(f'{self.prefix}version:{namespace}'))
+
+class TaskCache:
+    """Per-user response cache. Keys embed the user's version counter, so a
+    write only has to bump the counter to orphan every cached read."""
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, user_id: int, kind: str, params: Dict[str, Any]) -> str:
+        version = self.backend.get_version(f'user:{user_id}')
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f'tasks:{user_id}:v{version}:{kind}:{digest}'
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        value = self.backend.get(key)
+        metrics.incr('task_cache.hit' if value is not None else 'task_cache.miss')
+        if value is None:
+            return None
+        etag, _, body = value.partition(b'\n')
+        return etag.decode(), body
+
+    def set(self, key: str, etag: str, body: bytes) -> None:
+        # The ETag rides along so a hit can answer If-None-Match by itself.
+        self.backend.set(key, etag.encode() + b'\n' + body, self.ttl)
+
+    def bump(self, user_id: int) -> None:
+        self.backend.bump_version(f'user:{user_id}')
+
+def build_backend(settings: Mapping[str, Any], app: Optional[Flask] = None) -> Optional[CacheBackend]:
+    # settings is app.config, or the Config attributes for the ASGI app.
+    name = settings['TASKS_CACHE_BACKEND']
+    if not name or name == 'none':
+        return None
+    if name == 'memory':
+        return MemoryCacheBackend(max_entries=settings['TASKS_CACHE_MAX_ENTRIES'])
+    if name == 'redis':
+        import redis
+        return RedisCacheBackend(redis.Redis.from_url(settings['TASKS_CACHE_REDIS_URL']))
+    # Anything else is a "package.module:factory" path; the factory gets the app.
+    if app is None:
+        raise RuntimeError('TASKS_CACHE_BACKEND factories are built from the Flask app; use none or redis here')
+    module_name, _, attr = name.partition(':')
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory(app)
+
+def init_cache(app: Flask) -> None:
+    backend = build_backend(app.config, app)
+    app.extensions['task_cache'] = TaskCache(backend, app.config['TASKS_CACHE_TTL']) if backend else None
+
+def get_task_cache() -> Optional[TaskCache]:
+    return current_app.extensions.get('task_cache')
@@ -1,12 +1,91 @@
 import os
+from datetime import timedelta
+from typing import Any, Dict
 from dotenv import load_dotenv
+from sqlalchemy.pool import NullPool
+from db_pool import InstrumentedQueuePool
 
 load_dotenv()
 
+def engine_options_from_env() -> Dict[str, Any]:
+    # DB_POOL_MODE=null opens a connection per checkout and leaves pooling to
+    # pgbouncer; queue keeps a per-worker pool sized by the DB_POOL_* vars.
+    # Unset vars keep SQLAlchemy's defaults.
+    if os.getenv('DB_POOL_MODE', 'queue') == 'null':
+        return {'poolclass': NullPool}
+    options: Dict[str, Any] = {'poolclass': InstrumentedQueuePool}
+    for option, name, cast in (
+        ('pool_size', 'DB_POOL_SIZE', int),
+        ('max_overflow', 'DB_MAX_OVERFLOW', int),
+        ('pool_timeout', 'DB_POOL_TIMEOUT', float),
+        ('pool_recycle', 'DB_POOL_RECYCLE', int),
+    ):
+        if os.getenv(name):
+            options[option] = cast(os.getenv(name))
+    if os.getenv('DB_POOL_PRE_PING'):
+        options['pool_pre_ping'] = os.getenv('DB_POOL_PRE_PING').lower() == 'true'
+    return options
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options_from_env()
+    # Optional read replica for GET /tasks, GET /tasks/<id> and the export.
+    # After a write, that user's reads stay on the primary for
+    # REPLICA_PIN_SECONDS, which should exceed the usual replication lag. The
+    # pins are kept in TASKS_CACHE_BACKEND when it is shared between workers.
+    SQLALCHEMY_REPLICA_URI = os.getenv('DATABASE_REPLICA_URL')
+    REPLICA_PIN_SECONDS = float(os.getenv('REPLICA_PIN_SECONDS', 5))
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
+    # Short-lived access tokens are renewed at /token/refresh, which costs no
+    # password check; only the refresh token's lifetime forces a new login.
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 30)))
+    # Verified claims of this many distinct bearer tokens are kept until the
+    # token expires, so repeat requests skip the signature check; 0 disables.
+    JWT_DECODE_CACHE_SIZE = int(os.getenv('JWT_DECODE_CACHE_SIZE', 4096))
+    # How GET /tasks fills pagination.total: exact, window, capped or cached.
+    # Clients may override it per request with ?count=. exact is an O(1)
+    # user_task_stats lookup unless the list is filtered by title/description.
+    TASKS_COUNT_STRATEGY = os.getenv('TASKS_COUNT_STRATEGY', 'exact')
+    TASKS_COUNT_CAP = int(os.getenv('TASKS_COUNT_CAP', 1000))
+    # Cached totals are only invalidated in the worker that served the write,
+    # so keep this short when running several workers.
+    TASKS_COUNT_CACHE_TTL = int(os.getenv('TASKS_COUNT_CACHE_TTL', 30))
+    # auto picks fts5 on SQLite or trigram on PostgreSQL when the search
+    # objects exist, and plain ILIKE otherwise.
+    TASKS_SEARCH_BACKEND = os.getenv('TASKS_SEARCH_BACKEND', 'auto')
+    # Response cache for GET /tasks and GET /tasks/<id>: none, memory, redis or
+    # a "package.module:factory" path. memory is only safe with one worker.
+    TASKS_CACHE_BACKEND = os.getenv('TASKS_CACHE_BACKEND', 'none')
+    TASKS_CACHE_TTL = int(os.getenv('TASKS_CACHE_TTL', 60))
+    TASKS_CACHE_MAX_ENTRIES = int(os.getenv('TASKS_CACHE_MAX_ENTRIES', 1024))
+    TASKS_CACHE_REDIS_URL = os.getenv('TASKS_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    TASKS_BULK_MAX_ITEMS = int(os.getenv('TASKS_BULK_MAX_ITEMS', 5000))
+    TASKS_EXPORT_BATCH_SIZE = int(os.getenv('TASKS_EXPORT_BATCH_SIZE', 1000))
+    TASKS_IMPORT_BATCH_SIZE = int(os.getenv('TASKS_IMPORT_BATCH_SIZE', 1000))
+    TASKS_IMPORT_MAX_ERRORS = int(os.getenv('TASKS_IMPORT_MAX_ERRORS', 100))
+    # How long a user id confirmed to exist is trusted before the user table is
+    # asked again; 0 disables the cache.
+    AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 60))
+    AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_USER_CACHE_MAX_ENTRIES', 10000))
+    # Password hashing runs in a process pool of AUTH_HASH_WORKERS (0 hashes
+    # inline). At most AUTH_HASH_MAX_QUEUE more jobs may wait; beyond that, and
+    # after AUTH_HASH_TIMEOUT seconds, /login and /register answer 503.
+    AUTH_HASH_WORKERS = int(os.getenv('AUTH_HASH_WORKERS', 2))
+    AUTH_HASH_MAX_QUEUE = int(os.getenv('AUTH_HASH_MAX_QUEUE', 8))
+    AUTH_HASH_TIMEOUT = float(os.getenv('AUTH_HASH_TIMEOUT', 5))
+    # pbkdf2 (cost = iterations), scrypt (cost = N) or bcrypt (cost = log2
+    # rounds); `flask calibrate-hashing` suggests a cost for this host. Users
+    # whose hash is on another policy are rehashed at their next login.
+    AUTH_HASH_ALGORITHM = os.getenv('AUTH_HASH_ALGORITHM', 'scrypt')
+    AUTH_HASH_COST = int(os.getenv('AUTH_HASH_COST', 2 ** 15))
+    # Response encoder: auto (orjson when installed, else stdlib), orjson,
+    # stdlib or a "package.module:Class" JSONProvider path.
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')
+    # GET /metrics is unauthenticated, so only turn it on where the port is
+    # not reachable from outside (e.g. scraped over a private network).
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -14,4 +93,9 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    JWT_SECRET_KEY = 'test-secret-key' 
\ No newline at end of file
+    # In-memory SQLite lives in one connection, so keep its default pool.
+    SQLALCHEMY_ENGINE_OPTIONS: Dict[str, Any] = {}
+    JWT_SECRET_KEY = 'test-secret-key'
+    AUTH_HASH_WORKERS = 0
+    AUTH_HASH_ALGORITHM = 'pbkdf2'
+    AUTH_HASH_COST = 1000 
\ No newline at end of file
@@ -0,0 +1,45 @@
+import time
+from typing import Any
+import sqlalchemy as sa
+from sqlalchemy.pool import QueuePool
+import metrics
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long checkouts wait and how often the pool
+    is exhausted, so pool_size/max_overflow can be sized from real numbers.
+
+    Metrics are named db.pool.<name>.*, where name is the engine's
+    pool_logging_name ('primary' when unset), so the primary and replica
+    engines report separately.
+    """
+
+    @property
+    def metric_prefix(self) -> str:
+        # recreate() passes the logging name on, so it survives dispose().
+        return f"db.pool.{self._orig_logging_name or 'primary'}"
+
+    def capacity(self) -> int:
+        # max_overflow of -1 means unbounded; report the fixed size then.
+        return self.size() + max(self._max_overflow, 0)
+
+    def connect(self) -> Any:
+        if self._max_overflow > -1 and self.checkedout() >= self.capacity():
+            # Every connection is in use, so this checkout has to queue.
+            metrics.incr(f'{self.metric_prefix}.saturated')
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except sa.exc.TimeoutError:
+            metrics.incr(f'{self.metric_prefix}.timeout')
+            raise
+        finally:
+            metrics.observe(f'{self.metric_prefix}.checkout_wait', time.perf_counter() - started)
+            self._report_usage()
+
+    def _do_return_conn(self, record: Any) -> None:
+        super()._do_return_conn(record)
+        self._report_usage()
+
+    def _report_usage(self) -> None:
+        metrics.gauge(f'{self.metric_prefix}.checked_out', self.checkedout())
+        metrics.gauge(f'{self.metric_prefix}.capacity', self.capacity())
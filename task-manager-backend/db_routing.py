@@ -0,0 +1,85 @@
+from functools import wraps
+from typing import Any, Callable
+import sqlalchemy as sa
+from flask import Flask, current_app, g, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+import metrics
+from cache import CacheBackend, MemoryCacheBackend
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica engine while a request has opted in with
+    read_from_replica; everything else, including flushes and any statement
+    with RETURNING, stays on the primary."""
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, bind: Any = None, **kwargs: Any) -> Any:
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and g.get('read_replica', False)
+            and getattr(clause, 'is_select', False)
+        ):
+            replica = current_app.extensions.get('replica_engine')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class ReplicaPins:
+    """Users who wrote recently, as keys in a cache backend that expire when
+    their reads may go back to the replica. On a backend shared between
+    workers (the task cache's Redis, say) a write served by one worker pins
+    the user's reads on all of them; the in-process fallback only pins them
+    in the worker that took the write."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    def pin(self, user_id: int, seconds: float) -> None:
+        if seconds > 0:
+            self.backend.set(f'replica-pin:{user_id}', b'1', seconds)
+
+    def is_pinned(self, user_id: int) -> bool:
+        return self.backend.get(f'replica-pin:{user_id}') is not None
+
+def init_replica_routing(app: Flask) -> None:
+    # Kept out of SQLALCHEMY_BINDS on purpose: a bind would give the replica
+    # its own metadata, and create_all/drop_all would try to manage it.
+    # Call after init_cache, whose backend holds the pins when it is shared.
+    replica_uri = app.config['SQLALCHEMY_REPLICA_URI']
+    app.extensions['replica_engine'] = sa.create_engine(
+        replica_uri, pool_logging_name='replica', **app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    ) if replica_uri else None
+    if not replica_uri:
+        app.extensions['replica_pins'] = None
+        return
+    cache = app.extensions.get('task_cache')
+    if cache is not None and cache.backend.shared:
+        app.extensions['replica_pins'] = ReplicaPins(cache.backend)
+    else:
+        app.extensions['replica_pins'] = ReplicaPins(MemoryCacheBackend(max_entries=10000))
+
+def pin_to_primary(user_id: int) -> None:
+    # Call on every write, so the user reads their own changes even while the
+    # replica lags behind.
+    pins = current_app.extensions.get('replica_pins')
+    if pins is not None:
+        pins.pin(user_id, current_app.config['REPLICA_PIN_SECONDS'])
+
+def served_by_replica() -> bool:
+    # True while the current request reads from the replica, which may not
+    # have the writes behind the user's latest cache version yet.
+    return g.get('read_replica', False)
+
+def read_from_replica(view: Callable) -> Callable:
+    # Goes below @jwt_required(), since the pin is looked up by user.
+    @wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        pins = current_app.extensions.get('replica_pins')
+        if pins is not None:
+            if pins.is_pinned(int(get_jwt_identity())):
+                metrics.incr('replica.pinned')
+            else:
+                g.read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
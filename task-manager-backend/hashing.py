@@ -0,0 +1,189 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional, Tuple
+import bcrypt
+import click
+from flask import Flask, current_app, has_app_context
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+import metrics
+from config import Config
+
+HASH_ALGORITHMS = ['pbkdf2', 'scrypt', 'bcrypt']
+# Where calibration starts, and how each algorithm's cost is stepped up:
+# pbkdf2 counts iterations, scrypt takes N (a power of two), bcrypt log2 rounds.
+_MIN_COSTS = {'pbkdf2': 10000, 'scrypt': 2 ** 10, 'bcrypt': 4}
+_MAX_COSTS = {'pbkdf2': 10 ** 8, 'scrypt': 2 ** 20, 'bcrypt': 31}
+# bcrypt only ever looks at the first 72 bytes; cut explicitly so newer
+# releases of the library, which refuse longer input, behave the same.
+_BCRYPT_MAX_BYTES = 72
+
+class HashingBusy(ServiceUnavailable):
+    description = 'Too many authentication requests, try again shortly'
+
+class HashingExecutor:
+    """Runs password hashing in a small process pool.
+
+    Only max_workers + max_queue jobs may be in flight; past that, submit
+    fails straight away with HashingBusy rather than queueing, so a burst of
+    logins turns into quick 503s instead of request workers stuck behind
+    PBKDF2 (and, with threaded servers, the GIL).
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, timeout: float):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Started on first use, so pre-forking servers create it in each worker
+        # rather than sharing one inherited across fork. spawn keeps the
+        # children from inheriting the parent's threads and DB connections.
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> 'Future[Any]':
+        if not self._slots.acquire(blocking=False):
+            metrics.incr('hashing.rejected')
+            raise HashingBusy(retry_after=1)
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is only freed once the job really finishes, even if this
+        # request has already given up on it.
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        submitted = time.perf_counter()
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            metrics.incr('hashing.timeout')
+            raise HashingBusy(retry_after=1)
+        finally:
+            metrics.observe('hashing.wait', time.perf_counter() - submitted)
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """run() for the ASGI app: same slots and 503s, awaited instead of
+        blocking the event loop."""
+        submitted = time.perf_counter()
+        future = self._submit(fn, *args)
+        try:
+            # shield: as in run(), giving up does not cancel the job.
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            metrics.incr('hashing.timeout')
+            raise HashingBusy(retry_after=1)
+        finally:
+            metrics.observe('hashing.wait', time.perf_counter() - submitted)
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+def init_hashing(app: Flask) -> None:
+    if app.config['AUTH_HASH_ALGORITHM'] not in HASH_ALGORITHMS:
+        raise RuntimeError(f"AUTH_HASH_ALGORITHM must be one of {', '.join(HASH_ALGORITHMS)}")
+    app.cli.add_command(calibrate_command)
+    workers = app.config['AUTH_HASH_WORKERS']
+    app.extensions['hashing'] = HashingExecutor(
+        workers, app.config['AUTH_HASH_MAX_QUEUE'], app.config['AUTH_HASH_TIMEOUT']
+    ) if workers > 0 else None
+
+def generate_hash(password: str, algorithm: str, cost: int) -> str:
+    if algorithm == 'bcrypt':
+        return bcrypt.hashpw(password.encode()[:_BCRYPT_MAX_BYTES], bcrypt.gensalt(cost)).decode()
+    if algorithm == 'scrypt':
+        return generate_password_hash(password, method=f'scrypt:{cost}:8:1')
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{cost}')
+
+def check_hash(password_hash: str, password: str) -> bool:
+    if password_hash.startswith('$2'):
+        return bcrypt.checkpw(password.encode()[:_BCRYPT_MAX_BYTES], password_hash.encode())
+    return check_password_hash(password_hash, password)
+
+def hash_policy(password_hash: str) -> Optional[Tuple[str, int]]:
+    # bcrypt: $2b$<rounds>$...; werkzeug: pbkdf2:sha256:<iterations>$... or scrypt:<n>:<r>:<p>$...
+    try:
+        if password_hash.startswith('$2'):
+            return 'bcrypt', int(password_hash.split('$')[2])
+        method = password_hash.split('$', 1)[0].split(':')
+        if method[0] == 'pbkdf2' and method[1] == 'sha256':
+            return 'pbkdf2', int(method[2])
+        if method[0] == 'scrypt' and method[2:] == ['8', '1']:
+            return 'scrypt', int(method[1])
+    except (IndexError, ValueError):
+        pass
+    return None
+
+def current_policy() -> Tuple[str, int]:
+    if has_app_context():
+        return current_app.config['AUTH_HASH_ALGORITHM'], current_app.config['AUTH_HASH_COST']
+    return Config.AUTH_HASH_ALGORITHM, Config.AUTH_HASH_COST
+
+def needs_rehash(password_hash: str, policy: Optional[Tuple[str, int]] = None) -> bool:
+    # policy defaults to the app's; the ASGI app, which has no Flask app, passes its own.
+    return hash_policy(password_hash) != (policy or current_policy())
+
+def _run(fn: Callable[..., Any], *args: Any) -> Any:
+    executor = current_app.extensions.get('hashing') if has_app_context() else None
+    if executor is None:
+        return fn(*args)
+    return executor.run(fn, *args)
+
+def hash_password(password: str) -> str:
+    return _run(generate_hash, password, *current_policy())
+
+def verify_password(password_hash: str, password: str) -> bool:
+    return _run(check_hash, password_hash, password)
+
+def _time_hash(algorithm: str, cost: int, rounds: int = 3) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_hash('calibration-password', algorithm, cost)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def calibrate(algorithm: str, target_seconds: float) -> Tuple[int, float]:
+    """Highest cost whose hash still takes no longer than target_seconds on
+    this host, with the time it took (never below the algorithm's minimum)."""
+    cost = _MIN_COSTS[algorithm]
+    elapsed = _time_hash(algorithm, cost)
+    while cost < _MAX_COSTS[algorithm]:
+        next_cost = cost + 1 if algorithm == 'bcrypt' else cost * 2
+        next_elapsed = _time_hash(algorithm, next_cost)
+        if next_elapsed > target_seconds:
+            break
+        cost, elapsed = next_cost, next_elapsed
+    if algorithm == 'pbkdf2' and elapsed > 0:
+        # PBKDF2 scales linearly with iterations, so close the gap the doubling left.
+        cost = max(cost, int(cost * target_seconds / elapsed) // 1000 * 1000)
+        elapsed = _time_hash(algorithm, cost)
+    return cost, elapsed
+
+@click.command('calibrate-hashing')
+@click.option('--algorithm', type=click.Choice(HASH_ALGORITHMS), default=None,
+              help='Algorithm to calibrate (default: AUTH_HASH_ALGORITHM).')
+@click.option('--target-ms', type=float, default=250, show_default=True,
+              help='Time one hash should take on this host.')
+def calibrate_command(algorithm: Optional[str], target_ms: float) -> None:
+    """Pick a password hashing cost for a target latency on this host."""
+    algorithm = algorithm or current_app.config['AUTH_HASH_ALGORITHM']
+    cost, elapsed = calibrate(algorithm, target_ms / 1000)
+    click.echo(f'# {algorithm} at cost {cost} takes {elapsed * 1000:.0f} ms here')
+    click.echo(f'AUTH_HASH_ALGORITHM={algorithm}')
+    click.echo(f'AUTH_HASH_COST={cost}')
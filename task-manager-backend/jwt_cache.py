@@ -0,0 +1,74 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from flask import Flask
+from flask_jwt_extended import JWTManager
+import metrics
+
+class DecodedTokenCache:
+    """Bounded LRU of verified claims, keyed by a digest of the raw token.
+
+    An entry is only ever created from a token that passed full verification,
+    and it is dropped once the token's exp (plus leeway) has passed, so a hit
+    never accepts anything a fresh decode would refuse.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[bytes, Tuple[dict, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(encoded_token: str) -> bytes:
+        return hashlib.sha256(encoded_token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: bytes, claims: dict, expires: float) -> None:
+        with self._lock:
+            self._entries[key] = (claims, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that verifies each distinct bearer token once and then
+    serves its claims from a DecodedTokenCache until the token expires."""
+
+    def init_app(self, app: Flask, add_context_processor: bool = False) -> None:
+        super().init_app(app, add_context_processor)
+        self._leeway = app.config['JWT_DECODE_LEEWAY']
+        self._decoded = DecodedTokenCache(app.config['JWT_DECODE_CACHE_SIZE'])
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        # Cookie tokens (CSRF-checked per request) and expired-token lookups
+        # always take the full path.
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        key = self._decoded.key(encoded_token)
+        claims = self._decoded.get(key)
+        if claims is not None:
+            metrics.incr('jwt_cache.hit')
+            return dict(claims)
+        metrics.incr('jwt_cache.miss')
+        claims = super()._decode_jwt_from_config(encoded_token)
+        expires = claims['exp'] + self._leeway if 'exp' in claims else math.inf
+        self._decoded.set(key, claims, expires)
+        return dict(claims)
+
+def create_jwt_manager(app: Flask) -> JWTManager:
+    if app.config['JWT_DECODE_CACHE_SIZE'] > 0:
+        return CachingJWTManager(app)
+    return JWTManager(app)
@@ -0,0 +1,41 @@
+import threading
+from typing import Dict, List
+
+# Per-process counters and timings. Each worker keeps its own numbers; scrape
+# every worker (or sum them) to get a deployment-wide view.
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_timings: Dict[str, List[float]] = {}
+_gauges: Dict[str, float] = {}
+
+def incr(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name: str, seconds: float) -> None:
+    with _lock:
+        timing = _timings.setdefault(name, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+def gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'gauges': dict(_gauges),
+            'timings': {
+                name: {'count': int(count), 'total_ms': total * 1000, 'max_ms': peak * 1000}
+                for name, (count, total, peak) in _timings.items()
+            },
+        }
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+        _gauges.clear()
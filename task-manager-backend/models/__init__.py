@@ -1,7 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Import models so they are registered with SQLAlchemy's metadata
 from .user import User
-from .task import Task 
\ No newline at end of file
+from .task import Task
+from .task_search import task_fts
+from .token_blocklist import TokenBlocklist
+from .user_task_stats import UserTaskStats
+from .task_changes import TaskTombstone
@@ -2,14 +2,35 @@ from models import db
 from datetime import datetime, timezone
 from schemas.task import TaskStatus
 import sqlalchemy as sa
+from typing import Any, Optional, Sequence
 
 class Task(db.Model):
+    # Every list query is scoped to one user, so each index leads with user_id
+    # and ends with id, the pagination tie-breaker. Keep in sync with the
+    # b7d41c9e2a10, d91f2c7b5e3a, a8c4e6f1b9d3 and c9d2e4f6a8b1 migrations.
+    # AUTOINCREMENT keeps SQLite from handing a deleted id to a new task,
+    # which sync clients would take for the deleted one coming back.
+    __table_args__ = (
+        db.Index('ix_task_user_id_created_at', 'user_id', 'created_at', 'id'),
+        db.Index('ix_task_user_id_status_created_at', 'user_id', 'status', 'created_at', 'id'),
+        db.Index('ix_task_user_id_status', 'user_id', 'status', 'id'),
+        db.Index('ix_task_user_id_title', 'user_id', 'title', 'id'),
+        db.Index('ix_task_user_id_description', 'user_id', sa.text("coalesce(description, '')"), 'id'),
+        db.Index('ix_task_user_id_updated_at', 'user_id', 'updated_at'),
+        db.Index('ix_task_user_id_change_seq', 'user_id', 'change_seq'),
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(50), nullable=False)
     description = db.Column(db.String(200))
     status = db.Column(sa.Enum(TaskStatus, name="taskstatus"), nullable=False, default=TaskStatus.TODO)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
+    # Position of the task's latest write in its user's change sequence; set
+    # by triggers, see models/task_changes.py.
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default='0')
 
     def __init__(self, title: str, user_id: int, description: str = '', status: TaskStatus = TaskStatus.TODO):
         self.title = title
@@ -18,11 +39,24 @@ class Task(db.Model):
         self.status = status
 
     def to_json(self) -> dict:
+        return Task.row_to_json(self)
+
+    @staticmethod
+    def row_to_json(row: Any, fields: Optional[Sequence[str]] = None) -> dict:
+        # Accepts a Task or a Core row carrying the same columns. With fields,
+        # only those keys are read, so columns that were never loaded stay untouched.
+        # Values are left as stored (TaskStatus, datetime); the app's JSON
+        # provider writes them out, see json_provider.py.
+        if fields is not None:
+            return {field: getattr(row, field) for field in fields}
         return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'status': self.status.value,
-            'user_id': self.user_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        } 
\ No newline at end of file
+            'id': row.id,
+            'title': row.title,
+            'description': row.description,
+            'status': row.status,
+            'user_id': row.user_id,
+            'created_at': row.created_at,
+            'updated_at': row.updated_at
+        }
+
+TASK_FIELDS = ['id', 'title', 'description', 'status', 'user_id', 'created_at', 'updated_at']
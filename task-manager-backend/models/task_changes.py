@@ -0,0 +1,77 @@
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+from models import db
+
+# Every insert, update and delete of a task takes the next number from its
+# user's user_task_stats.change_seq and stamps it on the row (or, for a
+# delete, on a tombstone). Bumping the counter locks the user's stats row
+# until commit, so one user's writes commit in sequence order and a client
+# that has seen number N has seen everything up to N.
+
+class TaskTombstone(db.Model):
+    # The last trace of a deleted task, for GET /tasks/changes.
+    __tablename__ = 'task_tombstone'
+    __table_args__ = (
+        db.Index('ix_task_tombstone_user_id_change_seq', 'user_id', 'change_seq'),
+    )
+
+    # Keyed per user, so a task id one user deleted can never overwrite (and
+    # hide) another user's tombstone.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    task_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    change_seq = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, server_default=sa.func.current_timestamp())
+
+def _sqlite_bump(row: str) -> str:
+    return (
+        f'INSERT INTO user_task_stats (user_id, change_seq) VALUES ({row}.user_id, 1) '
+        'ON CONFLICT (user_id) DO UPDATE SET change_seq = user_task_stats.change_seq + 1; '
+    )
+
+def _sqlite_stamp(row: str) -> str:
+    return f'UPDATE task SET change_seq = (SELECT change_seq FROM user_task_stats WHERE user_id = {row}.user_id) WHERE id = {row}.id; '
+
+# SQLite cannot assign NEW in a trigger, so the number is written back with
+# a second UPDATE; the WHEN clause keeps that UPDATE from counting as a change.
+SQLITE_CHANGES_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS task_changes_ai AFTER INSERT ON task BEGIN "
+    + _sqlite_bump('new') + _sqlite_stamp('new') + "END",
+    "CREATE TRIGGER IF NOT EXISTS task_changes_au AFTER UPDATE ON task WHEN new.change_seq IS old.change_seq BEGIN "
+    + _sqlite_bump('new') + _sqlite_stamp('new') + "END",
+    "CREATE TRIGGER IF NOT EXISTS task_changes_ad AFTER DELETE ON task BEGIN "
+    + _sqlite_bump('old') +
+    "INSERT INTO task_tombstone (task_id, user_id, change_seq, deleted_at) "
+    "VALUES (old.id, old.user_id, (SELECT change_seq FROM user_task_stats WHERE user_id = old.user_id), CURRENT_TIMESTAMP) "
+    "ON CONFLICT (user_id, task_id) DO UPDATE SET change_seq = excluded.change_seq, deleted_at = excluded.deleted_at; "
+    "END",
+]
+
+_POSTGRESQL_BUMP = (
+    "INSERT INTO user_task_stats (user_id, change_seq) VALUES ({row}.user_id, 1) "
+    "ON CONFLICT (user_id) DO UPDATE SET change_seq = user_task_stats.change_seq + 1 "
+    "RETURNING change_seq INTO {target};"
+)
+
+POSTGRESQL_CHANGES_DDL = [
+    "CREATE OR REPLACE FUNCTION task_changes_stamp() RETURNS trigger AS $$ BEGIN "
+    + _POSTGRESQL_BUMP.format(row='NEW', target='NEW.change_seq') +
+    " RETURN NEW; END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE FUNCTION task_changes_tombstone() RETURNS trigger AS $$ DECLARE seq bigint; BEGIN "
+    + _POSTGRESQL_BUMP.format(row='OLD', target='seq') +
+    " INSERT INTO task_tombstone (task_id, user_id, change_seq, deleted_at) VALUES (OLD.id, OLD.user_id, seq, now()) "
+    "ON CONFLICT (user_id, task_id) DO UPDATE SET change_seq = excluded.change_seq, deleted_at = excluded.deleted_at; "
+    "RETURN OLD; END $$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS task_changes_biu ON task",
+    "CREATE TRIGGER task_changes_biu BEFORE INSERT OR UPDATE ON task FOR EACH ROW EXECUTE FUNCTION task_changes_stamp()",
+    "DROP TRIGGER IF EXISTS task_changes_ad ON task",
+    "CREATE TRIGGER task_changes_ad AFTER DELETE ON task FOR EACH ROW EXECUTE FUNCTION task_changes_tombstone()",
+]
+
+@sa.event.listens_for(db.metadata, 'after_create')
+def _create_change_triggers(target: sa.MetaData, conn: Connection, **kw) -> None:
+    if conn.dialect.name == 'sqlite':
+        for statement in SQLITE_CHANGES_DDL:
+            conn.exec_driver_sql(statement)
+    elif conn.dialect.name == 'postgresql':
+        for statement in POSTGRESQL_CHANGES_DDL:
+            conn.exec_driver_sql(statement)
@@ -0,0 +1,63 @@
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+from models.task import Task
+
+# FTS5 shadow of task.title/task.description for SQLite. It is an external
+# content table, so it stores only the trigram index and reads column values
+# back from task; the triggers below keep it in step with every write.
+task_fts = sa.Table(
+    'task_fts', sa.MetaData(),
+    sa.Column('rowid', sa.Integer, primary_key=True),
+    sa.Column('title', sa.String),
+    sa.Column('description', sa.String),
+)
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    "title, description, content='task', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+]
+
+POSTGRESQL_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_task_title_trgm ON task USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_task_description_trgm ON task USING gin (description gin_trgm_ops)",
+]
+
+def sqlite_supports_trigram_fts(conn: Connection) -> bool:
+    # The trigram tokenizer arrived in SQLite 3.34.
+    version = tuple(int(part) for part in conn.exec_driver_sql('SELECT sqlite_version()').scalar().split('.'))
+    if version < (3, 34):
+        return False
+    options = {row[0] for row in conn.exec_driver_sql('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+@sa.event.listens_for(Task.__table__, 'after_create')
+def _create_search_objects(target: sa.Table, conn: Connection, **kw) -> None:
+    if conn.dialect.name == 'sqlite' and sqlite_supports_trigram_fts(conn):
+        for statement in SQLITE_FTS_DDL:
+            conn.exec_driver_sql(statement)
+    elif conn.dialect.name == 'postgresql':
+        # Creating an extension needs privileges the app role may not have;
+        # without it, searches fall back to unindexed ILIKE.
+        try:
+            with conn.begin_nested():
+                for statement in POSTGRESQL_TRGM_DDL:
+                    conn.exec_driver_sql(statement)
+        except sa.exc.DBAPIError:
+            pass
+
+@sa.event.listens_for(Task.__table__, 'after_drop')
+def _drop_search_objects(target: sa.Table, conn: Connection, **kw) -> None:
+    # The triggers go away with task itself; the virtual table does not.
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('DROP TABLE IF EXISTS task_fts')
@@ -0,0 +1,9 @@
+from models import db
+
+class TokenBlocklist(db.Model):
+    # Refresh tokens already exchanged at /token/refresh. The unique jti is
+    # what makes each refresh token single use; a row is only needed until
+    # the token it names would have expired anyway.
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -1,5 +1,6 @@
+from typing import Any
 from models import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from hashing import hash_password, verify_password, needs_rehash
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,14 +14,22 @@ class User(db.Model):
         self.email = email
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        return needs_rehash(self.password_hash)
 
     def to_json(self) -> dict:
+        return User.row_to_json(self)
+
+    @staticmethod
+    def row_to_json(row: Any) -> dict:
+        # Accepts a User or a Core row with the same columns.
         return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
+            'id': row.id,
+            'username': row.username,
+            'email': row.email,
         } 
\ No newline at end of file
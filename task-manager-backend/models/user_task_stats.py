@@ -0,0 +1,125 @@
+from typing import Any, Optional
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+from models import db
+from schemas.task import TaskStatus
+
+class UserTaskStats(db.Model):
+    # One row per user with a task, holding how many of their tasks are in
+    # each status. Triggers on task (below, and in the f3b6c2d8a4e1
+    # migration) keep it exact inside the writing transaction, whichever
+    # code path or app made the write.
+    __tablename__ = 'user_task_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    todo = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    inprogress = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    done = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Last change sequence number handed out for this user's tasks, see
+    # models/task_changes.py.
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+
+    @staticmethod
+    def count_statement(user_id: int, status: Optional[TaskStatus] = None) -> sa.Select:
+        # The user's task count, optionally for one status: a primary key
+        # lookup instead of a COUNT(*) over their tasks. No row means no tasks.
+        table = UserTaskStats.__table__
+        if status is not None:
+            expression = table.c[status.value]
+        else:
+            expression = sum((table.c[member.value] for member in TaskStatus), sa.literal(0))
+        return sa.select(sa.func.coalesce(sa.select(expression).where(table.c.user_id == user_id).scalar_subquery(), 0))
+
+    @staticmethod
+    def change_seq_statement(user_id: int) -> sa.Select:
+        table = UserTaskStats.__table__
+        return sa.select(sa.func.coalesce(sa.select(table.c.change_seq).where(table.c.user_id == user_id).scalar_subquery(), 0))
+
+    @staticmethod
+    def row_to_json(row: Any) -> dict:
+        by_status = {member.value: getattr(row, member.value) if row is not None else 0 for member in TaskStatus}
+        return {'total': sum(by_status.values()), 'by_status': by_status}
+
+def _status_sums(delta: str) -> str:
+    # Enum columns store the member name.
+    return ', '.join(f"sum(CASE WHEN status = '{member.name}' THEN {delta} ELSE 0 END)" for member in TaskStatus)
+
+_COLUMNS = ', '.join(member.value for member in TaskStatus)
+_ADD_EXCLUDED = ', '.join(f'{member.value} = user_task_stats.{member.value} + excluded.{member.value}' for member in TaskStatus)
+
+def _sqlite_upsert(row: str, sign: str) -> str:
+    values = ', '.join(f"{sign}({row}.status = '{member.name}')" for member in TaskStatus)
+    return (
+        f'INSERT INTO user_task_stats (user_id, {_COLUMNS}) VALUES ({row}.user_id, {values}) '
+        f'ON CONFLICT (user_id) DO UPDATE SET {_ADD_EXCLUDED}; '
+    )
+
+# SQLite triggers are per row; an update only touches the counters when it
+# moves a task to another status or user.
+SQLITE_STATS_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS user_task_stats_ai AFTER INSERT ON task BEGIN "
+    + _sqlite_upsert('new', '+') + "END",
+    "CREATE TRIGGER IF NOT EXISTS user_task_stats_ad AFTER DELETE ON task BEGIN "
+    + _sqlite_upsert('old', '-') + "END",
+    "CREATE TRIGGER IF NOT EXISTS user_task_stats_au AFTER UPDATE OF status, user_id ON task "
+    "WHEN old.status IS NOT new.status OR old.user_id IS NOT new.user_id BEGIN "
+    + _sqlite_upsert('old', '-') + _sqlite_upsert('new', '+') + "END",
+]
+
+def _postgresql_upsert(changes: str) -> str:
+    return (
+        f'INSERT INTO user_task_stats (user_id, {_COLUMNS}) '
+        f'SELECT user_id, {_status_sums("delta")} FROM ({changes}) AS changes GROUP BY user_id '
+        f'ON CONFLICT (user_id) DO UPDATE SET {_ADD_EXCLUDED};'
+    )
+
+_MOVED = 'FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE n.status <> o.status OR n.user_id <> o.user_id'
+
+# PostgreSQL triggers are per statement and read the transition tables, so a
+# bulk write costs one upsert per affected user rather than one per task.
+POSTGRESQL_STATS_DDL = [
+    "CREATE OR REPLACE FUNCTION user_task_stats_apply() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'INSERT' THEN "
+    + _postgresql_upsert('SELECT user_id, status, 1 AS delta FROM new_rows') +
+    " ELSIF TG_OP = 'DELETE' THEN "
+    + _postgresql_upsert('SELECT user_id, status, -1 AS delta FROM old_rows') +
+    " ELSE "
+    + _postgresql_upsert(f'SELECT n.user_id, n.status, 1 AS delta {_MOVED} '
+                         f'UNION ALL SELECT o.user_id, o.status, -1 AS delta {_MOVED}') +
+    " END IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS user_task_stats_ai ON task",
+    "CREATE TRIGGER user_task_stats_ai AFTER INSERT ON task "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION user_task_stats_apply()",
+    "DROP TRIGGER IF EXISTS user_task_stats_ad ON task",
+    "CREATE TRIGGER user_task_stats_ad AFTER DELETE ON task "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION user_task_stats_apply()",
+    "DROP TRIGGER IF EXISTS user_task_stats_au ON task",
+    "CREATE TRIGGER user_task_stats_au AFTER UPDATE ON task "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION user_task_stats_apply()",
+]
+
+def rebuild_task_stats(conn: Connection) -> int:
+    """Recompute every user's counters from the task table, in the caller's
+    transaction; returns the number of users with tasks."""
+    if conn.dialect.name == 'postgresql':
+        # Writers wait until the rebuild commits, so none of their trigger
+        # updates land between the reset and the recount.
+        conn.exec_driver_sql('LOCK TABLE task IN SHARE MODE')
+    # Rows are reset rather than deleted, which would restart change_seq.
+    conn.execute(sa.update(UserTaskStats.__table__).values({member.value: 0 for member in TaskStatus}))
+    set_counts = ', '.join(f'{member.value} = excluded.{member.value}' for member in TaskStatus)
+    return conn.exec_driver_sql(
+        f'INSERT INTO user_task_stats (user_id, {_COLUMNS}) SELECT user_id, {_status_sums("1")} FROM task WHERE true GROUP BY user_id '
+        f'ON CONFLICT (user_id) DO UPDATE SET {set_counts}'
+    ).rowcount
+
+@sa.event.listens_for(db.metadata, 'after_create')
+def _create_stats_triggers(target: sa.MetaData, conn: Connection, **kw) -> None:
+    # On the metadata rather than a table, since the triggers need both task
+    # and user_task_stats to exist.
+    if conn.dialect.name == 'sqlite':
+        for statement in SQLITE_STATS_DDL:
+            conn.exec_driver_sql(statement)
+    elif conn.dialect.name == 'postgresql':
+        for statement in POSTGRESQL_STATS_DDL:
+            conn.exec_driver_sql(statement)
@@ -0,0 +1,379 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import sqlalchemy as sa
+from models.task import Task, TASK_FIELDS
+from models.task_changes import TaskTombstone
+from models.user_task_stats import UserTaskStats
+from schemas.task import TaskStatus
+from utils import InvalidParameter, task_filter_clauses
+
+SORT_FIELDS = ['title', 'description', 'status', 'created_at']
+COUNT_STRATEGIES = ['exact', 'window', 'capped', 'cached']
+
+_CACHED_TOTALS_MAX_USERS = 10000
+_cached_totals: Dict[int, Tuple[int, float]] = {}
+_cached_totals_lock = threading.Lock()
+
+class InvalidCursor(ValueError):
+    pass
+
+def sort_expression(sort_by: Optional[str]) -> Any:
+    # description is nullable; coalescing keeps NULLs comparable so keyset
+    # predicates never skip rows. The literal (not a bound '') lets the
+    # expression match the index defined on it.
+    if sort_by == 'description':
+        return sa.func.coalesce(Task.description, sa.literal_column("''"))
+    return getattr(Task, sort_by or 'created_at')
+
+def is_descending(sort_by: Optional[str], sort_order: str) -> bool:
+    # Without sort_by the list is newest first regardless of sort_order.
+    return sort_by is None or sort_order == 'desc'
+
+def order_by_clauses(sort_by: Optional[str], sort_order: str) -> List[Any]:
+    expr = sort_expression(sort_by)
+    if is_descending(sort_by, sort_order):
+        return [expr.desc(), Task.id.desc()]
+    return [expr.asc(), Task.id.asc()]
+
+def _sort_key(sort_by: Optional[str], sort_order: str) -> str:
+    return f"{sort_by or 'created_at'}:{'desc' if is_descending(sort_by, sort_order) else 'asc'}"
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, TaskStatus):
+        return value.value
+    return value
+
+def _load_value(sort_by: Optional[str], value: Any) -> Any:
+    if sort_by in (None, 'created_at'):
+        return datetime.fromisoformat(value)
+    if sort_by == 'status':
+        return TaskStatus(value)
+    if not isinstance(value, str):
+        raise ValueError('Unexpected cursor value')
+    return value
+
+def encode_cursor(sort_by: Optional[str], sort_order: str, value: Any, task_id: int) -> str:
+    payload = {'k': _sort_key(sort_by, sort_order), 'v': _dump_value(value), 'i': task_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str, sort_by: Optional[str], sort_order: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload['k'] != _sort_key(sort_by, sort_order):
+            raise InvalidCursor('Cursor does not match the requested sort')
+        task_id = payload['i']
+        if not isinstance(task_id, int):
+            raise InvalidCursor('Malformed cursor')
+        return _load_value(sort_by, payload['v']), task_id
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor('Malformed cursor') from exc
+
+def cursor_for_row(row: Any, sort_by: Optional[str], sort_order: str) -> str:
+    value = getattr(row, sort_by or 'created_at')
+    if sort_by == 'description' and value is None:
+        value = ''
+    return encode_cursor(sort_by, sort_order, value, row.id)
+
+def keyset_filter(sort_by: Optional[str], sort_order: str, value: Any, task_id: int) -> Any:
+    expr = sort_expression(sort_by)
+    row = sa.tuple_(expr, Task.id)
+    after = sa.tuple_(sa.literal(value, type_=expr.type), sa.literal(task_id, type_=Task.id.type))
+    if is_descending(sort_by, sort_order):
+        return row < after
+    return row > after
+
+def encode_sync_token(change_seq: int) -> str:
+    raw = json.dumps({'s': change_seq}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_sync_token(token: str) -> int:
+    # An empty token asks for every change from the beginning.
+    if not token:
+        return 0
+    try:
+        change_seq = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))['s']
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor('Malformed sync token') from exc
+    if not isinstance(change_seq, int) or change_seq < 0:
+        raise InvalidCursor('Malformed sync token')
+    return change_seq
+
+def changes_statement(user_id: int, since: int, limit: int) -> Any:
+    # (change_seq, id, deleted) for the user's writes after since, oldest
+    # first. Both sides are range scans on a (user_id, change_seq) index that
+    # stop after limit + 1 rows, and one statement sees one snapshot of both.
+    task_table = Task.__table__
+    tombstone_table = TaskTombstone.__table__
+    live = (
+        sa.select(task_table.c.change_seq, task_table.c.id, sa.literal(False).label('deleted'))
+        .where(task_table.c.user_id == user_id, task_table.c.change_seq > since)
+        .order_by(task_table.c.change_seq)
+        .limit(limit + 1)
+        .subquery()
+    )
+    gone = (
+        sa.select(tombstone_table.c.change_seq, tombstone_table.c.task_id.label('id'), sa.literal(True).label('deleted'))
+        .where(tombstone_table.c.user_id == user_id, tombstone_table.c.change_seq > since)
+        .order_by(tombstone_table.c.change_seq)
+        .limit(limit + 1)
+        .subquery()
+    )
+    changes = sa.union_all(sa.select(live), sa.select(gone)).subquery()
+    return sa.select(changes).order_by(changes.c.change_seq).limit(limit + 1)
+
+def get_cached_total(user_id: int) -> Optional[int]:
+    with _cached_totals_lock:
+        entry = _cached_totals.get(user_id)
+    if entry is None or entry[1] < time.monotonic():
+        return None
+    return entry[0]
+
+def set_cached_total(user_id: int, total: int, ttl: float) -> None:
+    with _cached_totals_lock:
+        if len(_cached_totals) >= _CACHED_TOTALS_MAX_USERS:
+            _cached_totals.clear()
+        _cached_totals[user_id] = (total, time.monotonic() + ttl)
+
+def invalidate_cached_total(user_id: int) -> None:
+    with _cached_totals_lock:
+        _cached_totals.pop(user_id, None)
+
+def parse_filter_args(args: Mapping[str, str]) -> Tuple[Optional[str], Optional[str], Optional[TaskStatus], Optional[str], str]:
+    # (title, description, status, sort_by, sort_order) from a query string,
+    # shared by GET /tasks and GET /tasks/export in both apps.
+    sort_by = args.get('sort_by') or None
+    sort_order = args.get('sort_order', 'asc')
+    status_filter = args.get('status')
+    
+    if sort_by and sort_by not in SORT_FIELDS:
+        raise InvalidParameter('Invalid sort_by parameter')
+    
+    if sort_order not in ['asc', 'desc']:
+        raise InvalidParameter('Invalid sort_order parameter')
+    
+    status_enum = None
+    if status_filter:
+        try:
+            status_enum = TaskStatus(status_filter)
+        except ValueError:
+            raise InvalidParameter('Invalid status parameter')
+    
+    return args.get('title') or None, args.get('description') or None, status_enum, sort_by, sort_order
+
+def parse_fields(args: Mapping[str, str]) -> Optional[List[str]]:
+    fields_arg = args.get('fields')
+    if not fields_arg:
+        return None
+    requested = {field.strip() for field in fields_arg.split(',') if field.strip()}
+    if not requested or not requested.issubset(TASK_FIELDS):
+        raise InvalidParameter('Invalid fields parameter')
+    return [field for field in TASK_FIELDS if field in requested]
+
+class TaskListQuery:
+    """One GET /tasks page, planned without touching the database so the
+    Flask and ASGI apps differ only in how they run the statements:
+
+        rows = run(query.statement)
+        count_statement = query.count_statement(rows)
+        count = run(count_statement) if count_statement is not None else None
+        body = query.payload(rows, count, sync_token)
+
+    Parameter errors raise InvalidParameter from the constructor.
+    """
+
+    def __init__(self, user_id: int, args: Mapping[str, str], default_count: str, count_cap: int,
+                 count_cache_ttl: float, search_backend: Optional[str] = None):
+        self.user_id = user_id
+        self.title, self.description, self.status, self.sort_by, self.sort_order = parse_filter_args(args)
+        self.fields = parse_fields(args)
+        self.page_no = int(args.get('page_no', 1))
+        self.limit = int(args.get('limit', 10))
+        self.cursor = args.get('cursor')
+        self.count_strategy = args.get('count', default_count)
+        self.count_cap = count_cap
+        self.count_cache_ttl = count_cache_ttl
+        self._cached_total: Optional[int] = None
+        
+        if self.count_strategy not in COUNT_STRATEGIES:
+            raise InvalidParameter('Invalid count parameter')
+        
+        if self.page_no < 1:
+            raise InvalidParameter('page_no must be at least 1')
+        
+        if self.limit < 1 or self.limit > 100:
+            raise InvalidParameter('limit must be between 1 and 100')
+        
+        task_table = Task.__table__
+        self.criteria = task_filter_clauses(user_id, self.title, self.description, self.status, search_backend)
+        self.is_filtered = bool(self.title or self.description or self.status)
+        if self.title or self.description:
+            self._exact_count = sa.select(sa.func.count()).select_from(task_table).where(*self.criteria)
+        else:
+            # With at most a status filter, user_task_stats already holds the answer.
+            self._exact_count = UserTaskStats.count_statement(user_id, self.status)
+        
+        # Core rows go straight into the payload: no Task instances are built.
+        selected = TASK_FIELDS if not self.fields else [
+            # id and the sort column are selected too, since next_cursor is built from them.
+            field for field in TASK_FIELDS if field in self.fields or field in ('id', self.sort_by or 'created_at')
+        ]
+        statement = (
+            sa.select(*(task_table.c[field] for field in selected))
+            .where(*self.criteria)
+            .order_by(*order_by_clauses(self.sort_by, self.sort_order))
+        )
+        if self.cursor:
+            try:
+                value, last_id = decode_cursor(self.cursor, self.sort_by, self.sort_order)
+            except InvalidCursor:
+                raise InvalidParameter('Invalid cursor parameter')
+            statement = statement.where(keyset_filter(self.sort_by, self.sort_order, value, last_id))
+        elif self.cursor is None:
+            statement = statement.offset((self.page_no - 1) * self.limit)
+        # One extra row tells us whether another page exists without relying on the total.
+        statement = statement.limit(self.limit + 1)
+        if self.count_strategy == 'window':
+            statement = statement.add_columns(sa.func.count().over().label('window_total'))
+        self.statement = statement
+    
+    def cache_params(self) -> Dict[str, Any]:
+        # Everything that shapes the response, for cache keys and ETags.
+        return {
+            'title': self.title,
+            'description': self.description,
+            'status': self.status.value if self.status else None,
+            'sort_by': self.sort_by,
+            'sort_order': self.sort_order,
+            'page_no': self.page_no if self.cursor is None else None,
+            'limit': self.limit,
+            'cursor': self.cursor,
+            'count': self.count_strategy,
+            'fields': self.fields
+        }
+    
+    def count_statement(self, rows: List[Any]) -> Optional[Any]:
+        # What is left to run for pagination.total once the page is in, or
+        # None when the page (or the cached total) already settled it.
+        if self.count_strategy == 'window':
+            # The window counts every match unless the page came up empty, and
+            # after a cursor it only sees the rows that follow it.
+            if self.cursor or rows or (self.page_no == 1 and self.cursor is None):
+                return None
+            return self._exact_count
+        if self.count_strategy == 'capped':
+            # Stops counting one row past the cap, so "exactly cap" and "more
+            # than cap" can be told apart.
+            bounded = sa.select(Task.id).where(*self.criteria).limit(self.count_cap + 1).subquery()
+            return sa.select(sa.func.count()).select_from(bounded)
+        if self.count_strategy == 'cached' and not self.is_filtered:
+            self._cached_total = get_cached_total(self.user_id)
+            if self._cached_total is not None:
+                return None
+        return self._exact_count
+    
+    def _total(self, rows: List[Any], count: Optional[int]) -> Tuple[Optional[int], bool]:
+        if self.count_strategy == 'window':
+            if rows and not self.cursor:
+                return rows[0].window_total, True
+            if not rows and self.page_no == 1 and self.cursor is None:
+                return 0, True
+            if not self.cursor:
+                return count, True
+            return None, False
+        if self.count_strategy == 'capped':
+            return min(count, self.count_cap), count <= self.count_cap
+        if self._cached_total is not None:
+            return self._cached_total, True
+        if self.count_strategy == 'cached' and not self.is_filtered:
+            set_cached_total(self.user_id, count, self.count_cache_ttl)
+        return count, True
+    
+    def payload(self, rows: List[Any], count: Optional[int], sync_token: str) -> Dict[str, Any]:
+        total_count, total_exact = self._total(rows, count)
+        has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        next_cursor = cursor_for_row(rows[-1], self.sort_by, self.sort_order) if has_next else None
+        
+        if self.cursor is not None:
+            pagination_info = {
+                'limit': self.limit,
+                'total': total_count,
+                'total_exact': total_exact,
+                'cursor': self.cursor or None,
+                'next_cursor': next_cursor,
+                'has_next': has_next,
+                'has_prev': bool(self.cursor)
+            }
+            if self.count_strategy == 'window' and self.cursor:
+                pagination_info['remaining'] = rows[0].window_total if rows else 0
+        else:
+            pagination_info = {
+                'page_no': self.page_no,
+                'limit': self.limit,
+                'total': total_count,
+                'total_exact': total_exact,
+                'total_pages': (total_count + self.limit - 1) // self.limit,
+                'has_next': has_next,
+                'has_prev': self.page_no > 1,
+                'next_cursor': next_cursor
+            }
+        
+        return {
+            'tasks': [Task.row_to_json(row, self.fields) for row in rows],
+            'pagination': pagination_info,
+            'sync_token': sync_token
+        }
+
+class TaskChangesQuery:
+    """GET /tasks/changes, planned like TaskListQuery:
+
+        changes = run(query.statement)
+        rows_statement = query.rows_statement(changes)
+        rows = run(rows_statement) if rows_statement is not None else []
+        body = query.payload(changes, rows)
+    """
+
+    def __init__(self, user_id: int, args: Mapping[str, str]):
+        self.user_id = user_id
+        self.limit = int(args.get('limit', 100))
+        
+        if self.limit < 1 or self.limit > 100:
+            raise InvalidParameter('limit must be between 1 and 100')
+        
+        try:
+            self.since = decode_sync_token(args.get('since', ''))
+        except InvalidCursor:
+            raise InvalidParameter('Invalid since parameter')
+        
+        self.statement = changes_statement(user_id, self.since, self.limit)
+    
+    def rows_statement(self, changes: List[Any]) -> Optional[Any]:
+        # Tasks are read as they are now; one changed again since the snapshot
+        # above is sent in its newer state, and one deleted since then is left
+        # for its tombstone on the next sync.
+        live_ids = [change.id for change in changes[:self.limit] if not change.deleted]
+        if not live_ids:
+            return None
+        task_table = Task.__table__
+        return sa.select(*task_table.c).where(task_table.c.user_id == self.user_id, task_table.c.id.in_(live_ids))
+    
+    def payload(self, changes: List[Any], rows: List[Any]) -> Dict[str, Any]:
+        has_more = len(changes) > self.limit
+        changes = changes[:self.limit]
+        rows_by_id = {row.id: row for row in rows}
+        return {
+            'tasks': [Task.row_to_json(rows_by_id[change.id]) for change in changes if not change.deleted and change.id in rows_by_id],
+            'deleted': [change.id for change in changes if change.deleted],
+            'next_since': encode_sync_token(changes[-1].change_seq if changes else self.since),
+            'has_more': has_more
+        }
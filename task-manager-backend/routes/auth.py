@@ -1,30 +1,45 @@
 from flask import Blueprint, jsonify, Response
 from flask_pydantic import validate
 from models.user import User
+from models.token_blocklist import TokenBlocklist
 from models import db
 from schemas.user import UserRequest, LoginRequest
-from flask_jwt_extended import create_access_token
-from utils import check_username_exists, check_email_exists
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt, jwt_required
+from sqlalchemy.exc import IntegrityError
+from utils import DUPLICATE_MESSAGES, duplicate_user_field, remember_user, user_exists
+from hashing import HashingBusy, hash_password
+from datetime import datetime, timezone
 from typing import Tuple
+import click
+import metrics
+import sqlalchemy as sa
 
 bp = Blueprint('auth', __name__)
 
 @bp.route('/register', methods=['POST'])
 @validate()
 def register_user(body: UserRequest) -> Tuple[Response, int]:
-    if check_username_exists(body.username):
-        return jsonify({'message': 'Username already exists'}), 400
+    # Insert first and let the unique constraints reject duplicates: one
+    # statement on success, and no window between a check and the insert.
+    user_table = User.__table__
+    statement = user_table.insert().values(
+        username=body.username,
+        email=body.email,
+        password_hash=hash_password(body.password)
+    ).returning(user_table.c.id, user_table.c.username, user_table.c.email)
     
-    if check_email_exists(body.email):
-        return jsonify({'message': 'Email already registered'}), 400
+    try:
+        new_user = db.session.execute(statement).one()
+        db.session.commit()
+    except IntegrityError as exc:
+        db.session.rollback()
+        field = duplicate_user_field(exc)
+        if field is None:
+            raise
+        return jsonify({'message': DUPLICATE_MESSAGES[field]}), 400
     
-    new_user = User(username=body.username, email=body.email)
-    new_user.set_password(body.password)
-    
-    db.session.add(new_user)
-    db.session.commit()
-    
-    return jsonify(new_user.to_json()), 201
+    remember_user(new_user.id)
+    return jsonify(User.row_to_json(new_user)), 201
 
 @bp.route('/login', methods=['POST'])
 @validate()
@@ -32,7 +47,52 @@ def login(body: LoginRequest) -> Tuple[Response, int]:
     user = User.query.filter_by(username=body.username).first()
     
     if user and user.check_password(body.password):
-        access_token = create_access_token(identity=str(user.id))
-        return jsonify(access_token=access_token), 200
+        # The plaintext is only in hand right now, so this is the one chance
+        # to move the user onto the current hashing policy.
+        if user.password_needs_rehash():
+            try:
+                user.set_password(body.password)
+            except HashingBusy:
+                # The password already checked out; with the pool full, the
+                # upgrade waits for a later login instead of failing this one.
+                metrics.incr('hashing.rehash_skipped')
+            else:
+                db.session.commit()
+        remember_user(user.id)
+        return jsonify(
+            access_token=create_access_token(identity=str(user.id)),
+            refresh_token=create_refresh_token(identity=str(user.id))
+        ), 200
+    
+    return jsonify({'message': 'Invalid credentials'}), 401
+
+@bp.route('/token/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_token() -> Tuple[Response, int]:
+    claims = get_jwt()
+    user_id = int(claims['sub'])
     
-    return jsonify({'message': 'Invalid credentials'}), 401 
\ No newline at end of file
+    if not user_exists(user_id):
+        return jsonify({'message': 'Invalid credentials'}), 401
+    
+    # Rotation: the presented token is retired by inserting its jti. The
+    # unique constraint makes that the check too, so a replayed (or
+    # concurrently reused) refresh token loses the race and gets a 401.
+    db.session.add(TokenBlocklist(jti=claims['jti'], expires_at=datetime.fromtimestamp(claims['exp'], timezone.utc)))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Refresh token has already been used'}), 401
+    
+    return jsonify(
+        access_token=create_access_token(identity=str(user_id)),
+        refresh_token=create_refresh_token(identity=str(user_id))
+    ), 200
+
+@bp.cli.command('purge-token-blocklist')
+def purge_token_blocklist() -> None:
+    """Delete blocklist rows for refresh tokens that have expired anyway."""
+    result = db.session.execute(sa.delete(TokenBlocklist).where(TokenBlocklist.expires_at < datetime.now(timezone.utc)))
+    db.session.commit()
+    click.echo(f'Purged {result.rowcount} expired tokens') 
\ No newline at end of file
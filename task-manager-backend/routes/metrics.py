@@ -0,0 +1,10 @@
+from flask import Blueprint, jsonify, abort, Response, current_app
+import metrics
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics() -> Response:
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    return jsonify(metrics.snapshot())
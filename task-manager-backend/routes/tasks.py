@@ -1,159 +1,376 @@
-from flask import Blueprint, jsonify, abort, Response, request
+from flask import Blueprint, jsonify, abort, Response, request, current_app, stream_with_context
 from flask_pydantic import validate
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.task import Task
+from models.task import Task, TASK_FIELDS
+from models.user_task_stats import UserTaskStats, rebuild_task_stats
 from models import db
-from schemas.task import TaskRequest, TaskStatus
-from utils import get_user_by_id, get_task_by_id_and_user
-from typing import Tuple
-from sqlalchemy.orm import Query
+from schemas.task import TaskRequest, TaskBulkCreateRequest, TaskBulkUpdateRequest, TaskBulkDeleteRequest
+from utils import (
+    EXPORT_FORMATS, IMPORT_CHUNK_SIZE, ImportReader, TaskImport, user_exists, get_task_by_id_and_user, task_filter_clauses,
+    bulk_selection_clauses, bulk_create_rows, csv_value
+)
+from pagination import (
+    TaskListQuery, TaskChangesQuery, order_by_clauses, parse_filter_args, parse_fields, encode_sync_token, invalidate_cached_total
+)
+from cache import get_task_cache
+from db_routing import pin_to_primary, read_from_replica, served_by_replica
+from typing import Iterator, List, Optional, Tuple
+import click
+import csv
+import hashlib
+import io
+import json
+import sqlalchemy as sa
 
 bp = Blueprint('tasks', __name__)
 
+def _tasks_changed(user_id: int) -> None:
+    # Call after the write has committed, so no reader can cache the old rows
+    # under the new version.
+    invalidate_cached_total(user_id)
+    pin_to_primary(user_id)
+    cache = get_task_cache()
+    if cache:
+        cache.bump(user_id)
+
+def _make_etag(*parts: object) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def _conditional_response(etag: str, body: Optional[bytes] = None) -> Response:
+    # If the client already holds this version, skip the body altogether.
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    response.set_etag(etag)
+    return response
+
 @bp.route('/tasks', methods=['POST'])
 @jwt_required()
 @validate()
 def create_task(body: TaskRequest) -> Tuple[Response, int]:
 
     current_user_id = int(get_jwt_identity())
-    user = get_user_by_id(current_user_id)
-    
-    if user is None:
+    if not user_exists(current_user_id):
         abort(404, description='User not found')
     
-    new_task = Task(
-        title=body.title, 
-        description=body.description, 
+    # RETURNING hands back the row, so nothing is re-read after the commit.
+    task_table = Task.__table__
+    statement = task_table.insert().values(
+        title=body.title,
+        description=body.description,
         status=body.status,
         user_id=current_user_id
+    ).returning(*task_table.c)
+    new_task = db.session.execute(statement).one()
+    
+    db.session.commit()
+    _tasks_changed(current_user_id)
+    
+    return jsonify(Task.row_to_json(new_task)), 201
+
+@bp.route('/tasks/bulk', methods=['POST'])
+@jwt_required()
+@validate()
+def create_tasks_bulk(body: TaskBulkCreateRequest) -> Tuple[Response, int]:
+
+    current_user_id = int(get_jwt_identity())
+    max_items = current_app.config['TASKS_BULK_MAX_ITEMS']
+    
+    if len(body.tasks) > max_items:
+        abort(400, description=f'At most {max_items} tasks can be created at once')
+    
+    rows, errors = bulk_create_rows(current_user_id, body.tasks)
+    
+    if not rows:
+        return jsonify({'validation_error': {'message': 'No valid tasks to create', 'items': errors}}), 400
+    
+    if not user_exists(current_user_id):
+        abort(404, description='User not found')
+    
+    # SQLAlchemy folds these parameter sets into multi-row INSERT ... RETURNING
+    # statements, all inside the one transaction committed below. Asking for
+    # RETURNING in parameter order would make it fall back to one row per
+    # statement here, so order by the generated ids instead.
+    task_table = Task.__table__
+    created = db.session.execute(
+        sa.insert(task_table).returning(*task_table.c),
+        rows
+    ).all()
+    created.sort(key=lambda row: row.id)
+    db.session.commit()
+    _tasks_changed(current_user_id)
+    
+    return jsonify({
+        'created': len(created),
+        'tasks': [Task.row_to_json(row) for row in created],
+        'errors': errors
+    }), 201
+
+@bp.route('/tasks/bulk', methods=['PATCH'])
+@jwt_required()
+@validate()
+def update_tasks_bulk(body: TaskBulkUpdateRequest) -> Response:
+
+    current_user_id = int(get_jwt_identity())
+    criteria = bulk_selection_clauses(current_user_id, body, current_app.config['TASKS_BULK_MAX_ITEMS'])
+    
+    result = db.session.execute(
+        sa.update(Task.__table__).where(*criteria).values(**body.changes.model_dump(exclude_none=True))
     )
+    db.session.commit()
+    if result.rowcount:
+        _tasks_changed(current_user_id)
     
-    db.session.add(new_task)
+    return jsonify({'updated': result.rowcount})
+
+@bp.route('/tasks/bulk', methods=['DELETE'])
+@jwt_required()
+@validate()
+def delete_tasks_bulk(body: TaskBulkDeleteRequest) -> Response:
+
+    current_user_id = int(get_jwt_identity())
+    criteria = bulk_selection_clauses(current_user_id, body, current_app.config['TASKS_BULK_MAX_ITEMS'])
+    
+    result = db.session.execute(sa.delete(Task.__table__).where(*criteria))
     db.session.commit()
+    if result.rowcount:
+        _tasks_changed(current_user_id)
     
-    return jsonify(new_task.to_json()), 201
+    return jsonify({'deleted': result.rowcount})
 
 @bp.route('/tasks', methods=['GET'])
 @jwt_required()
+@read_from_replica
 def get_tasks() -> Response:
 
     current_user_id = int(get_jwt_identity())
+    query = TaskListQuery(
+        current_user_id,
+        request.args,
+        current_app.config['TASKS_COUNT_STRATEGY'],
+        current_app.config['TASKS_COUNT_CAP'],
+        current_app.config['TASKS_COUNT_CACHE_TTL']
+    )
+    list_params = query.cache_params()
+    cache = get_task_cache()
+    if cache:
+        cache_key = cache.key(current_user_id, 'list', list_params)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _conditional_response(*cached)
+    
+    # change_seq moves on every insert, update and delete of the user's tasks
+    # (see models/task_changes.py), so it versions the list with one primary
+    # key lookup. It is read before the page, so any write that lands in
+    # between is replayed by the next /tasks/changes rather than missed.
+    change_seq = db.session.execute(UserTaskStats.change_seq_statement(current_user_id)).scalar()
+    etag = _make_etag('list', current_user_id, list_params, change_seq)
+    if request.if_none_match.contains_weak(etag):
+        return _conditional_response(etag)
+    
+    rows = db.session.execute(query.statement).all()
+    count_statement = query.count_statement(rows)
+    count = db.session.execute(count_statement).scalar() if count_statement is not None else None
+    body = current_app.json.dumps(query.payload(rows, count, encode_sync_token(change_seq))).encode() + b'\n'
+    # A lagging replica could file a body older than the version it is
+    # keyed under, so only primary reads are cached.
+    if cache and not served_by_replica():
+        cache.set(cache_key, etag, body)
+    return _conditional_response(etag, body)
+
+@bp.route('/tasks/stats', methods=['GET'])
+@jwt_required()
+@read_from_replica
+def get_task_stats() -> Response:
+
+    current_user_id = int(get_jwt_identity())
+    stats_table = UserTaskStats.__table__
+    stats = db.session.execute(sa.select(stats_table).where(stats_table.c.user_id == current_user_id)).first()
     
-    title_filter = request.args.get('title')
-    description_filter = request.args.get('description')
-    status_filter = request.args.get('status')
-    sort_by = request.args.get('sort_by')
-    sort_order = request.args.get('sort_order', 'asc')
-    page_no = int(request.args.get('page_no', 1))
-    limit = int(request.args.get('limit', 10))
-    
-    if sort_by and sort_by not in ['title', 'description', 'status', 'created_at']:
-        abort(400, description='Invalid sort_by parameter')
-    
-    if sort_order not in ['asc', 'desc']:
-        abort(400, description='Invalid sort_order parameter')
-    
-    if status_filter:
-        try:
-            status_enum = TaskStatus(status_filter)
-        except ValueError:
-            abort(400, description='Invalid status parameter')
-    else:
-        status_enum = None
+    return jsonify(UserTaskStats.row_to_json(stats))
+
+@bp.route('/tasks/changes', methods=['GET'])
+@jwt_required()
+@read_from_replica
+def get_task_changes() -> Response:
+
+    current_user_id = int(get_jwt_identity())
+    query = TaskChangesQuery(current_user_id, request.args)
     
-    if page_no < 1:
-        abort(400, description='page_no must be at least 1')
+    changes = db.session.execute(query.statement).all()
+    rows_statement = query.rows_statement(changes)
+    rows = db.session.execute(rows_statement).all() if rows_statement is not None else []
     
-    if limit < 1 or limit > 100:
-        abort(400, description='limit must be between 1 and 100')
+    return jsonify(query.payload(changes, rows))
+
+@bp.cli.command('rebuild-task-stats')
+def rebuild_task_stats_command() -> None:
+    """Recompute user_task_stats from the task table."""
+    with db.engine.begin() as conn:
+        users = rebuild_task_stats(conn)
+    click.echo(f'Rebuilt task stats for {users} users')
+
+@bp.route('/tasks/export', methods=['GET'])
+@jwt_required()
+@read_from_replica
+def export_tasks() -> Response:
+
+    current_user_id = int(get_jwt_identity())
+    title_filter, description_filter, status_enum, sort_by, sort_order = parse_filter_args(request.args)
+    fields = parse_fields(request.args) or TASK_FIELDS
+    export_format = request.args.get('format', 'ndjson')
     
-    query_obj: Query = Task.query.filter_by(user_id=current_user_id)
+    if export_format not in EXPORT_FORMATS:
+        abort(400, description='Invalid format parameter')
     
-    if title_filter:
-        query_obj = query_obj.filter(Task.title.ilike(f'%{title_filter}%'))  # type: ignore
+    # yield_per streams rows through a server-side cursor where the driver
+    # supports one, so memory stays flat however many tasks the user has.
+    statement = (
+        sa.select(*(Task.__table__.c[field] for field in fields))
+        .where(*task_filter_clauses(current_user_id, title_filter, description_filter, status_enum))
+        .order_by(*order_by_clauses(sort_by, sort_order))
+        .execution_options(yield_per=current_app.config['TASKS_EXPORT_BATCH_SIZE'])
+    )
     
-    if description_filter:
-        query_obj = query_obj.filter(Task.description.ilike(f'%{description_filter}%'))  # type: ignore
+    def generate_ndjson() -> Iterator[str]:
+        for rows in db.session.execute(statement).partitions():
+            yield ''.join(current_app.json.dumps(Task.row_to_json(row, fields)) + '\n' for row in rows)
     
-    if status_enum:
-        query_obj = query_obj.filter(Task.status == status_enum)  # type: ignore
+    def generate_csv() -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue()
+        for rows in db.session.execute(statement).partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            for row in rows:
+                writer.writerow(csv_value(value) for value in Task.row_to_json(row, fields).values())
+            yield buffer.getvalue()
     
-    if sort_by:
-        sort_column = getattr(Task, sort_by)
-        if sort_order == 'desc':
-            sort_column = sort_column.desc()
-        query_obj = query_obj.order_by(sort_column)
-    else:
-        query_obj = query_obj.order_by(Task.created_at.desc())
+    mimetype, filename = EXPORT_FORMATS[export_format]
+    generate = generate_ndjson if export_format == 'ndjson' else generate_csv
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def _read_import_records(import_format: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    # Parses the body as it arrives; see utils.ImportReader.
+    reader = ImportReader(import_format)
+    for chunk in iter(lambda: request.stream.read(IMPORT_CHUNK_SIZE), b''):
+        yield from reader.feed(chunk)
+    yield from reader.close()
+
+@bp.route('/tasks/import', methods=['POST'])
+@jwt_required()
+def import_tasks() -> Response:
+
+    current_user_id = int(get_jwt_identity())
+    import_format = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    
+    if import_format not in EXPORT_FORMATS:
+        abort(400, description='Invalid format parameter')
     
-    total_count = query_obj.count()
+    if not user_exists(current_user_id):
+        abort(404, description='User not found')
     
-    offset = (page_no - 1) * limit
-    query_obj = query_obj.offset(offset).limit(limit)
+    task_import = TaskImport(current_user_id, current_app.config['TASKS_IMPORT_BATCH_SIZE'],
+                             current_app.config['TASKS_IMPORT_MAX_ERRORS'])
     
-    tasks = query_obj.all()
-    tasks_list = [task.to_json() for task in tasks]
+    def flush(batch: List[dict]) -> None:
+        # Commit per batch so a huge upload never becomes one huge transaction.
+        db.session.execute(sa.insert(Task.__table__), batch)
+        db.session.commit()
+        _tasks_changed(current_user_id)
     
-    total_pages = (total_count + limit - 1) // limit
-    has_next = page_no < total_pages
-    has_prev = page_no > 1
+    for line_no, record in _read_import_records(import_format):
+        batch = task_import.add(line_no, record)
+        if batch:
+            flush(batch)
     
-    pagination_info = {
-        'page_no': page_no,
-        'limit': limit,
-        'total': total_count,
-        'total_pages': total_pages,
-        'has_next': has_next,
-        'has_prev': has_prev
-    }
+    if task_import.batch:
+        flush(task_import.take())
     
-    return jsonify({
-        'tasks': tasks_list,
-        'pagination': pagination_info
-    })
+    return jsonify(task_import.payload())
 
-@bp.route('/tasks/<task_id>', methods=['GET'])
+@bp.route('/tasks/<int:task_id>', methods=['GET'])
 @jwt_required()
+@read_from_replica
 def get_task(task_id: int) -> Response:
 
     current_user_id = int(get_jwt_identity())
-    task = get_task_by_id_and_user(task_id, current_user_id)
+    fields = parse_fields(request.args)
+    
+    cache = get_task_cache()
+    if cache:
+        cache_key = cache.key(current_user_id, 'task', {'id': task_id, 'fields': fields})
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _conditional_response(*cached)
+    
+    # updated_at is always loaded because the ETag is built from it.
+    columns = sorted(set(fields) | {'updated_at'}) if fields else None
+    task = get_task_by_id_and_user(task_id, current_user_id, columns)
     
     if task is None:
         abort(404, description='Task not found')
     
-    return jsonify(task.to_json())
+    etag = _make_etag('task', task.id, task.updated_at, fields)
+    if request.if_none_match.contains_weak(etag):
+        return _conditional_response(etag)
+    
+    body = current_app.json.dumps(Task.row_to_json(task, fields)).encode() + b'\n'
+    if cache and not served_by_replica():
+        cache.set(cache_key, etag, body)
+    return _conditional_response(etag, body)
 
-@bp.route('/tasks/<task_id>', methods=['PUT'])
+@bp.route('/tasks/<int:task_id>', methods=['PUT'])
 @jwt_required()
 @validate()
 def update_task(task_id: int, body: TaskRequest) -> Response:
 
     current_user_id = int(get_jwt_identity())
-    task = get_task_by_id_and_user(task_id, current_user_id)
+    task_table = Task.__table__
+    
+    changes = {'title': body.title, 'status': body.status}
+    if body.description is not None:
+        changes['description'] = body.description
+    
+    # Scoping by user_id means another user's task is simply "no row", so one
+    # statement both authorizes and writes. The ORM-enabled form keeps any
+    # copy already in the session in step.
+    statement = (
+        sa.update(Task)
+        .where(Task.id == task_id, Task.user_id == current_user_id)
+        .values(**changes)
+        .returning(*task_table.c)
+    )
+    task = db.session.execute(statement).first()
     
     if task is None:
         abort(404, description='Task not found')
     
-    task.title = body.title
-    task.description = body.description if body.description is not None else task.description
-    task.status = body.status
-    
     db.session.commit()
+    _tasks_changed(current_user_id)
     
-    return jsonify(task.to_json())
+    return jsonify(Task.row_to_json(task))
 
-@bp.route('/tasks/<task_id>', methods=['DELETE'])
+@bp.route('/tasks/<int:task_id>', methods=['DELETE'])
 @jwt_required()
 def delete_task(task_id: int) -> Response:
 
     current_user_id = int(get_jwt_identity())
-    task = get_task_by_id_and_user(task_id, current_user_id)
     
-    if task is None:
+    statement = sa.delete(Task).where(Task.id == task_id, Task.user_id == current_user_id)
+    result = db.session.execute(statement)
+    
+    if result.rowcount == 0:
         abort(404, description='Task not found')
     
-    db.session.delete(task)
     db.session.commit()
+    _tasks_changed(current_user_id)
     
-    return jsonify({'message': 'Task deleted!'}) 
\ No newline at end of file
+    return jsonify({'message': 'Task deleted!'}) 
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from pydantic_core import PydanticCustomError
+from typing import Any, List, Optional
 from enum import Enum
 
 class TaskStatus(str, Enum):
@@ -21,4 +22,53 @@ class TaskFilterParams(BaseModel):
 
 class TaskPaginationParams(BaseModel):
     page_no: int = Field(1, ge=1)
-    limit: int = Field(10, ge=1, le=100) 
\ No newline at end of file
+    limit: int = Field(10, ge=1, le=100)
+
+class TaskBulkCreateRequest(BaseModel):
+    # Items are validated one by one against TaskRequest so errors can be
+    # reported per item, including items that are not objects at all.
+    tasks: List[Any] = Field(..., min_length=1)
+
+class TaskBulkFilter(BaseModel):
+    # Same grammar as the GET /tasks query parameters.
+    title: Optional[str] = Field(None, max_length=50)
+    description: Optional[str] = Field(None, max_length=200)
+    status: Optional[TaskStatus] = Field(None)
+    # An empty filter matches every task, so that has to be asked for by name.
+    all: bool = Field(False)
+
+    @model_validator(mode='after')
+    def check_not_empty(self) -> 'TaskBulkFilter':
+        # Empty strings are ignored like in GET /tasks, so they do not count.
+        if not (self.title or self.description or self.status or self.all):
+            raise PydanticCustomError('bulk_filter', 'Provide at least one filter criterion, or "all": true')
+        return self
+
+class TaskBulkSelector(BaseModel):
+    ids: Optional[List[int]] = Field(None, min_length=1)
+    filter: Optional[TaskBulkFilter] = Field(None)
+
+    @model_validator(mode='after')
+    def check_one_selector(self) -> 'TaskBulkSelector':
+        if (self.ids is None) == (self.filter is None):
+            # A plain ValueError would put the exception object in the error context,
+            # which the 400 response cannot serialize.
+            raise PydanticCustomError('bulk_selector', 'Provide exactly one of ids or filter')
+        return self
+
+class TaskBulkChanges(BaseModel):
+    title: Optional[str] = Field(None, min_length=1, max_length=50)
+    description: Optional[str] = Field(None, max_length=200)
+    status: Optional[TaskStatus] = Field(None)
+
+    @model_validator(mode='after')
+    def check_not_empty(self) -> 'TaskBulkChanges':
+        if self.title is None and self.description is None and self.status is None:
+            raise PydanticCustomError('bulk_changes', 'Provide at least one field to change')
+        return self
+
+class TaskBulkUpdateRequest(TaskBulkSelector):
+    changes: TaskBulkChanges
+
+class TaskBulkDeleteRequest(TaskBulkSelector):
+    pass
@@ -0,0 +1,44 @@
+from typing import Any, Optional
+from weakref import WeakKeyDictionary
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.engine import Connection, Engine
+from models import db
+from models.task import Task
+from models.task_search import task_fts
+
+TRIGRAM_LENGTH = 3
+
+_detected_backends: 'WeakKeyDictionary[Engine, str]' = WeakKeyDictionary()
+
+def detect_backend(conn: Connection) -> str:
+    if conn.dialect.name == 'postgresql':
+        installed = conn.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first()
+        return 'trigram' if installed else 'ilike'
+    if conn.dialect.name == 'sqlite':
+        exists = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_fts'").first()
+        return 'fts5' if exists else 'ilike'
+    return 'ilike'
+
+def search_backend() -> str:
+    configured = current_app.config['TASKS_SEARCH_BACKEND']
+    if configured != 'auto':
+        return configured
+    engine = db.engine
+    backend = _detected_backends.get(engine)
+    if backend is None:
+        with engine.connect() as conn:
+            backend = _detected_backends[engine] = detect_backend(conn)
+    return backend
+
+def substring_match(field: str, term: str, backend: Optional[str] = None) -> Any:
+    # Case-insensitive substring match on a task column. The FTS5 trigram
+    # tokenizer folds case and answers LIKE from its index; pg_trgm GIN indexes
+    # serve ILIKE directly, so trigram and ilike differ only in the index behind them.
+    # Terms shorter than a trigram cannot use the FTS5 index: it would scan
+    # every user's rows and misses some non-ASCII matches, so those go
+    # through the user-scoped ILIKE instead.
+    pattern = f'%{term}%'
+    if len(term) >= TRIGRAM_LENGTH and (backend or search_backend()) == 'fts5':
+        return Task.id.in_(sa.select(task_fts.c.rowid).where(task_fts.c[field].like(pattern)))
+    return getattr(Task, field).ilike(pattern)
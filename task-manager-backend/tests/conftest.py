@@ -1,5 +1,7 @@
 import pytest
 from app import create_app
+from cache import MemoryCacheBackend
+from config import TestingConfig
 from models import db
 from models.user import User
 from models.task import Task
@@ -49,4 +51,19 @@ def auth_header(client, user):
     }
     response = client.post('/login', json=login_data)
     token = response.get_json()['access_token']
-    return {'Authorization': f'Bearer {token}'} 
\ No newline at end of file
+    return {'Authorization': f'Bearer {token}'} 
+
+_shared = {}
+
+def shared_cache_backend(app):
+    return _shared['backend']
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    """Point TASKS_CACHE_BACKEND at one in-memory backend, marked shared, that
+    every app built during the test gets; it stands in for Redis."""
+    backend = MemoryCacheBackend()
+    backend.shared = True
+    monkeypatch.setitem(_shared, 'backend', backend)
+    monkeypatch.setattr(TestingConfig, 'TASKS_CACHE_BACKEND', f'{__name__}:shared_cache_backend')
+    return backend
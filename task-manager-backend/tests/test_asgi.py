@@ -0,0 +1,239 @@
+import json
+import pytest
+import sqlalchemy as sa
+import asgi_app
+import metrics
+from app import create_app
+from config import TestingConfig
+from hashing import HashingBusy, hash_policy
+from models import db
+from models.user import User
+
+pytest.importorskip('fastapi')
+pytest.importorskip('aiosqlite')
+from fastapi.testclient import TestClient
+from asgi_app import async_database_url, create_asgi_app
+
+def _scalar(engine, statement):
+    with engine.connect() as conn:
+        return conn.execute(statement).scalar()
+
+@pytest.fixture
+def database_uri(tmp_path):
+    uri = f'sqlite:///{tmp_path}/asgi.db'
+    engine = sa.create_engine(uri)
+    db.metadata.create_all(engine)
+    engine.dispose()
+    return uri
+
+@pytest.fixture
+def asgi_client(database_uri):
+    with TestClient(create_asgi_app(database_uri, testing=True)) as client:
+        yield client
+
+@pytest.fixture
+def asgi_auth(asgi_client):
+    asgi_client.post('/register', json={'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'})
+    token = asgi_client.post('/login', json={'username': 'testuser', 'password': 'password123'}).json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_async_database_url():
+    assert async_database_url('sqlite:///tasks.db') == 'sqlite+aiosqlite:///tasks.db'
+    assert async_database_url('postgresql://u:p@db/tasks') == 'postgresql+asyncpg://u:p@db/tasks'
+    assert async_database_url('sqlite+aiosqlite:///tasks.db') == 'sqlite+aiosqlite:///tasks.db'
+
+def test_register_and_duplicates(asgi_client):
+    user_data = {'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'}
+    response = asgi_client.post('/register', json=user_data)
+    assert response.status_code == 201
+    assert response.json() == {'id': 1, 'username': 'testuser', 'email': 'test@example.com'}
+    response = asgi_client.post('/register', json=user_data)
+    assert response.status_code == 400
+    assert response.json() == {'message': 'Username already exists'}
+    response = asgi_client.post('/register', json={**user_data, 'username': 'other'})
+    assert response.json() == {'message': 'Email already registered'}
+
+def test_validation_errors_match_flask(asgi_client):
+    response = asgi_client.post('/register', json={'username': 'testuser'})
+    assert response.status_code == 400
+    assert {error['loc'][0] for error in response.json()['validation_error']['body_params']} == {'email', 'password'}
+
+def test_login_and_auth_errors(asgi_client, asgi_auth):
+    response = asgi_client.post('/login', json={'username': 'testuser', 'password': 'wrong'})
+    assert response.status_code == 401
+    assert response.json() == {'message': 'Invalid credentials'}
+    response = asgi_client.get('/tasks')
+    assert response.status_code == 401
+    assert response.json() == {'msg': 'Missing Authorization Header'}
+
+def test_task_crud(asgi_client, asgi_auth):
+    response = asgi_client.post('/tasks', json={'title': 'First', 'description': 'Desc'}, headers=asgi_auth)
+    assert response.status_code == 201
+    task = response.json()
+    assert task['status'] == 'todo'
+    assert asgi_client.get(f"/tasks/{task['id']}", headers=asgi_auth).json() == task
+
+    response = asgi_client.put(f"/tasks/{task['id']}", json={'title': 'Renamed', 'status': 'done'}, headers=asgi_auth)
+    assert response.status_code == 200
+    assert (response.json()['title'], response.json()['status']) == ('Renamed', 'done')
+
+    assert asgi_client.delete(f"/tasks/{task['id']}", headers=asgi_auth).json() == {'message': 'Task deleted!'}
+    response = asgi_client.get(f"/tasks/{task['id']}", headers=asgi_auth)
+    assert response.status_code == 404
+    assert response.json() == {'message': 'Resource not found'}
+
+def test_non_integer_task_ids_not_found_like_flask(database_uri, asgi_client, asgi_auth):
+    flask_client = create_app(database_uri, testing=True).test_client()
+    for method, path in [('GET', '/tasks/abc'), ('PUT', '/tasks/abc'), ('DELETE', '/tasks/-1'), ('PUT', '/tasks/bulk')]:
+        flask_response = flask_client.open(path, method=method, json={'title': 'T'}, headers=asgi_auth)
+        response = asgi_client.request(method, path, json={'title': 'T'}, headers=asgi_auth)
+        assert response.status_code == flask_response.status_code, (method, path)
+        if response.status_code == 404:
+            assert response.json() == flask_response.get_json() == {'message': 'Resource not found'}
+
+def test_list_pagination_and_params(asgi_client, asgi_auth):
+    asgi_client.post('/tasks/bulk', json={'tasks': [{'title': f'Task {i}'} for i in range(5)]}, headers=asgi_auth)
+    body = asgi_client.get('/tasks?limit=2&sort_by=title', headers=asgi_auth).json()
+    assert [task['title'] for task in body['tasks']] == ['Task 0', 'Task 1']
+    assert body['pagination']['total'] == 5
+    assert body['pagination']['total_pages'] == 3
+    assert asgi_client.get('/tasks/stats', headers=asgi_auth).json() == {'total': 5, 'by_status': {'todo': 5, 'inprogress': 0, 'done': 0}}
+
+    body = asgi_client.get('/tasks', params={'limit': 2, 'sort_by': 'title', 'cursor': body['pagination']['next_cursor']},
+                           headers=asgi_auth).json()
+    assert [task['title'] for task in body['tasks']] == ['Task 2', 'Task 3']
+
+    body = asgi_client.get('/tasks?fields=title&title=Task 4', headers=asgi_auth).json()
+    assert body['tasks'] == [{'title': 'Task 4'}]
+
+    response = asgi_client.get('/tasks?sort_by=owner', headers=asgi_auth)
+    assert response.status_code == 400
+    assert response.json() == {'validation_error': {'message': 'Invalid sort_by parameter'}}
+
+def test_bulk_update_delete_and_export(asgi_client, asgi_auth):
+    asgi_client.post('/tasks/bulk', json={'tasks': [{'title': 'Alpha'}, {'title': 'Beta'}]}, headers=asgi_auth)
+    response = asgi_client.patch('/tasks/bulk', json={'filter': {'title': 'Alpha'}, 'changes': {'status': 'done'}}, headers=asgi_auth)
+    assert response.json() == {'updated': 1}
+
+    lines = asgi_client.get('/tasks/export?fields=title,status&sort_by=title', headers=asgi_auth).text.splitlines()
+    assert [json.loads(line) for line in lines] == [{'title': 'Alpha', 'status': 'done'}, {'title': 'Beta', 'status': 'todo'}]
+    assert asgi_client.get('/tasks/export?format=csv&fields=title&sort_by=title', headers=asgi_auth).text.splitlines() == ['title', 'Alpha', 'Beta']
+
+    since = asgi_client.get('/tasks', headers=asgi_auth).json()['sync_token']
+    assert asgi_client.request('DELETE', '/tasks/bulk', json={'ids': [1, 2]}, headers=asgi_auth).json() == {'deleted': 2}
+    assert sorted(asgi_client.get('/tasks/changes', params={'since': since}, headers=asgi_auth).json()['deleted']) == [1, 2]
+
+def test_login_rehashes_outdated_policy(database_uri, asgi_client, asgi_auth, monkeypatch):
+    engine = sa.create_engine(database_uri)
+    stored_hash = sa.select(User.__table__.c.password_hash)
+    assert hash_policy(_scalar(engine, stored_hash)) == ('pbkdf2', 1000)
+    monkeypatch.setattr(TestingConfig, 'AUTH_HASH_COST', 2000)
+
+    assert asgi_client.post('/login', json={'username': 'testuser', 'password': 'password123'}).status_code == 200
+    assert hash_policy(_scalar(engine, stored_hash)) == ('pbkdf2', 2000)
+    engine.dispose()
+
+def test_register_and_login_through_pool(database_uri, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'AUTH_HASH_WORKERS', 1)
+    with TestClient(create_asgi_app(database_uri, testing=True)) as client:
+        assert client.app.state.hashing is not None
+        client.post('/register', json={'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'})
+        assert client.post('/login', json={'username': 'testuser', 'password': 'password123'}).status_code == 200
+        assert client.post('/login', json={'username': 'testuser', 'password': 'wrong'}).status_code == 401
+
+class _SaturatedExecutor:
+    def __init__(self, allow=()):
+        self.allow = allow
+
+    async def run_async(self, fn, *args):
+        if fn.__name__ in self.allow:
+            return fn(*args)
+        raise HashingBusy(retry_after=1)
+
+    def shutdown(self):
+        pass
+
+def test_hashing_returns_503_when_saturated(asgi_client, asgi_auth):
+    asgi_client.app.state.hashing = _SaturatedExecutor()
+    response = asgi_client.post('/login', json={'username': 'testuser', 'password': 'password123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert 'try again' in response.json()['message']
+    response = asgi_client.post('/register', json={'email': 'new@example.com', 'username': 'newuser', 'password': 'password123'})
+    assert response.status_code == 503
+
+def test_login_skips_rehash_when_saturated(database_uri, asgi_client, asgi_auth, monkeypatch):
+    asgi_client.app.state.hashing = _SaturatedExecutor(allow=['check_hash'])
+    monkeypatch.setattr(TestingConfig, 'AUTH_HASH_COST', 2000)
+    metrics.reset()
+
+    assert asgi_client.post('/login', json={'username': 'testuser', 'password': 'password123'}).status_code == 200
+    engine = sa.create_engine(database_uri)
+    assert hash_policy(_scalar(engine, sa.select(User.__table__.c.password_hash))) == ('pbkdf2', 1000)
+    engine.dispose()
+    assert metrics.snapshot()['counters']['hashing.rehash_skipped'] == 1
+
+def test_import_matches_flask(database_uri, asgi_client, asgi_auth, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'TASKS_IMPORT_BATCH_SIZE', 2)
+    body = '\n'.join([json.dumps({'title': 'One'}), '{not json', json.dumps({'title': ''}),
+                      json.dumps({'title': 'Two', 'status': 'done'}), json.dumps({'title': 'Three'})])
+    flask_client = create_app(database_uri, testing=True).test_client()
+    flask_data = flask_client.post('/tasks/import', data=body, content_type='application/x-ndjson', headers=asgi_auth).get_json()
+
+    def chunks():
+        # Streamed in small pieces, so records straddle chunk boundaries.
+        for start in range(0, len(body), 7):
+            yield body[start:start + 7].encode()
+
+    response = asgi_client.post('/tasks/import', content=chunks(), headers={**asgi_auth, 'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.json() == flask_data
+    assert (flask_data['accepted'], [error['line'] for error in flask_data['errors']]) == (3, [2, 3])
+
+    exported = asgi_client.get('/tasks/export?format=csv', headers=asgi_auth).content
+    response = asgi_client.post('/tasks/import', content=exported, headers={**asgi_auth, 'Content-Type': 'text/csv'})
+    assert response.json() == {'accepted': 6, 'rejected': 0, 'errors': [], 'errors_truncated': False}
+    assert asgi_client.get('/tasks', headers=asgi_auth).json()['pagination']['total'] == 12
+
+    response = asgi_client.post('/tasks/import?format=xml', content=b'', headers=asgi_auth)
+    assert response.status_code == 400
+    assert response.json() == {'validation_error': {'message': 'Invalid format parameter'}}
+
+def test_refresh_rotation(asgi_client, asgi_auth):
+    refresh = asgi_client.post('/login', json={'username': 'testuser', 'password': 'password123'}).json()['refresh_token']
+    headers = {'Authorization': f'Bearer {refresh}'}
+    assert asgi_client.post('/token/refresh', headers=headers).status_code == 200
+    response = asgi_client.post('/token/refresh', headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {'message': 'Refresh token has already been used'}
+    assert asgi_client.get('/tasks', headers=headers).status_code == 422
+
+def test_tokens_work_across_apps(database_uri, asgi_client, asgi_auth):
+    asgi_client.post('/tasks', json={'title': 'From ASGI'}, headers=asgi_auth)
+    flask_client = create_app(database_uri, testing=True).test_client()
+    response = flask_client.get('/tasks', headers=asgi_auth)
+    assert response.status_code == 200
+    assert [task['title'] for task in response.get_json()['tasks']] == ['From ASGI']
+
+    token = flask_client.post('/login', json={'username': 'testuser', 'password': 'password123'}).get_json()['access_token']
+    response = asgi_client.get('/tasks', headers={'Authorization': f'Bearer {token}'})
+    assert [task['title'] for task in response.json()['tasks']] == ['From ASGI']
+
+def test_factory_cache_backend_does_not_block_startup(database_uri, shared_cache, caplog):
+    with TestClient(create_asgi_app(database_uri, testing=True)) as client:
+        assert client.post('/register', json={'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'}).status_code == 201
+    assert 'needs the Flask app' in caplog.text
+
+def test_writes_invalidate_shared_flask_cache(database_uri, monkeypatch, shared_cache):
+    # Stands in for redis, which both apps can build.
+    monkeypatch.setattr(asgi_app, 'build_backend', lambda settings: shared_cache)
+    flask_client = create_app(database_uri, testing=True).test_client()
+    with TestClient(create_asgi_app(database_uri, testing=True)) as client:
+        client.post('/register', json={'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'})
+        token = client.post('/login', json={'username': 'testuser', 'password': 'password123'}).json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        task = client.post('/tasks', json={'title': 'First'}, headers=headers).json()
+        
+        assert [task['title'] for task in flask_client.get('/tasks', headers=headers).get_json()['tasks']] == ['First']
+        client.put(f"/tasks/{task['id']}", json={'title': 'Renamed'}, headers=headers)
+        assert [task['title'] for task in flask_client.get('/tasks', headers=headers).get_json()['tasks']] == ['Renamed']
@@ -0,0 +1,100 @@
+import json
+import time
+import pytest
+import metrics
+from cache import MemoryCacheBackend, init_cache
+from models import db
+from models.task import Task
+
+@pytest.fixture
+def cached_app(app_with_context):
+    """Enable the in-process task response cache."""
+    app_with_context.config['TASKS_CACHE_BACKEND'] = 'memory'
+    init_cache(app_with_context)
+    metrics.reset()
+    return app_with_context
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set('a', b'1', 60)
+    backend.set('b', b'2', 60)
+    backend.get('a')
+    backend.set('c', b'3', 60)
+    assert backend.get('a') == b'1'
+    assert backend.get('b') is None
+    assert backend.get('c') == b'3'
+
+def test_memory_backend_expires_entries():
+    backend = MemoryCacheBackend()
+    backend.set('a', b'1', 0.01)
+    time.sleep(0.02)
+    assert backend.get('a') is None
+
+def test_memory_backend_versions():
+    backend = MemoryCacheBackend()
+    assert backend.get_version('user:1') == 0
+    assert backend.bump_version('user:1') == 1
+    assert backend.get_version('user:1') == 1
+    assert backend.get_version('user:2') == 0
+
+def test_get_tasks_served_from_cache_until_write(cached_app, client, user, auth_header):
+    client.post('/tasks', json={'title': 'Task 1'}, headers=auth_header)
+    
+    first = client.get('/tasks', headers=auth_header)
+    assert len(json.loads(first.data)['tasks']) == 1
+    
+    # A row written behind the API's back is invisible while the entry lives.
+    db.session.add(Task(title='Direct', user_id=user.id))
+    db.session.commit()
+    second = client.get('/tasks', headers=auth_header)
+    assert second.data == first.data
+    
+    client.post('/tasks', json={'title': 'Task 2'}, headers=auth_header)
+    third = client.get('/tasks', headers=auth_header)
+    assert len(json.loads(third.data)['tasks']) == 3
+    
+    counters = metrics.snapshot()['counters']
+    assert counters['task_cache.hit'] == 1
+    assert counters['task_cache.miss'] == 2
+
+def test_get_tasks_cache_key_includes_params(cached_app, client, auth_header):
+    client.post('/tasks', json={'title': 'Work'}, headers=auth_header)
+    client.post('/tasks', json={'title': 'Home'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?title=work', headers=auth_header).data)
+    assert [task['title'] for task in data['tasks']] == ['Work']
+    data = json.loads(client.get('/tasks?title=home', headers=auth_header).data)
+    assert [task['title'] for task in data['tasks']] == ['Home']
+
+def test_get_task_cache_invalidated_by_update_and_delete(cached_app, client, seeded_task, auth_header):
+    task_id = seeded_task.id
+    assert json.loads(client.get(f'/tasks/{task_id}', headers=auth_header).data)['title'] == 'Initial Task'
+    
+    client.put(f'/tasks/{task_id}', json={'title': 'Updated'}, headers=auth_header)
+    assert json.loads(client.get(f'/tasks/{task_id}', headers=auth_header).data)['title'] == 'Updated'
+    
+    client.delete(f'/tasks/{task_id}', headers=auth_header)
+    assert client.get(f'/tasks/{task_id}', headers=auth_header).status_code == 404
+
+def build_small_backend(app):
+    return MemoryCacheBackend(max_entries=8)
+
+def test_custom_cache_backend_factory(app_with_context):
+    app_with_context.config['TASKS_CACHE_BACKEND'] = 'tests.test_cache:build_small_backend'
+    init_cache(app_with_context)
+    backend = app_with_context.extensions['task_cache'].backend
+    assert isinstance(backend, MemoryCacheBackend)
+    assert backend.max_entries == 8
+
+def test_cached_list_answers_if_none_match(cached_app, client, auth_header):
+    client.post('/tasks', json={'title': 'Task 1'}, headers=auth_header)
+    etag = client.get('/tasks', headers=auth_header).headers['ETag']
+    
+    response = client.get('/tasks', headers={**auth_header, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert metrics.snapshot()['counters']['task_cache.hit'] == 1
+
+def test_metrics_endpoint_off_by_default(app_with_context, client):
+    assert client.get('/metrics').status_code == 404
+    app_with_context.config['METRICS_ENABLED'] = True
+    assert 'counters' in json.loads(client.get('/metrics').data)
@@ -0,0 +1,71 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.pool import NullPool
+import metrics
+from config import engine_options_from_env
+from db_pool import InstrumentedQueuePool
+
+def test_engine_options_from_env(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '4')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '2')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '2.5')
+    monkeypatch.setenv('DB_POOL_RECYCLE', '1800')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'true')
+    assert engine_options_from_env() == {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': 4,
+        'max_overflow': 2,
+        'pool_timeout': 2.5,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+
+def test_engine_options_keep_defaults_when_unset(monkeypatch):
+    for name in ('DB_POOL_MODE', 'DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'DB_POOL_RECYCLE', 'DB_POOL_PRE_PING'):
+        monkeypatch.delenv(name, raising=False)
+    assert engine_options_from_env() == {'poolclass': InstrumentedQueuePool}
+
+def test_engine_options_null_pool(monkeypatch):
+    monkeypatch.setenv('DB_POOL_MODE', 'null')
+    monkeypatch.setenv('DB_POOL_SIZE', '4')
+    assert engine_options_from_env() == {'poolclass': NullPool}
+
+def test_pool_reports_wait_and_saturation(tmp_path):
+    engine = sa.create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=InstrumentedQueuePool,
+                              pool_size=1, max_overflow=0, pool_timeout=0.05)
+    metrics.reset()
+    try:
+        conn = engine.connect()
+        assert metrics.snapshot()['gauges'] == {'db.pool.primary.checked_out': 1, 'db.pool.primary.capacity': 1}
+        with pytest.raises(sa.exc.TimeoutError):
+            engine.connect()
+        conn.close()
+        
+        snapshot = metrics.snapshot()
+        assert snapshot['counters'] == {'db.pool.primary.saturated': 1, 'db.pool.primary.timeout': 1}
+        assert snapshot['timings']['db.pool.primary.checkout_wait']['count'] == 2
+        assert snapshot['timings']['db.pool.primary.checkout_wait']['max_ms'] >= 50
+        assert snapshot['gauges']['db.pool.primary.checked_out'] == 0
+    finally:
+        engine.dispose()
+
+def test_pool_metrics_kept_per_engine(tmp_path):
+    primary = sa.create_engine(f'sqlite:///{tmp_path}/primary.db', poolclass=InstrumentedQueuePool, pool_size=2)
+    replica = sa.create_engine(f'sqlite:///{tmp_path}/replica.db', poolclass=InstrumentedQueuePool, pool_size=3,
+                               pool_logging_name='replica')
+    metrics.reset()
+    try:
+        conns = [primary.connect(), primary.connect(), replica.connect()]
+        assert metrics.snapshot()['gauges'] == {
+            'db.pool.primary.checked_out': 2, 'db.pool.primary.capacity': 12,
+            'db.pool.replica.checked_out': 1, 'db.pool.replica.capacity': 13,
+        }
+        for conn in conns:
+            conn.close()
+
+        replica.dispose()
+        replica.connect().close()
+        assert metrics.snapshot()['timings']['db.pool.replica.checkout_wait']['count'] == 2
+    finally:
+        primary.dispose()
+        replica.dispose()
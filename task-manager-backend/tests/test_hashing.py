@@ -0,0 +1,141 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+import metrics
+from hashing import HashingBusy, HashingExecutor, init_hashing, hash_password, verify_password, hash_policy
+from models import db
+from models.user import User
+
+@pytest.fixture
+def pooled_app(app_with_context):
+    """Hash passwords in a real one-process pool."""
+    app_with_context.config['AUTH_HASH_WORKERS'] = 1
+    init_hashing(app_with_context)
+    yield app_with_context
+    app_with_context.extensions['hashing'].shutdown()
+
+def test_register_and_login_through_pool(pooled_app, client):
+    response = client.post('/register', json={'email': 'pool@example.com', 'username': 'pooluser', 'password': 'password123'})
+    assert response.status_code == 201
+
+    response = client.post('/login', json={'username': 'pooluser', 'password': 'password123'})
+    assert response.status_code == 200
+    response = client.post('/login', json={'username': 'pooluser', 'password': 'wrong-password'})
+    assert response.status_code == 401
+
+def test_executor_rejects_when_saturated():
+    executor = HashingExecutor(max_workers=1, max_queue=0, timeout=5)
+    metrics.reset()
+    try:
+        worker = threading.Thread(target=executor.run, args=(time.sleep, 1))
+        worker.start()
+        # Give the first job time to take the only slot.
+        time.sleep(0.2)
+        started = time.perf_counter()
+        with pytest.raises(HashingBusy):
+            executor.run(time.sleep, 0)
+        assert time.perf_counter() - started < 0.1
+        worker.join()
+        assert executor.run(sum, [1, 2]) == 3
+        assert metrics.snapshot()['counters']['hashing.rejected'] == 1
+    finally:
+        executor.shutdown()
+
+def test_executor_times_out():
+    executor = HashingExecutor(max_workers=1, max_queue=0, timeout=0.1)
+    try:
+        with pytest.raises(HashingBusy):
+            executor.run(time.sleep, 1)
+    finally:
+        executor.shutdown()
+
+def test_executor_run_async_shares_slots_and_timeout():
+    executor = HashingExecutor(max_workers=1, max_queue=0, timeout=0.5)
+    metrics.reset()
+    try:
+        worker = threading.Thread(target=executor.run, args=(time.sleep, 0.3))
+        worker.start()
+        time.sleep(0.2)
+        with pytest.raises(HashingBusy):
+            asyncio.run(executor.run_async(time.sleep, 0))
+        worker.join()
+        assert asyncio.run(executor.run_async(sum, [1, 2])) == 3
+        with pytest.raises(HashingBusy):
+            asyncio.run(executor.run_async(time.sleep, 1))
+        assert metrics.snapshot()['counters'] == {'hashing.rejected': 1, 'hashing.timeout': 1}
+    finally:
+        executor.shutdown()
+
+class _SaturatedExecutor:
+    def run(self, fn, *args):
+        raise HashingBusy(retry_after=1)
+
+def test_login_returns_503_when_saturated(app_with_context, client, user):
+    app_with_context.extensions['hashing'] = _SaturatedExecutor()
+
+    response = client.post('/login', json={'username': user.username, 'password': 'password123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert 'try again' in json.loads(response.data)['message']
+
+    response = client.post('/register', json={'email': 'new@example.com', 'username': 'newuser', 'password': 'password123'})
+    assert response.status_code == 503
+
+@pytest.mark.parametrize('algorithm, cost', [('pbkdf2', 1000), ('scrypt', 2 ** 10), ('bcrypt', 4)])
+def test_hash_policies_round_trip(app_with_context, algorithm, cost):
+    app_with_context.config['AUTH_HASH_ALGORITHM'] = algorithm
+    app_with_context.config['AUTH_HASH_COST'] = cost
+
+    password_hash = hash_password('password123')
+    assert hash_policy(password_hash) == (algorithm, cost)
+    assert verify_password(password_hash, 'password123')
+    assert not verify_password(password_hash, 'password124')
+
+def test_hash_policy_of_unknown_format():
+    assert hash_policy('md5$abc$def') is None
+    assert hash_policy('pbkdf2:sha1:1000$salt$hash') is None
+
+def test_login_rehashes_outdated_policy(app_with_context, client, user):
+    assert hash_policy(user.password_hash) == ('pbkdf2', 1000)
+    app_with_context.config['AUTH_HASH_ALGORITHM'] = 'bcrypt'
+    app_with_context.config['AUTH_HASH_COST'] = 4
+
+    response = client.post('/login', json={'username': user.username, 'password': 'wrong-password'})
+    assert response.status_code == 401
+    db.session.expire_all()
+    assert hash_policy(db.session.get(User, user.id).password_hash) == ('pbkdf2', 1000)
+
+    response = client.post('/login', json={'username': user.username, 'password': 'password123'})
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert hash_policy(db.session.get(User, user.id).password_hash) == ('bcrypt', 4)
+
+    response = client.post('/login', json={'username': user.username, 'password': 'password123'})
+    assert response.status_code == 200
+
+class _VerifyOnlyExecutor:
+    # Lets the password check through, then is full for the rehash.
+    def run(self, fn, *args):
+        if fn.__name__ == 'check_hash':
+            return fn(*args)
+        raise HashingBusy(retry_after=1)
+
+def test_login_skips_rehash_when_saturated(app_with_context, client, user):
+    app_with_context.config['AUTH_HASH_ALGORITHM'] = 'bcrypt'
+    app_with_context.config['AUTH_HASH_COST'] = 4
+    app_with_context.extensions['hashing'] = _VerifyOnlyExecutor()
+    metrics.reset()
+
+    response = client.post('/login', json={'username': user.username, 'password': 'password123'})
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert hash_policy(db.session.get(User, user.id).password_hash) == ('pbkdf2', 1000)
+    assert metrics.snapshot()['counters']['hashing.rehash_skipped'] == 1
+
+def test_calibrate_hashing_command(app_with_context):
+    result = app_with_context.test_cli_runner().invoke(args=['calibrate-hashing', '--algorithm', 'bcrypt', '--target-ms', '1'])
+    assert result.exit_code == 0
+    assert 'AUTH_HASH_ALGORITHM=bcrypt' in result.output
+    assert 'AUTH_HASH_COST=4' in result.output
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+import pytest
+import metrics
+from json_provider import OrjsonJSONProvider, StdlibJSONProvider, init_json_provider, orjson
+
+PROVIDERS = ['stdlib', pytest.param('orjson', marks=pytest.mark.skipif(orjson is None, reason='orjson not installed'))]
+
+@pytest.fixture(params=PROVIDERS)
+def provider_app(request, app_with_context):
+    """Run the test once per available JSON provider."""
+    app_with_context.config['JSON_PROVIDER'] = request.param
+    init_json_provider(app_with_context)
+    metrics.reset()
+    return app_with_context
+
+def test_auto_provider_prefers_orjson(app_with_context):
+    app_with_context.config['JSON_PROVIDER'] = 'auto'
+    init_json_provider(app_with_context)
+    expected = OrjsonJSONProvider if orjson is not None else StdlibJSONProvider
+    assert type(app_with_context.json) is expected
+
+def test_task_serialized_natively(provider_app, client, auth_header):
+    response = client.post('/tasks', json={'title': 'T', 'description': 'D', 'status': 'inprogress'}, headers=auth_header)
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['status'] == 'inprogress'
+    assert datetime.fromisoformat(data['created_at'])
+    assert 'T' in data['created_at']
+
+    response = client.get('/tasks', headers=auth_header)
+    data = json.loads(response.data)
+    assert data['tasks'][0]['status'] == 'inprogress'
+    assert datetime.fromisoformat(data['tasks'][0]['updated_at'])
+
+def test_provider_loads_request_bodies(provider_app, client, auth_header):
+    response = client.post('/tasks', data=json.dumps({'title': 'Raw body'}), content_type='application/json', headers=auth_header)
+    assert response.status_code == 201
+    assert json.loads(response.data)['title'] == 'Raw body'
+
+def test_serialization_time_recorded(provider_app, client, auth_header):
+    client.post('/tasks', json={'title': 'T'}, headers=auth_header)
+    client.get('/tasks', headers=auth_header)
+    timing = metrics.snapshot()['timings']['json.dumps']
+    assert timing['count'] >= 2
+    assert timing['total_ms'] >= 0
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+import flask_jwt_extended.jwt_manager as jwt_manager
+import metrics
+from jwt_cache import CachingJWTManager, DecodedTokenCache, create_jwt_manager
+
+def _count_decodes(monkeypatch):
+    calls = []
+    original = jwt_manager._decode_jwt
+    def counting_decode(**kwargs):
+        calls.append(kwargs['encoded_token'])
+        return original(**kwargs)
+    monkeypatch.setattr(jwt_manager, '_decode_jwt', counting_decode)
+    return calls
+
+def test_repeat_requests_skip_verification(client, auth_header, monkeypatch):
+    calls = _count_decodes(monkeypatch)
+    metrics.reset()
+    for _ in range(3):
+        assert client.get('/tasks', headers=auth_header).status_code == 200
+    assert len(calls) == 1
+    counters = metrics.snapshot()['counters']
+    assert counters['jwt_cache.miss'] == 1
+    assert counters['jwt_cache.hit'] == 2
+
+def test_cached_token_still_expires(app_with_context, client, user):
+    token = create_access_token(identity=str(user.id), expires_delta=timedelta(seconds=1))
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/tasks', headers=headers).status_code == 200
+    time.sleep(1.1)
+    response = client.get('/tasks', headers=headers)
+    assert response.status_code == 401
+
+def test_tampered_token_not_served_from_cache(client, auth_header):
+    assert client.get('/tasks', headers=auth_header).status_code == 200
+    tampered = auth_header['Authorization'][:-2] + ('AA' if not auth_header['Authorization'].endswith('AA') else 'BB')
+    response = client.get('/tasks', headers={'Authorization': tampered})
+    assert response.status_code == 422
+
+def test_decoded_token_cache_is_bounded():
+    cache = DecodedTokenCache(max_entries=2)
+    expires = time.time() + 60
+    for token in ('a', 'b', 'c'):
+        cache.set(cache.key(token), {'sub': token}, expires)
+    assert cache.get(cache.key('a')) is None
+    assert cache.get(cache.key('c')) == {'sub': 'c'}
+
+def test_cache_can_be_disabled():
+    app = Flask(__name__)
+    app.config['JWT_DECODE_CACHE_SIZE'] = 0
+    assert type(create_jwt_manager(app)) is JWTManager
+    app = Flask(__name__)
+    app.config['JWT_DECODE_CACHE_SIZE'] = 8
+    assert isinstance(create_jwt_manager(app), CachingJWTManager)
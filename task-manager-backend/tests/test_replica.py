@@ -0,0 +1,119 @@
+import json
+import pytest
+import sqlalchemy as sa
+import metrics
+from flask import current_app
+from app import create_app
+from cache import MemoryCacheBackend
+from config import TestingConfig
+from db_pool import InstrumentedQueuePool
+from db_routing import ReplicaPins
+from models import db
+from models.task import Task
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    """An app on a primary SQLite file with a second file as its replica.
+    Nothing replicates between them, so each read shows where it was routed."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_REPLICA_URI', f'sqlite:///{tmp_path}/replica.db')
+    app = create_app(f'sqlite:///{tmp_path}/primary.db', testing=True)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(app.extensions['replica_engine'])
+        yield app
+        db.session.remove()
+        app.extensions['replica_engine'].dispose()
+
+@pytest.fixture
+def replica_client(replica_app):
+    client = replica_app.test_client()
+    client.post('/register', json={'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'})
+    token = json.loads(client.post('/login', json={'username': 'testuser', 'password': 'password123'}).data)['access_token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+def _add_replica_task(title):
+    with current_app.extensions['replica_engine'].begin() as conn:
+        return conn.execute(sa.insert(Task.__table__).values(title=title, user_id=1).returning(Task.id)).scalar()
+
+def _titles(client):
+    return [task['title'] for task in json.loads(client.get('/tasks').data)['tasks']]
+
+def test_reads_go_to_replica(replica_client):
+    task_id = _add_replica_task('Only on replica')
+
+    assert _titles(replica_client) == ['Only on replica']
+    assert json.loads(replica_client.get(f'/tasks/{task_id}').data)['title'] == 'Only on replica'
+    assert 'Only on replica' in replica_client.get('/tasks/export').data.decode()
+
+def test_writes_go_to_primary_and_pin_reads(replica_app, replica_client):
+    _add_replica_task('Only on replica')
+
+    response = replica_client.post('/tasks', json={'title': 'Written'})
+    assert response.status_code == 201
+    with db.engine.connect() as conn:
+        assert conn.execute(sa.select(Task.title)).scalars().all() == ['Written']
+    assert _titles(replica_client) == ['Written']
+
+    # Once the pin is gone, reads are back on the replica.
+    replica_app.extensions['replica_pins'] = ReplicaPins(MemoryCacheBackend())
+    assert _titles(replica_client) == ['Only on replica']
+
+def test_pool_metrics_split_by_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_REPLICA_URI', f'sqlite:///{tmp_path}/replica.db')
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_ENGINE_OPTIONS', {'poolclass': InstrumentedQueuePool, 'pool_size': 2})
+    app = create_app(f'sqlite:///{tmp_path}/primary.db', testing=True)
+    metrics.reset()
+    with app.app_context():
+        try:
+            db.create_all()
+            db.metadata.create_all(app.extensions['replica_engine'])
+        finally:
+            db.session.remove()
+            app.extensions['replica_engine'].dispose()
+
+    gauges = metrics.snapshot()['gauges']
+    assert gauges['db.pool.primary.capacity'] == gauges['db.pool.replica.capacity'] == 12
+    assert gauges['db.pool.primary.checked_out'] == gauges['db.pool.replica.checked_out'] == 0
+
+def test_without_replica_reads_use_primary(client, auth_header):
+    client.post('/tasks', json={'title': 'Primary'}, headers=auth_header)
+    response = client.get('/tasks', headers=auth_header)
+    assert [task['title'] for task in json.loads(response.data)['tasks']] == ['Primary']
+
+@pytest.fixture
+def worker_apps(tmp_path, monkeypatch, shared_cache):
+    """Two app instances, like two workers, over the same primary and replica
+    and one shared cache backend."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_REPLICA_URI', f'sqlite:///{tmp_path}/replica.db')
+    apps = [create_app(f'sqlite:///{tmp_path}/primary.db', testing=True) for _ in range(2)]
+    with apps[0].app_context():
+        db.create_all()
+        db.metadata.create_all(apps[0].extensions['replica_engine'])
+    yield apps
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        app.extensions['replica_engine'].dispose()
+
+def test_pins_and_cache_shared_between_workers(worker_apps):
+    first, second = (app.test_client() for app in worker_apps)
+    first.post('/register', json={'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'})
+    token = json.loads(first.post('/login', json={'username': 'testuser', 'password': 'password123'}).data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    # A write on one worker pins the user's reads on the other, so the
+    # second worker reads the primary and caches what it read there.
+    first.post('/tasks', json={'title': 'Written'}, headers=headers)
+    assert [task['title'] for task in json.loads(second.get('/tasks', headers=headers).data)['tasks']] == ['Written']
+    assert worker_apps[0].extensions['replica_pins'].is_pinned(1)
+    
+    # Unpinned, reads go to the replica, which never caught up; what it
+    # returns must not be cached under the version the write produced.
+    for app in worker_apps:
+        app.extensions['replica_pins'] = ReplicaPins(MemoryCacheBackend())
+    assert json.loads(second.get('/tasks?limit=5', headers=headers).data)['tasks'] == []
+    with worker_apps[1].extensions['replica_engine'].begin() as conn:
+        conn.execute(sa.insert(Task.__table__).values(title='Replicated', user_id=1))
+    assert [task['title'] for task in json.loads(first.get('/tasks?limit=5', headers=headers).data)['tasks']] == ['Replicated']
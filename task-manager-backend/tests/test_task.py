@@ -1,8 +1,14 @@
+import csv
+import io
 import json
 from models.task import Task
 from datetime import timedelta
 import time
 from schemas.task import TaskStatus
+from models import db
+import sqlalchemy as sa
+import metrics
+from utils import ImportReader, init_auth_context
 
 def test_create_task_success(client, user, auth_header):
     response = client.post('/tasks', json={'title': 'Test Task', 'description': 'Test Description'}, headers=auth_header)
@@ -790,3 +796,683 @@ def test_task_to_json_with_status(user):
     assert task_json['description'] == 'Test Description'
     assert task_json['user_id'] == user.id
     assert task_json['status'] == 'inprogress'
+
+def _collect_cursor_pages(client, auth_header, query):
+    titles = []
+    cursor = ''
+    while True:
+        response = client.get(f'/tasks?{query}&cursor={cursor}', headers=auth_header)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        titles.extend(task['title'] for task in data['tasks'])
+        cursor = data['pagination']['next_cursor']
+        if cursor is None:
+            assert data['pagination']['has_next'] == False
+            return titles
+
+def test_get_tasks_cursor_pagination_matches_offset_pagination(client, auth_header):
+    statuses = ['todo', 'inprogress', 'done']
+    for i in range(12):
+        client.post('/tasks', json={'title': f'Task {i % 4}', 'description': f'Desc {i % 3}', 'status': statuses[i % 3]}, headers=auth_header)
+    
+    for sort_by in ['title', 'description', 'status', 'created_at']:
+        for sort_order in ['asc', 'desc']:
+            query = f'sort_by={sort_by}&sort_order={sort_order}&limit=5'
+            offset_titles = []
+            for page_no in range(1, 4):
+                data = json.loads(client.get(f'/tasks?{query}&page_no={page_no}', headers=auth_header).data)
+                offset_titles.extend(task['title'] for task in data['tasks'])
+            assert _collect_cursor_pages(client, auth_header, query) == offset_titles
+            assert len(offset_titles) == 12
+
+def test_get_tasks_cursor_pagination_default_sort(client, auth_header):
+    for i in range(5):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    response = client.get('/tasks?limit=2&cursor=', headers=auth_header)
+    data = json.loads(response.data)
+    assert [task['title'] for task in data['tasks']] == ['Task 5', 'Task 4']
+    assert data['pagination']['has_next'] == True
+    assert data['pagination']['has_prev'] == False
+    assert data['pagination']['total'] == 5
+    
+    next_cursor = data['pagination']['next_cursor']
+    response = client.get(f'/tasks?limit=2&cursor={next_cursor}', headers=auth_header)
+    data = json.loads(response.data)
+    assert [task['title'] for task in data['tasks']] == ['Task 3', 'Task 2']
+    assert data['pagination']['has_prev'] == True
+
+def test_get_tasks_page_response_includes_next_cursor(client, auth_header):
+    for i in range(3):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?limit=2&page_no=1', headers=auth_header).data)
+    next_cursor = data['pagination']['next_cursor']
+    data = json.loads(client.get(f'/tasks?limit=2&cursor={next_cursor}', headers=auth_header).data)
+    assert [task['title'] for task in data['tasks']] == ['Task 1']
+    assert data['pagination']['next_cursor'] is None
+
+def test_get_tasks_invalid_cursor(client, auth_header):
+    response = client.get('/tasks?cursor=not-a-cursor', headers=auth_header)
+    assert response.status_code == 400
+    data = json.loads(response.data)
+    assert 'Invalid cursor parameter' in data['validation_error']['message']
+
+def test_get_tasks_cursor_from_other_sort_rejected(client, auth_header):
+    for i in range(3):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?limit=1&cursor=&sort_by=title', headers=auth_header).data)
+    next_cursor = data['pagination']['next_cursor']
+    response = client.get(f'/tasks?limit=1&cursor={next_cursor}&sort_by=status', headers=auth_header)
+    assert response.status_code == 400
+
+def test_get_tasks_window_count(client, auth_header):
+    for i in range(15):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?count=window&page_no=2&limit=10', headers=auth_header).data)
+    assert len(data['tasks']) == 5
+    assert data['pagination']['total'] == 15
+    assert data['pagination']['total_exact'] == True
+    assert data['pagination']['total_pages'] == 2
+    assert data['pagination']['has_next'] == False
+    
+    data = json.loads(client.get('/tasks?count=window&page_no=5&limit=10', headers=auth_header).data)
+    assert len(data['tasks']) == 0
+    assert data['pagination']['total'] == 15
+
+def test_get_tasks_window_count_after_cursor(client, auth_header):
+    for i in range(5):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?count=window&cursor=&limit=2', headers=auth_header).data)
+    assert data['pagination']['total'] == 5
+    next_cursor = data['pagination']['next_cursor']
+    data = json.loads(client.get(f'/tasks?count=window&cursor={next_cursor}&limit=2', headers=auth_header).data)
+    assert data['pagination']['total'] is None
+    assert data['pagination']['remaining'] == 3
+
+def test_get_tasks_capped_count(client, app_with_context, auth_header):
+    app_with_context.config['TASKS_COUNT_CAP'] = 4
+    for i in range(6):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?count=capped&limit=2', headers=auth_header).data)
+    assert data['pagination']['total'] == 4
+    assert data['pagination']['total_exact'] == False
+    assert data['pagination']['has_next'] == True
+    
+    data = json.loads(client.get('/tasks?count=capped&title=Task 1', headers=auth_header).data)
+    assert data['pagination']['total'] == 1
+    assert data['pagination']['total_exact'] == True
+
+def test_get_tasks_cached_count(client, user, auth_header):
+    for i in range(3):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?count=cached', headers=auth_header).data)
+    assert data['pagination']['total'] == 3
+    
+    # Writes that bypass the API are not seen until the cache expires or is invalidated.
+    db.session.add(Task(title='Direct', user_id=user.id))
+    db.session.commit()
+    data = json.loads(client.get('/tasks?count=cached', headers=auth_header).data)
+    assert data['pagination']['total'] == 3
+    data = json.loads(client.get('/tasks?count=cached&title=Direct', headers=auth_header).data)
+    assert data['pagination']['total'] == 1
+    
+    client.post('/tasks', json={'title': 'Task 4'}, headers=auth_header)
+    data = json.loads(client.get('/tasks?count=cached', headers=auth_header).data)
+    assert data['pagination']['total'] == 5
+
+def test_get_tasks_count_strategy_from_config(client, app_with_context, auth_header):
+    app_with_context.config['TASKS_COUNT_STRATEGY'] = 'window'
+    client.post('/tasks', json={'title': 'Task 1'}, headers=auth_header)
+    data = json.loads(client.get('/tasks', headers=auth_header).data)
+    assert data['pagination']['total'] == 1
+
+def test_get_tasks_invalid_count_parameter(client, auth_header):
+    response = client.get('/tasks?count=guess', headers=auth_header)
+    assert response.status_code == 400
+    data = json.loads(response.data)
+    assert 'Invalid count parameter' in data['validation_error']['message']
+
+def _list_query_plan(client, auth_header, query):
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT') and 'ORDER BY' in statement:
+            statements.append((statement, parameters))
+    
+    engine = db.engine
+    sa.event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get(f'/tasks?{query}', headers=auth_header)
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200
+    assert len(statements) == 1
+    
+    statement, parameters = statements[0]
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return ' | '.join(row[-1] for row in rows)
+
+def test_get_tasks_queries_use_composite_indexes(client, auth_header):
+    for i in range(5):
+        client.post('/tasks', json={'title': f'Task {i+1}', 'status': 'done'}, headers=auth_header)
+    
+    expected_indexes = {
+        '': 'ix_task_user_id_created_at',
+        'sort_by=created_at&sort_order=asc': 'ix_task_user_id_created_at',
+        'status=done': 'ix_task_user_id_status_created_at',
+        'sort_by=status': 'ix_task_user_id_status',
+        'sort_by=title&sort_order=desc': 'ix_task_user_id_title',
+        'sort_by=description': 'ix_task_user_id_description',
+    }
+    for query, index_name in expected_indexes.items():
+        plan = _list_query_plan(client, auth_header, query)
+        assert f'USING INDEX {index_name}' in plan, (query, plan)
+        assert 'TEMP B-TREE' not in plan, (query, plan)
+
+def test_get_tasks_cursor_query_uses_index_range(client, auth_header):
+    for i in range(3):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    data = json.loads(client.get('/tasks?sort_by=title&limit=1&cursor=', headers=auth_header).data)
+    
+    plan = _list_query_plan(client, auth_header, f"sort_by=title&limit=1&cursor={data['pagination']['next_cursor']}")
+    assert 'USING INDEX ix_task_user_id_title (user_id=? AND title>?)' in plan, plan
+    assert 'TEMP B-TREE' not in plan, plan
+
+def test_search_backend_detects_fts5_on_sqlite(app_with_context):
+    from search import search_backend
+    assert search_backend() == 'fts5'
+
+def test_get_tasks_search_backends_match(client, app_with_context, auth_header):
+    tasks_data = [
+        {'title': 'Work Task', 'description': 'Important WORK'},
+        {'title': 'WORK MEETING', 'description': None},
+        {'title': 'Homework', 'description': 'due 100% today'},
+        {'title': 'Ab', 'description': 'x_y'},
+    ]
+    for task_data in tasks_data:
+        client.post('/tasks', json={k: v for k, v in task_data.items() if v is not None}, headers=auth_header)
+    
+    queries = ['title=work', 'title=ORK M', 'title=ab', 'title=b', 'description=work', 'description=100%', 'description=x_y', 'title=zzz']
+    for query in queries:
+        results = {}
+        for backend in ['ilike', 'fts5']:
+            app_with_context.config['TASKS_SEARCH_BACKEND'] = backend
+            data = json.loads(client.get(f'/tasks?{query}', headers=auth_header).data)
+            results[backend] = sorted(task['id'] for task in data['tasks'])
+        assert results['fts5'] == results['ilike'], query
+
+def test_get_tasks_search_short_terms_match_ilike(client, app_with_context, auth_header):
+    for title in ['Ärger', 'ärgern', 'École', 'écrire', 'Über uns']:
+        client.post('/tasks', json={'title': title}, headers=auth_header)
+
+    for term in ['Är', 'är', 'Éc', 'éc', 'Ü', 'Ärg', 'Über']:
+        results = {}
+        for backend in ['ilike', 'fts5']:
+            app_with_context.config['TASKS_SEARCH_BACKEND'] = backend
+            data = json.loads(client.get('/tasks', query_string={'title': term}, headers=auth_header).data)
+            results[backend] = sorted(task['id'] for task in data['tasks'])
+        assert results['fts5'] == results['ilike'] != [], term
+
+def test_get_tasks_short_search_term_skips_fts(client, auth_header):
+    client.post('/tasks', json={'title': 'Work Task'}, headers=auth_header)
+    plan = _list_query_plan(client, auth_header, 'title=wo')
+    assert 'VIRTUAL TABLE' not in plan, plan
+    assert 'ix_task_user_id' in plan, plan
+
+def test_get_tasks_search_follows_updates_and_deletes(client, seeded_task, auth_header):
+    client.put(f'/tasks/{seeded_task.id}', json={'title': 'Renamed Task', 'description': 'Fresh notes'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?title=Initial', headers=auth_header).data)
+    assert len(data['tasks']) == 0
+    data = json.loads(client.get('/tasks?title=renamed&description=fresh', headers=auth_header).data)
+    assert len(data['tasks']) == 1
+    
+    client.delete(f'/tasks/{seeded_task.id}', headers=auth_header)
+    data = json.loads(client.get('/tasks?title=renamed', headers=auth_header).data)
+    assert len(data['tasks']) == 0
+
+def test_get_tasks_search_uses_fts_index(client, auth_header):
+    client.post('/tasks', json={'title': 'Work Task'}, headers=auth_header)
+    plan = _list_query_plan(client, auth_header, 'title=work')
+    assert 'VIRTUAL TABLE INDEX' in plan, plan
+
+def test_get_task_etag_not_modified(client, seeded_task, auth_header):
+    response = client.get(f'/tasks/{seeded_task.id}', headers=auth_header)
+    etag = response.headers['ETag']
+    assert etag.startswith('"') and not etag.startswith('W/')
+    
+    response = client.get(f'/tasks/{seeded_task.id}', headers={**auth_header, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    
+    client.put(f'/tasks/{seeded_task.id}', json={'title': 'Changed'}, headers=auth_header)
+    response = client.get(f'/tasks/{seeded_task.id}', headers={**auth_header, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert json.loads(response.data)['title'] == 'Changed'
+
+def test_get_tasks_etag_tracks_list_state(client, auth_header):
+    client.post('/tasks', json={'title': 'Task 1'}, headers=auth_header)
+    response = client.post('/tasks', json={'title': 'Task 2'}, headers=auth_header)
+    task_id = json.loads(response.data)['id']
+    
+    etag = client.get('/tasks', headers=auth_header).headers['ETag']
+    response = client.get('/tasks', headers={**auth_header, 'If-None-Match': etag})
+    assert response.status_code == 304
+    
+    # Different parameters describe a different representation.
+    response = client.get('/tasks?limit=1', headers={**auth_header, 'If-None-Match': etag})
+    assert response.status_code == 200
+    
+    client.put(f'/tasks/{task_id}', json={'title': 'Task 2', 'status': 'done'}, headers=auth_header)
+    response = client.get('/tasks', headers={**auth_header, 'If-None-Match': etag})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    
+    client.delete(f'/tasks/{task_id}', headers=auth_header)
+    response = client.get('/tasks', headers={**auth_header, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(json.loads(response.data)['tasks']) == 1
+
+def test_get_tasks_etag_check_skips_task_scan(client, auth_header):
+    client.post('/tasks', json={'title': 'Task 1'}, headers=auth_header)
+    etag = client.get('/tasks', headers=auth_header).headers['ETag']
+    
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get('/tasks', headers={**auth_header, 'If-None-Match': etag})
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', capture)
+    
+    assert response.status_code == 304
+    assert len(statements) == 1
+    assert 'FROM user_task_stats' in statements[0]
+
+def test_update_task_bumps_updated_at(client, seeded_task, auth_header):
+    before = json.loads(client.get(f'/tasks/{seeded_task.id}', headers=auth_header).data)
+    assert before['updated_at'] is not None
+    after = json.loads(client.put(f'/tasks/{seeded_task.id}', json={'title': 'Changed'}, headers=auth_header).data)
+    assert after['updated_at'] > before['updated_at']
+    assert after['created_at'] == before['created_at']
+
+def test_create_tasks_bulk_success(client, user, auth_header):
+    items = [{'title': f'Task {i}', 'status': 'done' if i % 2 else 'todo'} for i in range(50)]
+    
+    inserts = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO task'):
+            inserts.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.post('/tasks/bulk', json={'tasks': items}, headers=auth_header)
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', capture)
+    
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['created'] == 50
+    assert data['errors'] == []
+    assert [task['title'] for task in data['tasks']] == [item['title'] for item in items]
+    assert data['tasks'][1]['status'] == 'done'
+    assert all(task['user_id'] == user.id and task['created_at'] for task in data['tasks'])
+    assert len(inserts) == 1
+    assert 'RETURNING' in inserts[0]
+    
+    data = json.loads(client.get('/tasks?limit=1', headers=auth_header).data)
+    assert data['pagination']['total'] == 50
+
+def test_create_tasks_bulk_reports_item_errors(client, auth_header):
+    items = [{'title': 'Good'}, {'description': 'missing title'}, {'title': 'Bad status', 'status': 'later'}]
+    response = client.post('/tasks/bulk', json={'tasks': items}, headers=auth_header)
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['created'] == 1
+    assert [error['index'] for error in data['errors']] == [1, 2]
+    assert data['errors'][0]['errors'][0]['loc'] == ['title']
+    assert data['errors'][1]['errors'][0]['loc'] == ['status']
+
+def test_create_tasks_bulk_reports_non_object_items(client, auth_header):
+    items = [{'title': 'Good'}, 'x', 1, None]
+    response = client.post('/tasks/bulk', json={'tasks': items}, headers=auth_header)
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['created'] == 1
+    assert [error['index'] for error in data['errors']] == [1, 2, 3]
+    assert data['errors'][0]['errors'][0]['type'] == 'model_type'
+
+def test_create_tasks_bulk_all_invalid(client, auth_header):
+    response = client.post('/tasks/bulk', json={'tasks': [{'title': ''}]}, headers=auth_header)
+    assert response.status_code == 400
+    data = json.loads(response.data)
+    assert data['validation_error']['items'][0]['index'] == 0
+    
+    data = json.loads(client.get('/tasks', headers=auth_header).data)
+    assert data['pagination']['total'] == 0
+
+def test_create_tasks_bulk_limits(client, app_with_context, auth_header):
+    response = client.post('/tasks/bulk', json={'tasks': []}, headers=auth_header)
+    assert response.status_code == 400
+    
+    app_with_context.config['TASKS_BULK_MAX_ITEMS'] = 2
+    response = client.post('/tasks/bulk', json={'tasks': [{'title': 'T'}] * 3}, headers=auth_header)
+    assert response.status_code == 400
+    data = json.loads(response.data)
+    assert 'At most 2 tasks' in data['validation_error']['message']
+
+def _create_other_user_task(client):
+    client.post('/register', json={'email': 'other@example.com', 'username': 'otheruser', 'password': 'password123'})
+    token = json.loads(client.post('/login', json={'username': 'otheruser', 'password': 'password123'}).data)['access_token']
+    other_header = {'Authorization': f'Bearer {token}'}
+    task_id = json.loads(client.post('/tasks', json={'title': 'Work of someone else'}, headers=other_header).data)['id']
+    return task_id, other_header
+
+def test_update_tasks_bulk_by_filter(client, auth_header):
+    client.post('/tasks/bulk', json={'tasks': [{'title': 'Work A'}, {'title': 'Work B'}, {'title': 'Home'}]}, headers=auth_header)
+    other_task_id, other_header = _create_other_user_task(client)
+    
+    response = client.patch('/tasks/bulk', json={'filter': {'title': 'work'}, 'changes': {'status': 'done'}}, headers=auth_header)
+    assert response.status_code == 200
+    assert json.loads(response.data) == {'updated': 2}
+    
+    data = json.loads(client.get('/tasks?status=done', headers=auth_header).data)
+    assert sorted(task['title'] for task in data['tasks']) == ['Work A', 'Work B']
+    other = json.loads(client.get(f'/tasks/{other_task_id}', headers=other_header).data)
+    assert other['status'] == 'todo'
+
+def test_update_tasks_bulk_by_ids_keeps_ownership(client, auth_header):
+    data = json.loads(client.post('/tasks/bulk', json={'tasks': [{'title': 'A'}, {'title': 'B'}]}, headers=auth_header).data)
+    ids = [task['id'] for task in data['tasks']]
+    other_task_id, other_header = _create_other_user_task(client)
+    
+    response = client.patch('/tasks/bulk', json={'ids': ids + [other_task_id], 'changes': {'description': 'bulk'}}, headers=auth_header)
+    assert json.loads(response.data) == {'updated': 2}
+    other = json.loads(client.get(f'/tasks/{other_task_id}', headers=other_header).data)
+    assert other['description'] == ''
+
+def test_delete_tasks_bulk_by_filter(client, auth_header):
+    client.post('/tasks/bulk', json={'tasks': [{'title': 'A', 'status': 'done'}, {'title': 'B', 'status': 'done'}, {'title': 'C'}]}, headers=auth_header)
+    
+    response = client.delete('/tasks/bulk', json={'filter': {'status': 'done'}}, headers=auth_header)
+    assert json.loads(response.data) == {'deleted': 2}
+    data = json.loads(client.get('/tasks', headers=auth_header).data)
+    assert [task['title'] for task in data['tasks']] == ['C']
+
+def test_delete_tasks_bulk_by_ids(client, auth_header):
+    data = json.loads(client.post('/tasks/bulk', json={'tasks': [{'title': 'A'}, {'title': 'B'}]}, headers=auth_header).data)
+    other_task_id, other_header = _create_other_user_task(client)
+    
+    response = client.delete('/tasks/bulk', json={'ids': [data['tasks'][0]['id'], other_task_id, 999]}, headers=auth_header)
+    assert json.loads(response.data) == {'deleted': 1}
+    assert client.get(f'/tasks/{other_task_id}', headers=other_header).status_code == 200
+
+def test_bulk_selector_validation(client, auth_header):
+    response = client.delete('/tasks/bulk', json={}, headers=auth_header)
+    assert response.status_code == 400
+    response = client.delete('/tasks/bulk', json={'ids': [1], 'filter': {}}, headers=auth_header)
+    assert response.status_code == 400
+    response = client.patch('/tasks/bulk', json={'ids': [1], 'changes': {}}, headers=auth_header)
+    assert response.status_code == 400
+    response = client.patch('/tasks/bulk', json={'filter': {'status': 'later'}, 'changes': {'status': 'done'}}, headers=auth_header)
+    assert response.status_code == 400
+    response = client.patch('/tasks/bulk', json={'filter': {'title': 'x' * 51}, 'changes': {'status': 'done'}}, headers=auth_header)
+    assert response.status_code == 400
+
+def test_bulk_filter_must_select_something(client, auth_header):
+    client.post('/tasks/bulk', json={'tasks': [{'title': 'A'}, {'title': 'B'}]}, headers=auth_header)
+    
+    for selector in ({}, {'title': ''}, {'all': False}):
+        response = client.delete('/tasks/bulk', json={'filter': selector}, headers=auth_header)
+        assert response.status_code == 400
+        response = client.patch('/tasks/bulk', json={'filter': selector, 'changes': {'status': 'done'}}, headers=auth_header)
+        assert response.status_code == 400
+    assert json.loads(client.get('/tasks/stats', headers=auth_header).data)['by_status']['todo'] == 2
+    
+    response = client.patch('/tasks/bulk', json={'filter': {'all': True}, 'changes': {'status': 'done'}}, headers=auth_header)
+    assert json.loads(response.data) == {'updated': 2}
+    response = client.delete('/tasks/bulk', json={'filter': {'all': True}}, headers=auth_header)
+    assert json.loads(response.data) == {'deleted': 2}
+
+def test_export_tasks_ndjson(client, app_with_context, auth_header):
+    app_with_context.config['TASKS_EXPORT_BATCH_SIZE'] = 7
+    client.post('/tasks/bulk', json={'tasks': [{'title': f'Task {i}', 'status': 'done' if i % 2 else 'todo'} for i in range(20)]}, headers=auth_header)
+    _create_other_user_task(client)
+    
+    response = client.get('/tasks/export', headers=auth_header)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.data.decode().splitlines()
+    assert len(lines) == 20
+    tasks = [json.loads(line) for line in lines]
+    assert tasks[0]['title'] == 'Task 19'
+    assert {task['user_id'] for task in tasks} == {tasks[0]['user_id']}
+    
+    response = client.get('/tasks/export?status=done&sort_by=title', headers=auth_header)
+    titles = [json.loads(line)['title'] for line in response.data.decode().splitlines()]
+    assert titles == sorted(f'Task {i}' for i in range(20) if i % 2)
+
+def test_export_tasks_csv(client, auth_header):
+    client.post('/tasks', json={'title': 'Comma, "quoted"', 'description': 'line'}, headers=auth_header)
+    
+    response = client.get('/tasks/export?format=csv', headers=auth_header)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = list(csv.reader(io.StringIO(response.data.decode())))
+    assert rows[0] == ['id', 'title', 'description', 'status', 'user_id', 'created_at', 'updated_at']
+    assert rows[1][1:4] == ['Comma, "quoted"', 'line', 'todo']
+    assert len(rows) == 2
+
+def test_export_tasks_invalid_format(client, auth_header):
+    response = client.get('/tasks/export?format=xml', headers=auth_header)
+    assert response.status_code == 400
+    data = json.loads(response.data)
+    assert 'Invalid format parameter' in data['validation_error']['message']
+
+def test_import_tasks_ndjson(client, app_with_context, auth_header):
+    app_with_context.config['TASKS_IMPORT_BATCH_SIZE'] = 2
+    lines = [
+        json.dumps({'title': 'One'}),
+        json.dumps({'title': 'Two', 'status': 'done'}),
+        '',
+        '{not json',
+        json.dumps({'title': ''}),
+        json.dumps(['not', 'an', 'object']),
+        json.dumps({'title': 'Three', 'description': 'last'}),
+    ]
+    response = client.post('/tasks/import', data='\n'.join(lines), content_type='application/x-ndjson', headers=auth_header)
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['accepted'] == 3
+    assert data['rejected'] == 3
+    assert [error['line'] for error in data['errors']] == [4, 5, 6]
+    assert data['errors'][1]['errors'][0]['loc'] == ['title']
+    assert data['errors_truncated'] == False
+    
+    data = json.loads(client.get('/tasks?sort_by=title', headers=auth_header).data)
+    assert [task['title'] for task in data['tasks']] == ['One', 'Three', 'Two']
+
+def test_import_tasks_csv_round_trip(client, auth_header):
+    client.post('/tasks/bulk', json={'tasks': [{'title': 'A', 'description': 'x, y'}, {'title': 'B', 'status': 'inprogress'}]}, headers=auth_header)
+    exported = client.get('/tasks/export?format=csv', headers=auth_header).data
+    
+    response = client.post('/tasks/import', data=exported, content_type='text/csv', headers=auth_header)
+    data = json.loads(response.data)
+    assert data['accepted'] == 2
+    assert data['rejected'] == 0
+    
+    data = json.loads(client.get('/tasks?status=inprogress', headers=auth_header).data)
+    assert len(data['tasks']) == 2
+    data = json.loads(client.get('/tasks?description=x, y', headers=auth_header).data)
+    assert len(data['tasks']) == 2
+
+def test_import_tasks_caps_error_list(client, app_with_context, auth_header):
+    app_with_context.config['TASKS_IMPORT_MAX_ERRORS'] = 2
+    response = client.post('/tasks/import?format=ndjson', data='x\ny\nz\n', headers=auth_header)
+    data = json.loads(response.data)
+    assert data['rejected'] == 3
+    assert len(data['errors']) == 2
+    assert data['errors_truncated'] == True
+
+def test_import_reader_handles_chunk_boundaries():
+    def read(import_format, body, size):
+        reader = ImportReader(import_format)
+        records = []
+        for start in range(0, len(body), size):
+            records += reader.feed(body[start:start + size])
+        return records + reader.close()
+
+    ndjson = '{"title": "Café"}\r\n\r\n{"title": "Two"}\r[1]'.encode()
+    csv_body = 'title,description\r\nA,"two\r\nlines, ""quoted"""\r\nB,\r\n'.encode()
+    for size in range(1, 8):
+        assert read('ndjson', ndjson, size) == [(1, {'title': 'Café'}), (3, {'title': 'Two'}), (4, None)], size
+        assert read('csv', csv_body, size) == [(3, {'title': 'A', 'description': 'two\r\nlines, "quoted"'}), (4, {'title': 'B'})], size
+
+def test_get_tasks_sparse_fields(client, auth_header):
+    client.post('/tasks', json={'title': 'Task 1', 'description': 'Long text'}, headers=auth_header)
+    client.post('/tasks', json={'title': 'Task 2', 'description': 'Long text'}, headers=auth_header)
+    
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'ORDER BY' in statement:
+            statements.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get('/tasks?fields=title,id,status&limit=1', headers=auth_header)
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', capture)
+    
+    data = json.loads(response.data)
+    assert data['tasks'] == [{'id': 2, 'title': 'Task 2', 'status': 'todo'}]
+    assert data['pagination']['next_cursor'] is not None
+    select_list = statements[0].split(' FROM ')[0]
+    assert 'task.description' not in select_list
+    assert 'task.title' in select_list
+
+def test_get_tasks_sparse_fields_with_cursor(client, auth_header):
+    for i in range(3):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    
+    data = json.loads(client.get('/tasks?fields=id&sort_by=title&limit=2&cursor=', headers=auth_header).data)
+    assert data['tasks'] == [{'id': 1}, {'id': 2}]
+    next_cursor = data['pagination']['next_cursor']
+    data = json.loads(client.get(f'/tasks?fields=id&sort_by=title&limit=2&cursor={next_cursor}', headers=auth_header).data)
+    assert data['tasks'] == [{'id': 3}]
+
+def test_get_task_sparse_fields(client, seeded_task, auth_header):
+    response = client.get(f'/tasks/{seeded_task.id}?fields=title', headers=auth_header)
+    assert json.loads(response.data) == {'title': 'Initial Task'}
+    full_etag = client.get(f'/tasks/{seeded_task.id}', headers=auth_header).headers['ETag']
+    assert response.headers['ETag'] != full_etag
+
+def test_export_tasks_sparse_fields(client, auth_header):
+    client.post('/tasks', json={'title': 'Task 1', 'status': 'done'}, headers=auth_header)
+    
+    response = client.get('/tasks/export?format=csv&fields=status,title', headers=auth_header)
+    rows = list(csv.reader(io.StringIO(response.data.decode())))
+    assert rows == [['title', 'status'], ['Task 1', 'done']]
+    
+    response = client.get('/tasks/export?fields=id', headers=auth_header)
+    assert json.loads(response.data) == {'id': 1}
+
+def test_sparse_fields_reject_unknown(client, seeded_task, auth_header):
+    for url in ['/tasks?fields=title,secret', f'/tasks/{seeded_task.id}?fields=password', '/tasks/export?fields=,']:
+        response = client.get(url, headers=auth_header)
+        assert response.status_code == 400
+        assert 'Invalid fields parameter' in json.loads(response.data)['validation_error']['message']
+
+def _write_statements(client, method, url, auth_header, **kwargs):
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.open(url, method=method, headers=auth_header, **kwargs)
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', capture)
+    return response, statements
+
+def test_task_writes_are_single_statements(client, auth_header):
+    response, statements = _write_statements(client, 'POST', '/tasks', auth_header, json={'title': 'One trip'})
+    assert response.status_code == 201
+    assert len(statements) == 1
+    assert statements[0].startswith('INSERT INTO task') and 'RETURNING' in statements[0]
+    task = json.loads(response.data)
+    assert task['title'] == 'One trip' and task['status'] == 'todo' and task['created_at']
+    
+    response, statements = _write_statements(client, 'PUT', f"/tasks/{task['id']}", auth_header, json={'title': 'Renamed', 'status': 'done'})
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert statements[0].startswith('UPDATE task') and 'RETURNING' in statements[0]
+    assert json.loads(response.data)['title'] == 'Renamed'
+    
+    response, statements = _write_statements(client, 'DELETE', f"/tasks/{task['id']}", auth_header)
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert statements[0].startswith('DELETE FROM task')
+
+def test_task_writes_scoped_to_owner(client, auth_header):
+    other_task_id, _ = _create_other_user_task(client)
+    
+    response = client.put(f'/tasks/{other_task_id}', json={'title': 'Hijacked'}, headers=auth_header)
+    assert response.status_code == 404
+    response = client.delete(f'/tasks/{other_task_id}', headers=auth_header)
+    assert response.status_code == 404
+    assert db.session.get(Task, other_task_id).title != 'Hijacked'
+
+def test_create_task_for_deleted_user(client, user, auth_header):
+    db.session.delete(user)
+    db.session.commit()
+    
+    response = client.post('/tasks', json={'title': 'Orphan'}, headers=auth_header)
+    assert response.status_code == 404
+    assert db.session.execute(sa.select(sa.func.count()).select_from(Task)).scalar() == 0
+
+def test_task_routes_trust_known_user(app_with_context, client, auth_header):
+    metrics.reset()
+    response, statements = _write_statements(client, 'POST', '/tasks/bulk', auth_header, json={'tasks': [{'title': 'A'}]})
+    assert response.status_code == 201
+    assert not any('FROM user' in statement for statement in statements)
+    assert metrics.snapshot()['counters']['auth_user_cache.hit'] == 1
+
+def test_task_routes_check_unknown_user_once(app_with_context, client, auth_header):
+    init_auth_context(app_with_context)
+    metrics.reset()
+    
+    response, statements = _write_statements(client, 'POST', '/tasks', auth_header, json={'title': 'A'})
+    assert response.status_code == 201
+    assert sum('FROM user' in statement for statement in statements) == 1
+    response, statements = _write_statements(client, 'POST', '/tasks', auth_header, json={'title': 'B'})
+    assert response.status_code == 201
+    assert not any('FROM user' in statement for statement in statements)
+    counters = metrics.snapshot()['counters']
+    assert counters['auth_user_cache.miss'] == 1
+    assert counters['auth_user_cache.hit'] == 1
+
+def test_user_cache_disabled(app_with_context, client, auth_header):
+    app_with_context.config['AUTH_USER_CACHE_TTL'] = 0
+    init_auth_context(app_with_context)
+    
+    for title in ('A', 'B'):
+        response, statements = _write_statements(client, 'POST', '/tasks', auth_header, json={'title': title})
+        assert response.status_code == 201
+        assert sum('FROM user' in statement for statement in statements) == 1
+
+def test_deleted_user_forgotten_by_task_routes(app_with_context, client, user, auth_header):
+    assert user.id in app_with_context.extensions['known_users']
+    db.session.delete(user)
+    db.session.commit()
+    
+    response = client.post('/tasks/bulk', json={'tasks': [{'title': 'B'}]}, headers=auth_header)
+    assert response.status_code == 404
@@ -0,0 +1,118 @@
+import json
+from models import db
+from models.task import Task
+from models.task_changes import TaskTombstone
+from models.user import User
+from pagination import changes_statement
+
+def _changes(client, auth_header, since='', **params):
+    response = client.get('/tasks/changes', query_string={'since': since, **params}, headers=auth_header)
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+def test_changes_from_the_beginning(client, auth_header):
+    first = json.loads(client.post('/tasks', json={'title': 'One'}, headers=auth_header).data)
+    client.post('/tasks', json={'title': 'Two'}, headers=auth_header)
+
+    data = _changes(client, auth_header)
+    assert [task['title'] for task in data['tasks']] == ['One', 'Two']
+    assert data['tasks'][0] == first
+    assert data['deleted'] == []
+    assert data['has_more'] == False
+
+    assert _changes(client, auth_header, data['next_since']) == {
+        'tasks': [], 'deleted': [], 'next_since': data['next_since'], 'has_more': False
+    }
+
+def test_changes_after_token(client, auth_header):
+    one = json.loads(client.post('/tasks', json={'title': 'One'}, headers=auth_header).data)
+    two = json.loads(client.post('/tasks', json={'title': 'Two'}, headers=auth_header).data)
+    client.post('/tasks', json={'title': 'Three'}, headers=auth_header)
+    since = json.loads(client.get('/tasks', headers=auth_header).data)['sync_token']
+
+    client.put(f"/tasks/{one['id']}", json={'title': 'One', 'status': 'done'}, headers=auth_header)
+    client.delete(f"/tasks/{two['id']}", headers=auth_header)
+    client.post('/tasks', json={'title': 'Four'}, headers=auth_header)
+
+    data = _changes(client, auth_header, since)
+    assert [(task['title'], task['status']) for task in data['tasks']] == [('One', 'done'), ('Four', 'todo')]
+    assert data['deleted'] == [two['id']]
+
+def test_changes_cover_bulk_and_direct_writes(client, user, auth_header):
+    since = _changes(client, auth_header)['next_since']
+    client.post('/tasks/bulk', json={'tasks': [{'title': 'A'}, {'title': 'B'}]}, headers=auth_header)
+    client.patch('/tasks/bulk', json={'filter': {'title': 'A'}, 'changes': {'status': 'inprogress'}}, headers=auth_header)
+    db.session.add(Task(title='Direct', user_id=user.id))
+    db.session.commit()
+
+    data = _changes(client, auth_header, since)
+    assert [task['title'] for task in data['tasks']] == ['B', 'A', 'Direct']
+
+    since = data['next_since']
+    client.delete('/tasks/bulk', json={'filter': {'title': 'B'}}, headers=auth_header)
+    assert len(_changes(client, auth_header, since)['deleted']) == 1
+
+def test_changes_paginate(client, auth_header):
+    for i in range(5):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+
+    data = _changes(client, auth_header, limit=2)
+    titles = [task['title'] for task in data['tasks']]
+    while data['has_more']:
+        data = _changes(client, auth_header, data['next_since'], limit=2)
+        titles += [task['title'] for task in data['tasks']]
+    assert titles == [f'Task {i+1}' for i in range(5)]
+
+def test_changes_scoped_to_user(client, auth_header):
+    client.post('/register', json={'email': 'other@example.com', 'username': 'otheruser', 'password': 'password123'})
+    token = json.loads(client.post('/login', json={'username': 'otheruser', 'password': 'password123'}).data)['access_token']
+    other = json.loads(client.post('/tasks', json={'title': 'Theirs'}, headers={'Authorization': f'Bearer {token}'}).data)
+    client.delete(f"/tasks/{other['id']}", headers={'Authorization': f'Bearer {token}'})
+
+    data = _changes(client, auth_header)
+    assert data['tasks'] == []
+    assert data['deleted'] == []
+
+def test_deleted_ids_not_reused_across_users(client, auth_header):
+    client.post('/register', json={'email': 'other@example.com', 'username': 'otheruser', 'password': 'password123'})
+    token = json.loads(client.post('/login', json={'username': 'otheruser', 'password': 'password123'}).data)['access_token']
+    other_header = {'Authorization': f'Bearer {token}'}
+    since = _changes(client, auth_header)['next_since']
+    mine = json.loads(client.post('/tasks', json={'title': 'Mine'}, headers=auth_header).data)
+    client.delete(f"/tasks/{mine['id']}", headers=auth_header)
+
+    theirs = json.loads(client.post('/tasks', json={'title': 'Theirs'}, headers=other_header).data)
+    assert theirs['id'] != mine['id']
+    assert _changes(client, auth_header, since)['deleted'] == [mine['id']]
+
+def test_tombstones_kept_per_user(client, user, auth_header):
+    client.post('/register', json={'email': 'other@example.com', 'username': 'otheruser', 'password': 'password123'})
+    other = User.query.filter_by(username='otheruser').first()
+    since = _changes(client, auth_header)['next_since']
+    mine = json.loads(client.post('/tasks', json={'title': 'Mine'}, headers=auth_header).data)
+    client.delete(f"/tasks/{mine['id']}", headers=auth_header)
+
+    # An id handed out again, as a database without AUTOINCREMENT would.
+    theirs = Task(title='Theirs', user_id=other.id)
+    theirs.id = mine['id']
+    db.session.add(theirs)
+    db.session.commit()
+    db.session.delete(theirs)
+    db.session.commit()
+
+    assert db.session.query(TaskTombstone).filter_by(task_id=mine['id']).count() == 2
+    assert _changes(client, auth_header, since)['deleted'] == [mine['id']]
+
+def test_changes_served_from_change_seq_index(app_with_context):
+    statement = changes_statement(1, 0, 100).compile(db.engine, compile_kwargs={'literal_binds': True})
+    with db.engine.connect() as conn:
+        plan = ' | '.join(row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}').all())
+    assert 'ix_task_user_id_change_seq' in plan
+    assert 'ix_task_tombstone_user_id_change_seq' in plan
+
+def test_changes_invalid_parameters(client, auth_header):
+    response = client.get('/tasks/changes?since=not-a-token', headers=auth_header)
+    assert response.status_code == 400
+    assert json.loads(response.data)['validation_error']['message'] == 'Invalid since parameter'
+    response = client.get('/tasks/changes?limit=0', headers=auth_header)
+    assert response.status_code == 400
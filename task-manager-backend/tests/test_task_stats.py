@@ -0,0 +1,55 @@
+import json
+import sqlalchemy as sa
+from models import db
+from models.task import Task
+from models.user_task_stats import UserTaskStats
+
+def _stats(client, auth_header):
+    response = client.get('/tasks/stats', headers=auth_header)
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+def test_stats_for_user_without_tasks(client, auth_header):
+    assert _stats(client, auth_header) == {'total': 0, 'by_status': {'todo': 0, 'inprogress': 0, 'done': 0}}
+
+def test_stats_follow_every_write(client, auth_header):
+    first = json.loads(client.post('/tasks', json={'title': 'One'}, headers=auth_header).data)
+    client.post('/tasks/bulk', json={'tasks': [{'title': 'Two', 'status': 'inprogress'}, {'title': 'Three', 'status': 'done'}]}, headers=auth_header)
+    assert _stats(client, auth_header) == {'total': 3, 'by_status': {'todo': 1, 'inprogress': 1, 'done': 1}}
+
+    client.put(f"/tasks/{first['id']}", json={'title': 'One', 'status': 'done'}, headers=auth_header)
+    assert _stats(client, auth_header)['by_status'] == {'todo': 0, 'inprogress': 1, 'done': 2}
+
+    client.patch('/tasks/bulk', json={'filter': {'status': 'done'}, 'changes': {'status': 'todo'}}, headers=auth_header)
+    assert _stats(client, auth_header)['by_status'] == {'todo': 2, 'inprogress': 1, 'done': 0}
+
+    client.delete(f"/tasks/{first['id']}", headers=auth_header)
+    client.delete('/tasks/bulk', json={'filter': {'status': 'inprogress'}}, headers=auth_header)
+    assert _stats(client, auth_header) == {'total': 1, 'by_status': {'todo': 1, 'inprogress': 0, 'done': 0}}
+
+def test_stats_follow_writes_outside_the_api(client, user, auth_header):
+    db.session.add(Task(title='Direct', user_id=user.id))
+    db.session.commit()
+    assert _stats(client, auth_header)['total'] == 1
+
+def test_unfiltered_total_read_from_stats(client, user, auth_header):
+    for i in range(3):
+        client.post('/tasks', json={'title': f'Task {i+1}'}, headers=auth_header)
+    stats_table = UserTaskStats.__table__
+    db.session.execute(sa.update(stats_table).where(stats_table.c.user_id == user.id).values(todo=7))
+    db.session.commit()
+
+    assert json.loads(client.get('/tasks', headers=auth_header).data)['pagination']['total'] == 7
+    assert json.loads(client.get('/tasks?status=todo', headers=auth_header).data)['pagination']['total'] == 7
+    # Text filters still count the matching rows.
+    assert json.loads(client.get('/tasks?title=Task', headers=auth_header).data)['pagination']['total'] == 3
+
+def test_rebuild_task_stats_command(app_with_context, client, user, auth_header):
+    client.post('/tasks', json={'title': 'Task 1', 'status': 'done'}, headers=auth_header)
+    db.session.execute(sa.delete(UserTaskStats.__table__))
+    db.session.commit()
+    assert _stats(client, auth_header)['total'] == 0
+
+    result = app_with_context.test_cli_runner().invoke(args=['tasks', 'rebuild-task-stats'])
+    assert 'Rebuilt task stats for 1 users' in result.output
+    assert _stats(client, auth_header) == {'total': 1, 'by_status': {'todo': 0, 'inprogress': 0, 'done': 1}}
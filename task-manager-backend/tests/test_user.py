@@ -1,6 +1,10 @@
-# import pytest
 import json
+from datetime import datetime
+import pytest
+import sqlalchemy as sa
+from models import db
 from models.user import User
+from models.token_blocklist import TokenBlocklist
 
 def test_register_user_success(client):
     user_data = {
@@ -289,3 +293,78 @@ def test_register_user_email_too_long(client):
     error_detail = data['validation_error']['body_params'][0]
     assert error_detail['loc'] == ['email']
     assert 'too long before the @-sign' in error_detail['msg']
+
+def _login(client, user):
+    response = client.post('/login', json={'username': user.username, 'password': 'password123'})
+    return json.loads(response.data)
+
+def test_login_returns_refresh_token(client, user):
+    data = _login(client, user)
+    assert data['access_token']
+    assert data['refresh_token']
+
+def test_refresh_token_rotation(client, user):
+    tokens = _login(client, user)
+    
+    response = client.post('/token/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 200
+    rotated = json.loads(response.data)
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    response = client.get('/tasks', headers={'Authorization': f"Bearer {rotated['access_token']}"})
+    assert response.status_code == 200
+    
+    response = client.post('/token/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401
+    assert json.loads(response.data)['message'] == 'Refresh token has already been used'
+    
+    response = client.post('/token/refresh', headers={'Authorization': f"Bearer {rotated['refresh_token']}"})
+    assert response.status_code == 200
+
+def test_refresh_requires_refresh_token(client, user):
+    tokens = _login(client, user)
+    response = client.post('/token/refresh', headers={'Authorization': f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 422
+    response = client.get('/tasks', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 422
+
+def test_refresh_skips_password_check(client, user, monkeypatch):
+    tokens = _login(client, user)
+    monkeypatch.setattr(User, 'check_password', lambda self, password: pytest.fail('password checked'))
+    response = client.post('/token/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 200
+
+def test_purge_token_blocklist(app_with_context, client, user):
+    tokens = _login(client, user)
+    client.post('/token/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    TokenBlocklist.query.update({'expires_at': datetime(2000, 1, 1)})
+    db.session.commit()
+    
+    result = app_with_context.test_cli_runner().invoke(args=['auth', 'purge-token-blocklist'])
+    assert result.exit_code == 0
+    assert 'Purged 1' in result.output
+    assert TokenBlocklist.query.count() == 0
+
+def test_register_user_is_one_statement(client):
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.post('/register', json={'email': 'one@example.com', 'username': 'oneuser', 'password': 'password123'})
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', capture)
+    assert response.status_code == 201
+    assert json.loads(response.data)['username'] == 'oneuser'
+    assert len(statements) == 1
+    assert statements[0].startswith('INSERT INTO user')
+
+def test_register_user_duplicate_username_and_email(client, user):
+    response = client.post('/register', json={'email': 'test@example.com', 'username': 'testuser', 'password': 'password123'})
+    assert response.status_code == 400
+    assert json.loads(response.data)['message'] == 'Username already exists'
+    assert User.query.count() == 1
+
+def test_register_user_after_duplicate(client, user):
+    client.post('/register', json={'email': 'test@example.com', 'username': 'fresh', 'password': 'password123'})
+    response = client.post('/register', json={'email': 'fresh@example.com', 'username': 'fresh', 'password': 'password123'})
+    assert response.status_code == 201
@@ -1,19 +1,307 @@
-from typing import Optional
+import codecs
+import csv
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, List, Optional, Tuple
+import sqlalchemy as sa
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from flask import Flask, current_app, has_app_context
 from models.user import User
 from models.task import Task
 from models import db
+from sqlalchemy.orm import load_only
+import metrics
+from schemas.task import TaskRequest, TaskStatus, TaskBulkSelector
+from search import substring_match
+
+class InvalidParameter(ValueError):
+    """A request parameter failed validation. Both apps answer it with a 400
+    whose validation_error.message is str(exc)."""
 
 def get_user_by_id(user_id: int) -> Optional[User]:
     return db.session.get(User, user_id)
 
-def get_task_by_id_and_user(task_id: int, user_id: int) -> Optional[Task]:
+class KnownUserCache:
+    """Bounded, per-process set of user ids recently confirmed to exist.
+
+    Deletions made through this process's session are dropped at once (see
+    _forget_deleted_user); anything else, including deletes in another
+    worker, is only noticed once the entry's TTL runs out.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._expiry: 'OrderedDict[int, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            expires = self._expiry.get(user_id)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._expiry[user_id]
+                return False
+            self._expiry.move_to_end(user_id)
+            return True
+
+    def add(self, user_id: int) -> None:
+        with self._lock:
+            self._expiry[user_id] = time.monotonic() + self.ttl
+            self._expiry.move_to_end(user_id)
+            while len(self._expiry) > self.max_entries:
+                self._expiry.popitem(last=False)
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            self._expiry.pop(user_id, None)
+
+def init_auth_context(app: Flask) -> None:
+    ttl = app.config['AUTH_USER_CACHE_TTL']
+    app.extensions['known_users'] = KnownUserCache(ttl, app.config['AUTH_USER_CACHE_MAX_ENTRIES']) if ttl > 0 else None
+
+def user_exists(user_id: int) -> bool:
+    # A valid JWT only proves the user existed when it was issued; this is
+    # the check for "still exists", without a user query on a cache hit.
+    known_users = current_app.extensions.get('known_users')
+    if known_users is not None and user_id in known_users:
+        metrics.incr('auth_user_cache.hit')
+        return True
+    metrics.incr('auth_user_cache.miss')
+    exists = db.session.execute(sa.select(sa.exists().where(User.id == user_id))).scalar()
+    if exists:
+        remember_user(user_id)
+    return exists
+
+def remember_user(user_id: int) -> None:
+    known_users = current_app.extensions.get('known_users')
+    if known_users is not None:
+        known_users.add(user_id)
+
+@sa.event.listens_for(User, 'after_delete')
+def _forget_deleted_user(mapper: Any, connection: Any, target: User) -> None:
+    known_users = current_app.extensions.get('known_users') if has_app_context() else None
+    if known_users is not None:
+        known_users.discard(target.id)
+
+def get_task_by_id_and_user(task_id: int, user_id: int, columns: Optional[List[str]] = None) -> Optional[Task]:
+    if columns is not None:
+        return Task.query.options(load_only(*(getattr(Task, column) for column in columns))).filter_by(id=task_id, user_id=user_id).first()
     task = db.session.get(Task, task_id)
     if task and task.user_id == user_id:
         return task
     return None
 
-def check_username_exists(username: str) -> bool:
-    return User.query.filter_by(username=username).first() is not None
+def task_filter_clauses(user_id: int, title: Optional[str] = None, description: Optional[str] = None,
+                        status: Optional[TaskStatus] = None, search_backend: Optional[str] = None) -> List[Any]:
+    # The filter grammar shared by every endpoint that selects a user's tasks.
+    # search_backend defaults to the one detected for the Flask app's engine.
+    clauses = [Task.user_id == user_id]
+    if title:
+        clauses.append(substring_match('title', title, search_backend))
+    if description:
+        clauses.append(substring_match('description', description, search_backend))
+    if status:
+        clauses.append(Task.status == status)
+    return clauses
+
+def bulk_selection_clauses(user_id: int, body: TaskBulkSelector, max_items: int,
+                           search_backend: Optional[str] = None) -> List[Any]:
+    # Every clause list is scoped by user_id, so ids owned by someone else
+    # simply do not match.
+    if body.ids is not None:
+        if len(body.ids) > max_items:
+            raise InvalidParameter(f'At most {max_items} ids can be given at once')
+        return [Task.user_id == user_id, Task.id.in_(body.ids)]
+    return task_filter_clauses(user_id, body.filter.title, body.filter.description, body.filter.status, search_backend)
+
+def bulk_create_rows(user_id: int, items: List[Any]) -> Tuple[List[dict], List[dict]]:
+    # Validates POST /tasks/bulk items one by one: insertable rows for the
+    # valid ones, and per-index errors for the rest.
+    rows = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            task_request = TaskRequest.model_validate(item)
+        except ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.errors(include_url=False, include_context=False, include_input=False)})
+            continue
+        rows.append({
+            'title': task_request.title,
+            'description': task_request.description,
+            'status': task_request.status,
+            'user_id': user_id
+        })
+    return rows, errors
+
+DUPLICATE_MESSAGES = {
+    'username': 'Username already exists',
+    'email': 'Email already registered',
+}
+
+def duplicate_user_field(exc: IntegrityError) -> Optional[str]:
+    # PostgreSQL reports the violated constraint (user_<column>_key), SQLite
+    # the column itself ("UNIQUE constraint failed: user.<column>").
+    constraint = getattr(getattr(exc.orig, 'diag', None), 'constraint_name', None)
+    detail = constraint or str(exc.orig)
+    for field in DUPLICATE_MESSAGES:
+        if f'user_{field}_key' in detail or f'user.{field}' in detail:
+            return field
+    return None
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'tasks.ndjson'),
+    'csv': ('text/csv', 'tasks.csv'),
+}
+
+def csv_value(value: Any) -> Any:
+    # csv would str() these into "TaskStatus.TODO" and a space-separated timestamp.
+    if isinstance(value, TaskStatus):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+IMPORT_CHUNK_SIZE = 64 * 1024
+
+_LINE_ENDINGS = re.compile(r'(\r\n|\r|\n)')
+
+class _Lines:
+    # Iterator the csv reader pulls complete lines from; it runs dry between
+    # chunks and picks up again once more are queued.
+    def __init__(self) -> None:
+        self.ready: Deque[str] = deque()
+
+    def __iter__(self) -> '_Lines':
+        return self
+
+    def __next__(self) -> str:
+        if not self.ready:
+            raise StopIteration
+        return self.ready.popleft()
+
+class ImportReader:
+    """Turns the POST /tasks/import body into (line number, record) pairs as
+    chunks arrive, so Flask (request.stream) and the ASGI app (request.stream())
+    parse it the same way. record is None for a line that is not a JSON object.
+
+    Bytes are decoded as UTF-8 with replacement and lines end at \\n, \\r or
+    \\r\\n, as a TextIOWrapper with newline='' would read them.
+    """
+
+    def __init__(self, import_format: str):
+        self.import_format = import_format
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending = ''
+        self._line_no = 0
+        # csv: lines are handed over a whole record at a time (an even number
+        # of quotes so far), so a quoted newline never spans two chunks.
+        self._held: List[str] = []
+        self._quotes = 0
+        self._lines = _Lines()
+        self._csv = csv.DictReader(self._lines)
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, Optional[dict]]]:
+        return self._parse(self._decoder.decode(chunk), final=False)
+
+    def close(self) -> List[Tuple[int, Optional[dict]]]:
+        return self._parse(self._decoder.decode(b'', final=True), final=True)
+
+    def _parse(self, text: str, final: bool) -> List[Tuple[int, Optional[dict]]]:
+        parts = _LINE_ENDINGS.split(self._pending + text)
+        lines = [parts[i] + parts[i + 1] for i in range(0, len(parts) - 1, 2)]
+        self._pending = parts[-1]
+        if not final and lines and lines[-1].endswith('\r') and not self._pending:
+            # The \n of a \r\n may still be on its way.
+            self._pending = lines.pop()
+        if final and self._pending:
+            lines.append(self._pending)
+            self._pending = ''
+        if self.import_format == 'csv':
+            return self._csv_records(lines, final)
+        return self._ndjson_records(lines)
+
+    def _ndjson_records(self, lines: List[str]) -> List[Tuple[int, Optional[dict]]]:
+        records = []
+        for line in lines:
+            self._line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            records.append((self._line_no, record if isinstance(record, dict) else None))
+        return records
+
+    def _csv_records(self, lines: List[str], final: bool) -> List[Tuple[int, Optional[dict]]]:
+        for line in lines:
+            self._held.append(line)
+            self._quotes += line.count('"')
+            if self._quotes % 2 == 0:
+                self._lines.ready.extend(self._held)
+                self._held.clear()
+                self._quotes = 0
+        if final:
+            self._lines.ready.extend(self._held)
+            self._held.clear()
+        records = []
+        for row in self._csv:
+            # Empty cells mean "use the default", so exported files import cleanly.
+            records.append((self._csv.line_num, {key: value for key, value in row.items() if key and value not in (None, '')}))
+        return records
+
+class TaskImport:
+    """Validates POST /tasks/import records into insert batches and keeps the
+    counts for the response; the caller writes each batch it is handed."""
+
+    def __init__(self, user_id: int, batch_size: int, max_errors: int):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.accepted = 0
+        self.rejected = 0
+        self.errors: List[dict] = []
+        self.batch: List[dict] = []
+
+    def add(self, line_no: int, record: Optional[dict]) -> Optional[List[dict]]:
+        # Returns a full batch to write, if this record completed one.
+        if record is None:
+            self._reject(line_no, [{'loc': [], 'msg': 'Invalid JSON object', 'type': 'json_invalid'}])
+            return None
+        try:
+            task_request = TaskRequest.model_validate(record)
+        except ValidationError as exc:
+            self._reject(line_no, exc.errors(include_url=False, include_context=False, include_input=False))
+            return None
+        self.batch.append({
+            'title': task_request.title,
+            'description': task_request.description,
+            'status': task_request.status,
+            'user_id': self.user_id
+        })
+        self.accepted += 1
+        return self.take() if len(self.batch) >= self.batch_size else None
+
+    def take(self) -> List[dict]:
+        batch, self.batch = self.batch, []
+        return batch
+
+    def _reject(self, line_no: int, errors: List[Any]) -> None:
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_no, 'errors': errors})
 
-def check_email_exists(email: str) -> bool:
-    return User.query.filter_by(email=email).first() is not None 
\ No newline at end of file
+    def payload(self) -> dict:
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'errors_truncated': self.rejected > len(self.errors)
+        }
@@ -32,6 +32,15 @@ const defaultFilters: TaskFiltersState = {
   sortOrder: 'desc',
 };
 
+type TaskField = 'title' | 'description' | 'status';
+
+// Fields whose value decides whether, and where, a task appears on the page:
+// the ones filtered on, plus the sort column (created_at never changes).
+function pagePlacementFields(applied: TaskFiltersState): TaskField[] {
+  const fields: TaskField[] = ['title', 'description', 'status'];
+  return fields.filter((field) => applied[field] || applied.sortBy === field);
+}
+
 function Tasks() {
   const [tasks, setTasks] = useState<Task[]>([]);
   const [loading, setLoading] = useState(false);
@@ -53,6 +62,8 @@ function Tasks() {
   // Delete Task state
   const [deleteLoading, setDeleteLoading] = useState(false);
   const [pageSize, setPageSize] = useState(10);
+  // Token from the last page load; /tasks/changes returns what happened after it.
+  const [syncToken, setSyncToken] = useState<string | null>(null);
   const navigate = useNavigate();
 
   // Fetch tasks
@@ -82,6 +93,7 @@ function Tasks() {
         }
         const data = await res.json();
         setTasks(data.tasks);
+        setSyncToken(data.sync_token ?? null);
         setTotalPages(data.pagination.total_pages);
         setHasNext(data.pagination.has_next);
         setHasPrev(data.pagination.has_prev);
@@ -152,6 +164,39 @@ function Tasks() {
     }
   };
 
+  // Patch the page with what changed since it was loaded instead of reloading
+  // it, but only for edits that leave every row where it was. Deletes (which
+  // shorten the page and shift later ones), changes to tasks not on this page,
+  // and edits to a filtered or sorted-on field all reload, so rows never stay
+  // under a filter they no longer match and the pagination stays right.
+  const syncChanges = async () => {
+    const reload = () => setAppliedFilters({ ...appliedFilters });
+    if (!syncToken) return reload();
+    const token = localStorage.getItem('access_token');
+    try {
+      const res = await apiFetch(`${API_URL}/tasks/changes?since=${encodeURIComponent(syncToken)}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      });
+      if (!res.ok) return reload();
+      const data: { tasks: Task[]; deleted: number[]; next_since: string; has_more: boolean } = await res.json();
+      if (data.has_more || data.deleted.length > 0) return reload();
+      const onPage = new Map(tasks.map((task) => [task.id, task]));
+      const placed = pagePlacementFields(appliedFilters);
+      const keepsPlace = (task: Task) => {
+        const before = onPage.get(task.id);
+        return before !== undefined && placed.every((field) => before[field] === task[field]);
+      };
+      if (!data.tasks.every(keepsPlace)) return reload();
+      const changed = new Map(data.tasks.map((task) => [task.id, task]));
+      setTasks((current) => current.map((task) => changed.get(task.id) ?? task));
+      setSyncToken(data.next_since);
+    } catch {
+      reload();
+    }
+  };
+
   // Edit Task handlers
   const handleEditTask = (task: Task) => {
     if (showCreateForm) return; // Prevent opening edit if creating
@@ -178,7 +223,7 @@ function Tasks() {
       }
       setToast({ message: 'Task updated successfully', type: 'success' });
       setEditTask(null);
-      setAppliedFilters({ ...appliedFilters });
+      await syncChanges();
     } catch (err: unknown) {
       const errorMessage = err instanceof Error ? err.message : 'Failed to update task';
       setToast({ message: errorMessage, type: 'error' });
@@ -205,7 +250,7 @@ function Tasks() {
         throw new Error(errData.message || 'Failed to delete task');
       }
       setToast({ message: 'Task deleted successfully', type: 'success' });
-      setAppliedFilters({ ...appliedFilters });
+      await syncChanges();
     } catch (err: unknown) {
       const errorMessage = err instanceof Error ? err.message : 'Failed to delete task';
       setToast({ message: errorMessage, type: 'error' });
@@ -224,6 +269,7 @@ function Tasks() {
 
   const handleLogout = () => {
     localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
     navigate('/login');
   };
 
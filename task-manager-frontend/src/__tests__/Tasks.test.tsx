@@ -449,6 +449,112 @@ describe('Tasks Component', () => {
     });
   });
 
+  describe('Change Sync', () => {
+    const listResponse = (tasks: typeof mockTasks, syncToken: string) => ({
+      ok: true,
+      json: async () => ({ tasks, pagination: mockPagination, sync_token: syncToken }),
+    });
+    const changesResponse = (tasks: typeof mockTasks, deleted: number[]) => ({
+      ok: true,
+      json: async () => ({ tasks, deleted, next_since: 'token-next', has_more: false }),
+    });
+    const listFetches = () =>
+      mockFetch.mock.calls.filter(([url]) => String(url).startsWith('http://127.0.0.1:5000/tasks?'));
+
+    const renderTasks = () =>
+      render(
+        <BrowserRouter future={{ v7_startTransition: true, v7_relativeSplatPath: true }}>
+          <Tasks />
+        </BrowserRouter>,
+      );
+
+    const renameFirstTask = async (title: string) => {
+      fireEvent.click(screen.getByTestId('edit-task-button-0'));
+      await waitFor(() => {
+        expect(screen.getByTestId('edit-task-form-container')).toBeInTheDocument();
+      });
+      fireEvent.change(screen.getByTestId('task-title-input'), { target: { value: title } });
+      fireEvent.click(screen.getByTestId('task-submit-button'));
+    };
+
+    it('should patch an edited task in place when its position cannot change', async () => {
+      mockFetch
+        .mockResolvedValueOnce(listResponse(mockTasks, 'token-1'))
+        .mockResolvedValueOnce({ ok: true, json: async () => ({}) })
+        .mockResolvedValueOnce(changesResponse([{ ...mockTasks[0], title: 'Updated Task' }], []));
+
+      renderTasks();
+      await waitFor(() => {
+        expect(screen.getByTestId('edit-task-button-0')).toBeInTheDocument();
+      });
+      await renameFirstTask('Updated Task');
+
+      await waitFor(() => {
+        expect(screen.getByTestId('task-title-0')).toHaveTextContent('Updated Task');
+      });
+      expect(mockFetch).toHaveBeenCalledWith(
+        'http://127.0.0.1:5000/tasks/changes?since=token-1',
+        expect.any(Object),
+      );
+      expect(screen.getByTestId('task-title-1')).toHaveTextContent('Test Task 2');
+      expect(listFetches()).toHaveLength(1);
+    });
+
+    it('should reload the page after a deletion', async () => {
+      mockConfirm.mockReturnValue(true);
+      mockFetch
+        .mockResolvedValueOnce(listResponse(mockTasks, 'token-1'))
+        .mockResolvedValueOnce({ ok: true, json: async () => ({ message: 'Task deleted!' }) })
+        .mockResolvedValueOnce(changesResponse([], [1]))
+        .mockResolvedValueOnce(listResponse([mockTasks[1]], 'token-2'));
+
+      renderTasks();
+      await waitFor(() => {
+        expect(screen.getByTestId('delete-task-button-0')).toBeInTheDocument();
+      });
+      fireEvent.click(screen.getByTestId('delete-task-button-0'));
+
+      await waitFor(() => {
+        expect(listFetches()).toHaveLength(2);
+      });
+      await waitFor(() => {
+        expect(screen.getByTestId('task-title-0')).toHaveTextContent('Test Task 2');
+      });
+      expect(screen.queryByTestId('task-title-1')).not.toBeInTheDocument();
+    });
+
+    it('should reload the page when an edit changes the sort column', async () => {
+      mockFetch
+        .mockResolvedValueOnce(listResponse(mockTasks, 'token-1'))
+        .mockResolvedValueOnce(listResponse(mockTasks, 'token-2'))
+        .mockResolvedValueOnce({ ok: true, json: async () => ({}) })
+        .mockResolvedValueOnce(changesResponse([{ ...mockTasks[0], title: 'Zebra' }], []))
+        .mockResolvedValueOnce(listResponse([mockTasks[1], { ...mockTasks[0], title: 'Zebra' }], 'token-3'));
+
+      renderTasks();
+      await waitFor(() => {
+        expect(screen.getByTestId('filter-sort-by-select')).toBeInTheDocument();
+      });
+      fireEvent.change(screen.getByTestId('filter-sort-by-select'), { target: { value: 'title' } });
+      fireEvent.click(screen.getByTestId('filter-apply-button'));
+      await waitFor(() => {
+        expect(listFetches()).toHaveLength(2);
+      });
+      await waitFor(() => {
+        expect(screen.getByTestId('edit-task-button-0')).toBeInTheDocument();
+      });
+      await renameFirstTask('Zebra');
+
+      await waitFor(() => {
+        expect(listFetches()).toHaveLength(3);
+      });
+      expect(String(listFetches()[2][0])).toContain('sort_by=title');
+      await waitFor(() => {
+        expect(screen.getByTestId('task-title-1')).toHaveTextContent('Zebra');
+      });
+    });
+  });
+
   describe('Page Size Selection', () => {
     it('should change page size and reset to page 1', async () => {
       mockFetch.mockResolvedValueOnce({
@@ -0,0 +1,98 @@
+import { apiFetch } from '../utils/apiFetch';
+
+// Mock fetch
+const mockFetch = jest.fn();
+global.fetch = mockFetch;
+
+const respond = (status: number, body: object = {}) => ({
+  ok: status < 400,
+  status,
+  json: async () => body,
+});
+
+const sentAuthorization = (call: number) =>
+  new Headers(mockFetch.mock.calls[call][1].headers).get('Authorization');
+
+describe('apiFetch', () => {
+  beforeEach(() => {
+    jest.clearAllMocks();
+    localStorage.clear();
+    localStorage.setItem('access_token', 'access-1');
+    localStorage.setItem('refresh_token', 'refresh-1');
+  });
+
+  it('should refresh an expired access token and retry the request', async () => {
+    mockFetch
+      .mockResolvedValueOnce(respond(401))
+      .mockResolvedValueOnce(respond(200, { access_token: 'access-2', refresh_token: 'refresh-2' }))
+      .mockResolvedValueOnce(respond(200, { tasks: [] }));
+
+    const response = await apiFetch('http://127.0.0.1:5000/tasks', {
+      headers: { Authorization: 'Bearer access-1' },
+    });
+
+    expect(response.status).toBe(200);
+    expect(mockFetch).toHaveBeenCalledTimes(3);
+    expect(mockFetch.mock.calls[1][0]).toBe('http://127.0.0.1:5000/token/refresh');
+    expect(sentAuthorization(1)).toBe('Bearer refresh-1');
+    expect(sentAuthorization(2)).toBe('Bearer access-2');
+    expect(localStorage.getItem('access_token')).toBe('access-2');
+    expect(localStorage.getItem('refresh_token')).toBe('refresh-2');
+  });
+
+  it('should keep the tokens another tab refreshed first', async () => {
+    mockFetch
+      .mockResolvedValueOnce(respond(401))
+      .mockImplementationOnce(async () => {
+        // The other tab spent refresh-1 first and stored what it got back.
+        localStorage.setItem('access_token', 'access-2');
+        localStorage.setItem('refresh_token', 'refresh-2');
+        return respond(401, { message: 'Refresh token has already been used' });
+      })
+      .mockResolvedValueOnce(respond(200, { access_token: 'access-3', refresh_token: 'refresh-3' }))
+      .mockResolvedValueOnce(respond(200, { tasks: [] }));
+
+    const response = await apiFetch('http://127.0.0.1:5000/tasks', {
+      headers: { Authorization: 'Bearer access-1' },
+    });
+
+    expect(response.status).toBe(200);
+    expect(sentAuthorization(2)).toBe('Bearer refresh-2');
+    expect(sentAuthorization(3)).toBe('Bearer access-3');
+    expect(localStorage.getItem('access_token')).toBe('access-3');
+    expect(localStorage.getItem('refresh_token')).toBe('refresh-3');
+  });
+
+  it('should clear the tokens when the stored refresh token is rejected', async () => {
+    mockFetch.mockResolvedValueOnce(respond(401)).mockResolvedValueOnce(respond(401));
+
+    const response = await apiFetch('http://127.0.0.1:5000/tasks', {
+      headers: { Authorization: 'Bearer access-1' },
+    });
+
+    expect(response.status).toBe(401);
+    expect(mockFetch).toHaveBeenCalledTimes(2);
+    expect(localStorage.getItem('access_token')).toBeNull();
+    expect(localStorage.getItem('refresh_token')).toBeNull();
+  });
+
+  it('should share one refresh between concurrent requests', async () => {
+    mockFetch.mockImplementation(async (input: string, init: RequestInit) => {
+      if (input.endsWith('/token/refresh')) {
+        return respond(200, { access_token: 'access-2', refresh_token: 'refresh-2' });
+      }
+      const authorization = new Headers(init.headers).get('Authorization');
+      return respond(authorization === 'Bearer access-2' ? 200 : 401);
+    });
+
+    const init = { headers: { Authorization: 'Bearer access-1' } };
+    const responses = await Promise.all([
+      apiFetch('http://127.0.0.1:5000/tasks', init),
+      apiFetch('http://127.0.0.1:5000/tasks/1', init),
+    ]);
+
+    expect(responses.map((response) => response.status)).toEqual([200, 200]);
+    const refreshes = mockFetch.mock.calls.filter(([input]) => input.endsWith('/token/refresh'));
+    expect(refreshes).toHaveLength(1);
+  });
+});
@@ -30,6 +30,7 @@ function Login() {
         const dataRes = await res.json();
         if (dataRes.access_token) {
           localStorage.setItem('access_token', dataRes.access_token);
+          localStorage.setItem('refresh_token', dataRes.refresh_token);
           setSuccess(true);
           setAuthed(true);
           navigate('/tasks');
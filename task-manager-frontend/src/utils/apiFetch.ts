@@ -1,8 +1,56 @@
+import { API_URL } from './envconstants';
+
+let refreshing: Promise<string | null> | null = null;
+
+function clearTokens() {
+  localStorage.removeItem('access_token');
+  localStorage.removeItem('refresh_token');
+}
+
+async function refreshAccessToken(): Promise<string | null> {
+  let refreshToken = localStorage.getItem('refresh_token');
+  while (refreshToken) {
+    const response = await fetch(`${API_URL}/token/refresh`, {
+      method: 'POST',
+      headers: { Authorization: `Bearer ${refreshToken}` },
+    });
+    if (response.status === 200) {
+      const data = await response.json();
+      localStorage.setItem('access_token', data.access_token);
+      localStorage.setItem('refresh_token', data.refresh_token);
+      return data.access_token;
+    }
+    // Another tab may have spent the same single-use token first and stored
+    // the pair it got back; carry on with that one instead of logging out.
+    const stored = localStorage.getItem('refresh_token');
+    if (stored === refreshToken) break;
+    refreshToken = stored;
+  }
+  // The token that was rejected (or none at all) is still the stored one.
+  clearTokens();
+  return null;
+}
+
 export async function apiFetch(input: RequestInfo, init?: RequestInit): Promise<Response> {
-  const response = await fetch(input, init);
+  let response = await fetch(input, init);
+  const headers = new Headers(init?.headers);
+  if (response.status === 401 && headers.has('Authorization')) {
+    // Refresh tokens are single use, so concurrent 401s in this tab share one
+    // refresh; other tabs are handled in refreshAccessToken.
+    refreshing ??= refreshAccessToken().finally(() => {
+      refreshing = null;
+    });
+    const accessToken = await refreshing;
+    if (!accessToken) {
+      window.location.href = '/login';
+      return response;
+    }
+    headers.set('Authorization', `Bearer ${accessToken}`);
+    response = await fetch(input, { ...init, headers });
+  }
   if (response.status === 401) {
-    localStorage.removeItem('access_token');
+    clearTokens();
     window.location.href = '/login';
   }
   return response;
-} 
\ No newline at end of file
+}